@@ -1,7 +1,12 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import Estabelecimento, UserProfile, DeliveryRange
+from .auth import invalidate_users_membership
+from .models import Estabelecimento, UserProfile, DeliveryRange, DeliveryZone, Cep, NotificacaoWhatsApp, PedidoArquivado, TrabalhoImpressao
+from .printing import requeue_print_jobs
+from .utils import recalculate_client_fees
+from .zones import invalidate_zone_index
 
 @admin.register(DeliveryRange)
 class DeliveryRangeAdmin(admin.ModelAdmin):
@@ -9,6 +14,34 @@ class DeliveryRangeAdmin(admin.ModelAdmin):
     list_filter = ['estabelecimento']
     search_fields = ['estabelecimento__estabelecimento_nome']
 
+    # Faixas alteradas: recalcula as taxas dos clientes usando a distância salva
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        recalculate_client_fees(obj.estabelecimento)
+
+    def delete_model(self, request, obj):
+        estabelecimento = obj.estabelecimento
+        super().delete_model(request, obj)
+        recalculate_client_fees(estabelecimento)
+
+@admin.register(DeliveryZone)
+class DeliveryZoneAdmin(admin.ModelAdmin):
+    list_display = ['estabelecimento', 'name', 'delivery_fee', 'priority', 'active']
+    list_filter = ['estabelecimento', 'active']
+    search_fields = ['estabelecimento__estabelecimento_nome', 'name']
+
+    # Zonas alteradas: descarta o índice em memória e recalcula as taxas dos clientes
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        invalidate_zone_index(obj.estabelecimento_id)
+        recalculate_client_fees(obj.estabelecimento)
+
+    def delete_model(self, request, obj):
+        estabelecimento = obj.estabelecimento
+        super().delete_model(request, obj)
+        invalidate_zone_index(estabelecimento.id)
+        recalculate_client_fees(estabelecimento)
+
 # Inline para UserProfile
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -20,6 +53,14 @@ class UserProfileInline(admin.StackedInline):
 # Custom UserAdmin com inline
 class UserAdmin(BaseUserAdmin):
     inlines = [UserProfileInline]
+    actions = ['desativar']
+
+    @admin.action(description='Desativar usuários selecionados')
+    def desativar(self, request, queryset):
+        # update() não dispara os sinais: o acesso ao websocket é revogado aqui
+        user_ids = list(queryset.values_list('id', flat=True))
+        queryset.update(is_active=False)
+        invalidate_users_membership(user_ids)
 
 # Re-registrar o modelo User
 admin.site.unregister(User)
@@ -37,3 +78,39 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'estabelecimento']
     search_fields = ['user__username', 'estabelecimento__nome']
     list_filter = ['estabelecimento']
+
+@admin.register(Cep)
+class CepAdmin(admin.ModelAdmin):
+    list_display = ['cep_codigo', 'cep_logradouro', 'cep_bairro', 'cep_cidade', 'cep_estado']
+    search_fields = ['cep_codigo', 'cep_logradouro']
+    list_filter = ['cep_estado']
+
+@admin.register(NotificacaoWhatsApp)
+class NotificacaoWhatsAppAdmin(admin.ModelAdmin):
+    list_display = ['id', 'notificacao_estabelecimento', 'notificacao_pedido', 'notificacao_telefone', 'notificacao_status', 'notificacao_tentativas', 'notificacao_proxima_tentativa']
+    search_fields = ['notificacao_telefone']
+    list_filter = ['notificacao_status', 'notificacao_estabelecimento']
+    actions = ['reenviar']
+
+    @admin.action(description='Reenviar notificações selecionadas')
+    def reenviar(self, request, queryset):
+        # Recoloca na fila, inclusive as descartadas após esgotar as tentativas
+        queryset.update(notificacao_status='pending', notificacao_tentativas=0, notificacao_proxima_tentativa=timezone.now())
+
+@admin.register(TrabalhoImpressao)
+class TrabalhoImpressaoAdmin(admin.ModelAdmin):
+    list_display = ['id', 'trabalho_estabelecimento', 'trabalho_pedido', 'trabalho_status', 'trabalho_tentativas', 'trabalho_enfileirado_em', 'trabalho_enviado_em', 'trabalho_impresso_em']
+    list_filter = ['trabalho_status', 'trabalho_estabelecimento']
+    raw_id_fields = ['trabalho_pedido']
+    actions = ['reimprimir']
+
+    @admin.action(description='Reimprimir trabalhos selecionados')
+    def reimprimir(self, request, queryset):
+        requeue_print_jobs(queryset)
+
+@admin.register(PedidoArquivado)
+class PedidoArquivadoAdmin(admin.ModelAdmin):
+    list_display = ['id', 'pedido_arquivado_estabelecimento', 'pedido_arquivado_data', 'pedido_arquivado_status', 'pedido_arquivado_valor_total']
+    list_filter = ['pedido_arquivado_status', 'pedido_arquivado_estabelecimento']
+    date_hierarchy = 'pedido_arquivado_data'
+    raw_id_fields = ['pedido_arquivado_cliente']
@@ -0,0 +1,106 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Pedido, ItensPedido, Cliente, PedidoArquivado
+from .summaries import PEDIDO_SUMMARY_FIELDS, summarize_order_rows
+
+logger = logging.getLogger(__name__)
+
+# Pedidos finalizados mais antigos que isso saem da tabela de pedidos
+ARCHIVE_AFTER_DAYS = getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 90)
+ARCHIVE_CHUNK_SIZE = 500
+FINAL_STATUSES = ('completed', 'cancelled')
+
+def _snapshot(rows):
+    """
+    Resumo dos pedidos (mesmo formato da listagem) com o produto e o preço
+    unitário dos itens, que a listagem omite.
+    """
+    resumos = summarize_order_rows(rows)
+    item_ids = [item['id'] for resumo in resumos for item in resumo['itens']]
+    precos = {
+        item_id: (produto_id, preco)
+        for item_id, produto_id, preco in ItensPedido.objects.filter(id__in=item_ids).values_list(
+            'id', 'itens_pedido_produto_id', 'itens_pedido_preco_unitario'
+        )
+    }
+    for resumo in resumos:
+        for item in resumo['itens']:
+            produto_id, preco = precos[item['id']]
+            item['produto_id'] = produto_id
+            item['itens_pedido_preco_unitario'] = str(preco)
+    return resumos
+
+def archive_chunk(pedido_ids):
+    """
+    Copia os pedidos para PedidoArquivado e os remove (com itens e acréscimos)
+    na mesma transação. Um pedido cujo id já existe em PedidoArquivado não é
+    copiado nem removido: fica na tabela de pedidos e o conflito é logado.
+    """
+    with transaction.atomic():
+        # Trava só as linhas de pedido (sem os joins do resumo) antes de copiar
+        ids = list(Pedido.objects.filter(
+            id__in=pedido_ids, pedido_status__in=FINAL_STATUSES
+        ).select_for_update().values_list('id', flat=True))
+        conflitos = set(PedidoArquivado.objects.filter(id__in=ids).values_list('id', flat=True))
+        if conflitos:
+            logger.error(f"Pedidos não arquivados, id já existe em PedidoArquivado: {sorted(conflitos)}")
+            ids = [pedido_id for pedido_id in ids if pedido_id not in conflitos]
+        rows = list(Pedido.objects.filter(id__in=ids).order_by('id').values(*PEDIDO_SUMMARY_FIELDS, 'pedido_cliente_id'))
+        if not rows:
+            return 0
+        resumos = {resumo['id']: resumo for resumo in _snapshot(rows)}
+        enderecos = {
+            cliente['id']: cliente for cliente in Cliente.objects.filter(
+                id__in={row['pedido_cliente_id'] for row in rows}
+            ).values('id', 'cliente_rua', 'cliente_numero', 'cliente_bairro', 'cliente_complemento')
+        }
+        arquivados = []
+        for row in rows:
+            dados = resumos[row['id']]
+            # Endereço do cliente no momento do arquivamento
+            dados['pedido_cliente'].update(enderecos.get(row['pedido_cliente_id'], {}))
+            arquivados.append(PedidoArquivado(
+                id=row['id'],
+                pedido_arquivado_estabelecimento_id=row['pedido_estabelecimento_id'],
+                pedido_arquivado_cliente_id=row['pedido_cliente_id'],
+                pedido_arquivado_data=row['pedido_data'],
+                pedido_arquivado_status=row['pedido_status'],
+                pedido_arquivado_tipo_entrega=row['pedido_tipo_entrega'],
+                pedido_arquivado_valor_total=row['pedido_valor_total'],
+                pedido_arquivado_taxa_entrega=row['pedido_taxa_entrega'],
+                pedido_arquivado_forma_pagamento=row['pedido_forma_pagamento__forma_pagamento_nome'],
+                pedido_arquivado_dados=dados,
+            ))
+        # Sem ignore_conflicts: qualquer conflito desfaz o lote antes de apagar os pedidos
+        PedidoArquivado.objects.bulk_create(arquivados)
+
+        ItensPedido.itens_pedido_acrescimos.through.objects.filter(itenspedido__itens_pedido_pedido_id__in=ids).delete()
+        ItensPedido.objects.filter(itens_pedido_pedido_id__in=ids).delete()
+        Pedido.objects.filter(id__in=ids).delete()
+        return len(ids)
+
+def archive_orders(dias=None, estabelecimento_id=None, lote=ARCHIVE_CHUNK_SIZE, dry_run=False):
+    """
+    Arquiva em lotes os pedidos concluídos/cancelados com mais de `dias` dias.
+    Cada lote é uma transação curta, para não segurar locks na tabela de pedidos.
+    """
+    limite = timezone.now() - timedelta(days=ARCHIVE_AFTER_DAYS if dias is None else dias)
+    candidatos = Pedido.objects.filter(pedido_status__in=FINAL_STATUSES, pedido_data__lt=limite)
+    if estabelecimento_id:
+        candidatos = candidatos.filter(pedido_estabelecimento_id=estabelecimento_id)
+    if dry_run:
+        return candidatos.count()
+
+    total = 0
+    ultimo_id = 0
+    while True:
+        ids = list(candidatos.filter(id__gt=ultimo_id).order_by('id').values_list('id', flat=True)[:lote])
+        if not ids:
+            break
+        ultimo_id = ids[-1]
+        total += archive_chunk(ids)
+        logger.info(f"Pedidos arquivados até o id {ultimo_id}: {total}")
+    return total
@@ -0,0 +1,156 @@
+import logging
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework.permissions import BasePermission
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import Estabelecimento, UserProfile
+
+logger = logging.getLogger(__name__)
+
+# Vínculo usuário -> estabelecimento em cache, consultado a cada conexão de
+# websocket (os tablets reconectam a cada renovação do token de 1 minuto).
+# A invalidação vem dos sinais post_save/post_delete de User e UserProfile
+# (delivery.signals). Alterações em massa não disparam esses sinais: o
+# QuerySet de UserProfile invalida em update()/bulk_update() e a ação de
+# desativar usuários do admin chama invalidate_users_membership(ids).
+MEMBERSHIP_CACHE_TTL = getattr(settings, 'WS_AUTH_CACHE_TTL', 60)
+# Guardado no cache para usuário sem perfil ou inativo, para não consultar de novo
+SEM_ESTABELECIMENTO = 0
+
+def membership_key(user_id):
+    return f'delivery:estabelecimento_usuario:{user_id}'
+
+def user_estabelecimento_id(user_id):
+    """
+    Estabelecimento do usuário ativo, ou None. Uma consulta (perfil + usuário,
+    pela chave única user_id) quando não está em cache.
+    """
+    key = membership_key(user_id)
+    try:
+        estabelecimento_id = cache.get(key)
+    except Exception as e:
+        # Cache indisponível: segue consultando o banco
+        logger.warning(f"Erro ao ler o cache de autenticação: {str(e)}")
+        estabelecimento_id = None
+    if estabelecimento_id is None:
+        estabelecimento_id = UserProfile.objects.filter(
+            user_id=user_id, user__is_active=True
+        ).values_list('estabelecimento_id', flat=True).first() or SEM_ESTABELECIMENTO
+        try:
+            cache.set(key, estabelecimento_id, MEMBERSHIP_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Erro ao gravar o cache de autenticação: {str(e)}")
+    return estabelecimento_id or None
+
+def invalidate_user_membership(user_id):
+    try:
+        cache.delete(membership_key(user_id))
+    except Exception as e:
+        # Sem invalidação, o vínculo antigo vale no máximo até o fim do TTL
+        logger.error(f"Erro ao invalidar o cache de autenticação do usuário {user_id}: {str(e)}")
+
+def invalidate_users_membership(user_ids):
+    # Versão em lote, para alterações feitas com QuerySet.update()
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    try:
+        cache.delete_many([membership_key(user_id) for user_id in user_ids])
+    except Exception as e:
+        logger.error(f"Erro ao invalidar o cache de autenticação de {len(user_ids)} usuários: {str(e)}")
+
+# Claims do token de acesso: as views administrativas resolvem o usuário e o
+# estabelecimento a partir deles, sem consultar o banco a cada requisição
+
+def add_user_claims(token, user):
+    profile = UserProfile.objects.filter(user=user).values_list('estabelecimento_id', flat=True).first()
+    token['estabelecimento_id'] = profile
+    token['is_superuser'] = user.is_superuser
+    token['is_staff'] = user.is_staff
+    token['username'] = user.username
+    return token
+
+class EstabelecimentoTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+class EstabelecimentoTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    O refresh token dura um dia; os claims do novo token de acesso são lidos de
+    novo do banco, para que mudanças de perfil valham na próxima renovação
+    (no máximo ACCESS_TOKEN_LIFETIME) e não só no próximo login.
+    """
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        user = User.objects.filter(**{api_settings.USER_ID_FIELD: access[api_settings.USER_ID_CLAIM]}).first()
+        if user is not None:
+            add_user_claims(access, user)
+            data['access'] = str(access)
+        return data
+
+class ClaimsProfile:
+    # Substitui request.user.profile: só o id do estabelecimento, vindo do token
+    def __init__(self, user_id, estabelecimento_id):
+        self.user_id = user_id
+        self.estabelecimento_id = estabelecimento_id
+
+    @cached_property
+    def estabelecimento(self):
+        # Instância só com o id: filtros e FKs não consultam o banco; um campo
+        # lido é carregado sob demanda e save() grava apenas os campos carregados
+        return Estabelecimento.from_db(None, ['id'], [self.estabelecimento_id])
+
+class ClaimsUser(TokenUser):
+    @cached_property
+    def profile(self):
+        estabelecimento_id = self.token.get('estabelecimento_id')
+        if estabelecimento_id is None:
+            raise AttributeError('profile')
+        return ClaimsProfile(self.id, estabelecimento_id)
+
+    def __getattr__(self, attr):
+        # TokenUser devolve None para qualquer claim ausente; sem estabelecimento,
+        # hasattr(request.user, 'profile') deve ser False como no User do Django
+        if attr == 'profile':
+            raise AttributeError(attr)
+        return super().__getattr__(attr)
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Autenticação pelo JWT sem consulta ao banco: request.user é um ClaimsUser
+    montado com os claims. Tokens emitidos antes dos claims de estabelecimento
+    continuam autenticando pelo banco.
+    """
+    def get_user(self, validated_token):
+        if 'estabelecimento_id' not in validated_token:
+            return super().get_user(validated_token)
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        return ClaimsUser(validated_token)
+
+class VerifiedMembership(BasePermission):
+    """
+    Para operações sensíveis: confere no banco (uma consulta) se o usuário do
+    token continua ativo, no mesmo estabelecimento e com o mesmo nível de acesso.
+    """
+    message = "Permissões alteradas. Entre novamente."
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not isinstance(user, ClaimsUser):
+            # Usuário já carregado do banco
+            return True
+        atual = User.objects.filter(id=user.id, is_active=True).values_list(
+            'is_superuser', 'profile__estabelecimento_id'
+        ).first()
+        if atual is None:
+            return False
+        return atual == (user.is_superuser, user.token.get('estabelecimento_id'))
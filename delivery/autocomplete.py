@@ -0,0 +1,197 @@
+import bisect
+import logging
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.db import close_old_connections
+from .models import Cliente, Cep, Estabelecimento
+from .utils import normalize_text, street_key
+
+logger = logging.getLogger(__name__)
+
+# Intervalo para reconstruir o índice do zero (pega endereços editados e CEPs novos)
+REBUILD_SECONDS = getattr(settings, 'ADDRESS_AUTOCOMPLETE_REBUILD_SECONDS', 3600)
+# Intervalo mínimo entre as atualizações incrementais (clientes novos)
+UPDATE_SECONDS = getattr(settings, 'ADDRESS_AUTOCOMPLETE_UPDATE_SECONDS', 30)
+
+PREPOSICOES = {'da', 'das', 'do', 'dos', 'de'}
+
+class AddressPrefixIndex:
+    """
+    Índice de prefixos em memória: chaves normalizadas em um array ordenado
+    (busca com bisect) e, para cada chave, a contagem das grafias vistas, de
+    forma que a sugestão e a forma canônica sejam as mais usadas.
+    """
+    def __init__(self):
+        self.keys = []
+        self.formas = {}
+
+    def add(self, value, keys=None):
+        value = ' '.join(str(value or '').split())
+        if not value:
+            return
+        for key in keys or {normalize_text(value)}:
+            if not key:
+                continue
+            if key not in self.formas:
+                bisect.insort(self.keys, key)
+                self.formas[key] = Counter()
+            self.formas[key][value] += 1
+
+    def search(self, prefix, limit=10):
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        # Uma mesma grafia pode estar sob várias chaves; conta cada uma só uma vez
+        ranking = {}
+        i = bisect.bisect_left(self.keys, prefix)
+        while i < len(self.keys) and self.keys[i].startswith(prefix):
+            for forma, total in self.formas[self.keys[i]].items():
+                ranking[forma] = max(ranking.get(forma, 0), total)
+            i += 1
+        return sorted(ranking, key=lambda forma: (-ranking[forma], forma))[:limit]
+
+    def canonical(self, value):
+        formas = self.formas.get(normalize_text(value))
+        if not formas:
+            return value
+        return formas.most_common(1)[0][0]
+
+def street_keys(rua):
+    # Indexa também sem o tipo de logradouro e sem preposição ("Rua das Flores" -> "flores")
+    keys = {normalize_text(rua), street_key(rua)}
+    palavras = street_key(rua).split()
+    if len(palavras) > 1 and palavras[0] in PREPOSICOES:
+        keys.add(' '.join(palavras[1:]))
+    return keys
+
+class EstablishmentAddressIndex:
+    """
+    Índice de ruas e bairros de um estabelecimento. A reconstrução (varredura
+    dos CEPs da cidade) e as atualizações incrementais rodam em uma thread em
+    segundo plano; as requisições consultam o índice atual sem esperar, mesmo
+    desatualizado ou ainda vazio.
+    """
+    def __init__(self, estabelecimento_id):
+        self.estabelecimento_id = estabelecimento_id
+        self.ruas = AddressPrefixIndex()
+        self.bairros = AddressPrefixIndex()
+        self.last_cliente_id = 0
+        self.built_at = 0
+        self.updated_at = 0
+        self.refreshing = False
+        # Protege os índices durante a atualização incremental e a troca
+        self.lock = threading.Lock()
+
+    def rebuild(self):
+        # Monta índices novos fora do lock e troca de uma vez
+        ruas = AddressPrefixIndex()
+        bairros = AddressPrefixIndex()
+
+        # Ruas e bairros da base de CEPs da cidade do estabelecimento
+        estabelecimento = Estabelecimento.objects.filter(id=self.estabelecimento_id).values(
+            'estabelecimento_cidade', 'estabelecimento_estado'
+        ).first()
+        if estabelecimento:
+            ceps = Cep.objects.filter(
+                cep_cidade__iexact=estabelecimento['estabelecimento_cidade'],
+                cep_estado__iexact=estabelecimento['estabelecimento_estado']
+            ).values_list('cep_logradouro', 'cep_bairro').iterator(chunk_size=5000)
+            for logradouro, bairro in ceps:
+                ruas.add(logradouro, street_keys(logradouro))
+                bairros.add(bairro)
+
+        last_cliente_id = self.add_clientes(ruas, bairros, self.new_clientes(0), 0)
+        with self.lock:
+            self.ruas = ruas
+            self.bairros = bairros
+            self.last_cliente_id = last_cliente_id
+        self.built_at = self.updated_at = time.monotonic()
+        logger.info(
+            f"Índice de endereços do estabelecimento {self.estabelecimento_id} reconstruído: "
+            f"{len(ruas.keys)} ruas, {len(bairros.keys)} bairros"
+        )
+
+    def new_clientes(self, last_cliente_id):
+        # Incremental: só os clientes cadastrados depois de last_cliente_id
+        return list(Cliente.objects.filter(
+            cliente_estabelecimento_id=self.estabelecimento_id,
+            id__gt=last_cliente_id
+        ).order_by('id').values_list('id', 'cliente_rua', 'cliente_bairro'))
+
+    def add_clientes(self, ruas, bairros, clientes, last_cliente_id):
+        for cliente_id, rua, bairro in clientes:
+            ruas.add(rua, street_keys(rua))
+            bairros.add(bairro)
+            last_cliente_id = cliente_id
+        return last_cliente_id
+
+    def update(self):
+        # A consulta fica fora do lock; só a inserção bloqueia as buscas
+        clientes = self.new_clientes(self.last_cliente_id)
+        with self.lock:
+            self.last_cliente_id = self.add_clientes(self.ruas, self.bairros, clientes, self.last_cliente_id)
+        self.updated_at = time.monotonic()
+
+    def refresh(self):
+        try:
+            if not self.built_at or time.monotonic() - self.built_at > REBUILD_SECONDS:
+                self.rebuild()
+            else:
+                self.update()
+        except Exception as e:
+            # O índice anterior continua valendo; tenta de novo no próximo intervalo
+            logger.error(f"Erro ao atualizar o índice de endereços do estabelecimento {self.estabelecimento_id}: {str(e)}")
+            self.updated_at = time.monotonic()
+        finally:
+            self.refreshing = False
+            close_old_connections()
+
+    def schedule_refresh(self):
+        agora = time.monotonic()
+        with _indexes_lock:
+            if self.refreshing:
+                return
+            if self.built_at and agora - self.updated_at < UPDATE_SECONDS and agora - self.built_at <= REBUILD_SECONDS:
+                return
+            self.refreshing = True
+        threading.Thread(target=self.refresh, name=f'address-index-{self.estabelecimento_id}', daemon=True).start()
+
+    def search(self, campo, prefixo, limit):
+        with self.lock:
+            if campo == 'bairro':
+                return self.bairros.search(prefixo, limit)
+            return self.ruas.search(prefixo, limit)
+
+    def canonical(self, rua, bairro):
+        with self.lock:
+            return self.ruas.canonical(rua), self.bairros.canonical(bairro)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_address_index(estabelecimento_id):
+    """
+    Índice do estabelecimento neste processo. Nunca consulta o banco na
+    requisição: agenda a reconstrução ou a atualização em segundo plano quando
+    vencidas e retorna o índice atual.
+    """
+    with _indexes_lock:
+        index = _indexes.get(estabelecimento_id)
+        if index is None:
+            index = _indexes[estabelecimento_id] = EstablishmentAddressIndex(estabelecimento_id)
+    index.schedule_refresh()
+    return index
+
+def autocomplete_address(estabelecimento_id, campo, prefixo, limit=10):
+    return get_address_index(estabelecimento_id).search(campo, prefixo, limit)
+
+def canonicalize_address(estabelecimento_id, rua, bairro):
+    """
+    Substitui rua e bairro pela grafia mais usada quando o texto digitado já é
+    conhecido (ignorando acentos e caixa), antes de geocodificar. Enquanto o
+    índice não foi montado neste processo, mantém o texto digitado (o hash do
+    endereço já é calculado sobre a forma normalizada).
+    """
+    return get_address_index(estabelecimento_id).canonical(rua, bairro)
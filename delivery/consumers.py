@@ -1,52 +1,101 @@
+import asyncio
 import json
+import logging
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 
-class OrderConsumer(AsyncWebsocketConsumer):
+logger = logging.getLogger(__name__)
+
+class EstabelecimentoConsumer(AsyncWebsocketConsumer):
+    # Base dos websockets de um estabelecimento, autenticados pelo JWT da query string
+
+    @database_sync_to_async
+    def validate_connection(self, token):
+        """
+        Valida pelo próprio JWT (assinatura e expiração, sem banco) e confere o
+        vínculo do usuário com o estabelecimento da URL pelo cache de
+        delivery.auth: no máximo uma consulta por conexão.
+        """
+        # Importações movidas para dentro da função
+        from rest_framework_simplejwt.exceptions import TokenError
+        from rest_framework_simplejwt.settings import api_settings
+        from rest_framework_simplejwt.tokens import AccessToken
+        from .auth import user_estabelecimento_id
+
+        if not token:
+            return False
+        try:
+            access_token = AccessToken(token)
+        except TokenError:
+            return False
+        user_id = access_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return False
+
+        estabelecimento_id = int(self.estabelecimento_id)
+        # Token emitido para outro estabelecimento: recusa sem consultar nada
+        claim = access_token.get('estabelecimento_id')
+        if claim is not None and claim != estabelecimento_id:
+            return False
+        return user_estabelecimento_id(user_id) == estabelecimento_id
+
+class OrderConsumer(EstabelecimentoConsumer):
+    # Prefixo do grupo na channel layer (o teste de carga usa outro, fora dos tablets)
+    group_prefix = 'orders_'
+
     async def connect(self):
         # Obtém o estabelecimento_id da URL (e.g., ws://localhost:8000/ws/orders/1/)
         self.estabelecimento_id = self.scope['url_route']['kwargs']['estabelecimento_id']
-        self.group_name = f'orders_{self.estabelecimento_id}'
+        self.group_name = f'{self.group_prefix}{self.estabelecimento_id}'
 
         # Obtém o token da query string (e.g., ?token=<jwt>)
         query_string = self.scope['query_string'].decode()
         token = None
+        # Último evento recebido pelo cliente (?last_seq=<n>), para reenviar o que foi perdido
+        last_seq = None
         for param in query_string.split('&'):
             if param.startswith('token='):
                 token = param[len('token='):]
-                break
+            elif param.startswith('last_seq='):
+                try:
+                    last_seq = int(param[len('last_seq='):])
+                except ValueError:
+                    last_seq = None
+        # Clientes que entendem {"type": "batch", "events": [...]} recebem rajadas em um só frame
+        self.batch = 'batch=1' in query_string.split('&')
 
         # Valida o token e o estabelecimento
         if await self.validate_connection(token):
-            # Adiciona ao grupo
+            # Adiciona ao grupo antes de ler o log: eventos publicados durante o
+            # reenvio ficam na fila do canal e os repetidos são descartados pelo seq
             await self.channel_layer.group_add(self.group_name, self.channel_name)
             await self.accept()
+            await self.replay(last_seq)
         else:
             # Rejeita a conexão
             await self.close()
 
     @database_sync_to_async
-    def validate_connection(self, token):
-        # Importações movidas para dentro da função
-        from django.contrib.auth.models import User
-        from rest_framework_simplejwt.tokens import AccessToken
-        from .models import Estabelecimento, UserProfile
+    def load_events(self, last_seq):
+        from .events import current_seq, events_since
+        if last_seq is None:
+            return current_seq(self.estabelecimento_id), []
+        return current_seq(self.estabelecimento_id), events_since(self.estabelecimento_id, last_seq)
 
-        try:
-            if not token:
-                return False
-
-            # Valida o token JWT
-            access_token = AccessToken(token)
-            user_id = access_token['user_id']
-            user = User.objects.get(id=user_id)
-
-            # Verifica se o usuário está associado ao estabelecimento
-            user_profile = UserProfile.objects.get(user=user)
-            estabelecimento = Estabelecimento.objects.get(id=self.estabelecimento_id)
-            return user_profile.estabelecimento == estabelecimento
-        except (AccessToken.InvalidToken, User.DoesNotExist, UserProfile.DoesNotExist, Estabelecimento.DoesNotExist):
-            return False
+    async def replay(self, last_seq):
+        # Sem last_seq nada é reenviado nem filtrado; o cliente só recebe a sequência atual
+        self.last_seq = last_seq or 0
+        seq_atual, eventos = await self.load_events(last_seq)
+        if eventos is None:
+            # Não há como reenviar tudo: o cliente deve recarregar a lista de pedidos
+            await self.send(text_data=json.dumps({'type': 'resync_required', 'seq': seq_atual}))
+            self.last_seq = 0
+            return
+        if eventos:
+            await self.send_events(eventos)
+            self.last_seq = eventos[-1]['seq']
+        await self.send(text_data=json.dumps({'type': 'sync', 'seq': self.last_seq if last_seq is not None else seq_atual}))
 
     async def disconnect(self, close_code):
         # Remove do grupo
@@ -56,10 +105,142 @@ class OrderConsumer(AsyncWebsocketConsumer):
         # Não esperamos mensagens do cliente, mas pode ser expandido
         pass
 
-    async def new_order(self, event):
-        # Envia a notificação para o cliente
-        order = event['order']
-        await self.send(text_data=json.dumps({
-            'type': 'new_order',
-            'order': order
-        }))
\ No newline at end of file
+    async def send_events(self, eventos):
+        if self.batch and len(eventos) > 1:
+            await self.send(text_data=json.dumps({'type': 'batch', 'events': eventos}))
+        else:
+            for evento in eventos:
+                await self.send(text_data=json.dumps(evento))
+
+    async def order_events(self, event):
+        # Eventos tipados do grupo (new_order, orders_status_changed e
+        # orders_cancelled), agrupados pela janela de delivery.events
+        eventos = sorted(
+            (evento for evento in event['events'] if evento['seq'] > self.last_seq),
+            key=lambda evento: evento['seq']
+        )
+        if not eventos:
+            # Já enviados no reenvio da conexão ou junto com um lote anterior
+            return
+        contiguos = eventos[-1]['seq'] - eventos[0]['seq'] + 1 == len(eventos)
+        if self.last_seq and (eventos[0]['seq'] != self.last_seq + 1 or not contiguos):
+            # Lacuna: o envio de outro processo ainda não chegou ou se perdeu. Os
+            # eventos são gravados no log antes do envio, então vêm do banco em ordem
+            seq_atual, faltantes = await self.load_events(self.last_seq)
+            if faltantes is None:
+                await self.send(text_data=json.dumps({'type': 'resync_required', 'seq': seq_atual}))
+                self.last_seq = seq_atual
+                return
+            por_seq = {evento['seq']: evento for evento in faltantes + eventos}
+            eventos = [por_seq[seq] for seq in sorted(por_seq)]
+        self.last_seq = eventos[-1]['seq']
+        await self.send_events(eventos)
+
+    async def order_event(self, event):
+        # Formato antigo, de processos ainda não atualizados durante o deploy
+        await self.order_events({'events': [event['event']]})
+
+
+class PrintAgentConsumer(EstabelecimentoConsumer):
+    """
+    Agente de impressão local (ws/printers/<estabelecimento_id>/?token=<jwt>).
+    Recebe {"type": "print_job", "job_id", "pedido_id", "formato", ...} e
+    responde {"type": "ack", "job_id"} após imprimir ou
+    {"type": "erro", "job_id", "mensagem"}; trabalhos sem confirmação voltam
+    para a fila. O agente deve ignorar job_id já impresso (reenvio após queda).
+    Parâmetros: formato=escpos|texto|dados (padrão escpos) e colunas=<n>
+    (24 a 64).
+    """
+
+    async def connect(self):
+        from .printing import PRINT_AGENT_FORMATS, printer_group
+        from .receipts import parse_columns
+        self.estabelecimento_id = int(self.scope['url_route']['kwargs']['estabelecimento_id'])
+        self.group_name = printer_group(self.estabelecimento_id)
+        self.conectado = False
+        self.reenvio = None
+        self.entrega_lock = asyncio.Lock()
+
+        params = parse_qs(self.scope['query_string'].decode())
+        token = params.get('token', [None])[0]
+        self.formato = params.get('formato', ['escpos'])[0]
+        try:
+            self.colunas = parse_columns(params.get('colunas', [None])[0])
+        except ValueError:
+            await self.close()
+            return
+
+        if self.formato not in PRINT_AGENT_FORMATS or not await self.validate_connection(token):
+            await self.close()
+            return
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        self.conectado = True
+        # Entrega o que ficou pendente enquanto o agente estava desconectado
+        await self.deliver()
+        self.reenvio = asyncio.create_task(self.reclaim_loop())
+
+    async def disconnect(self, close_code):
+        if self.reenvio:
+            self.reenvio.cancel()
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if self.conectado:
+            await self.release_jobs()
+
+    async def reclaim_loop(self):
+        # Trabalhos enviados e não confirmados em PRINT_JOB_ACK_TIMEOUT voltam a
+        # ser entregues sem depender de um trabalho novo ou de reconexão
+        from .printing import PRINT_JOB_RECLAIM_INTERVAL
+        while True:
+            await asyncio.sleep(PRINT_JOB_RECLAIM_INTERVAL)
+            try:
+                await self.deliver()
+            except Exception as e:
+                logger.error(f"Erro ao reenviar trabalhos de impressão do estabelecimento {self.estabelecimento_id}: {str(e)}")
+
+    @database_sync_to_async
+    def claim_messages(self):
+        from .printing import claim_print_jobs, build_print_messages
+        lote, lidos = claim_print_jobs(self.estabelecimento_id, self.channel_name)
+        return lidos, build_print_messages(lote, self.formato, self.colunas) if lote else []
+
+    @database_sync_to_async
+    def release_jobs(self):
+        from .printing import release_print_jobs
+        return release_print_jobs(self.estabelecimento_id, self.channel_name)
+
+    @database_sync_to_async
+    def record_ack(self, trabalho_id, erro=None):
+        from .printing import confirm_print_job, fail_print_job
+        if erro is None:
+            return confirm_print_job(self.estabelecimento_id, trabalho_id)
+        return fail_print_job(self.estabelecimento_id, trabalho_id, erro)
+
+    async def deliver(self):
+        from .printing import PRINT_JOB_BATCH
+        # Uma entrega por vez (aviso de trabalho novo e reenvio periódico)
+        async with self.entrega_lock:
+            while True:
+                lidos, mensagens = await self.claim_messages()
+                for mensagem in mensagens:
+                    await self.send(text_data=json.dumps(mensagem))
+                # Conta as linhas reservadas, inclusive as descartadas: um lote
+                # cheio indica que a fila pode ter mais trabalhos
+                if lidos < PRINT_JOB_BATCH:
+                    break
+
+    async def receive(self, text_data):
+        try:
+            mensagem = json.loads(text_data)
+            trabalho_id = int(mensagem['job_id'])
+            tipo = mensagem['type']
+        except (ValueError, KeyError, TypeError):
+            await self.send(text_data=json.dumps({'type': 'erro', 'mensagem': 'Mensagem inválida'}))
+            return
+        if tipo == 'ack':
+            await self.record_ack(trabalho_id)
+        elif tipo == 'erro':
+            await self.record_ack(trabalho_id, mensagem.get('mensagem') or 'Erro no agente de impressão')
+
+    async def print_jobs_available(self, event):
+        await self.deliver()
@@ -0,0 +1,202 @@
+import atexit
+import logging
+import threading
+import time
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import Estabelecimento, EventoPedido
+
+logger = logging.getLogger(__name__)
+
+# Eventos mantidos por estabelecimento para reenvio após reconexão
+EVENT_LOG_SIZE = getattr(settings, 'ORDER_EVENT_LOG_SIZE', 1000)
+# Máximo de eventos reenviados em uma reconexão; acima disso o cliente recarrega a lista
+EVENT_REPLAY_MAX = getattr(settings, 'ORDER_EVENT_REPLAY_MAX', 200)
+# A limpeza do log roda a cada N eventos do estabelecimento
+EVENT_LOG_PRUNE_EVERY = 100
+# Janela para juntar eventos do mesmo estabelecimento em um envio, em ms (0 envia cada um na hora)
+EVENT_COALESCE_MS = getattr(settings, 'ORDER_EVENT_COALESCE_MS', 150)
+# Lote enviado antes do fim da janela ao chegar nesse tamanho
+EVENT_COALESCE_MAX = getattr(settings, 'ORDER_EVENT_COALESCE_MAX', 50)
+
+# Tipos de evento enviados no grupo orders_<estabelecimento_id>
+NEW_ORDER = 'new_order'
+ORDERS_STATUS_CHANGED = 'orders_status_changed'
+ORDERS_CANCELLED = 'orders_cancelled'
+
+def order_group(estabelecimento_id):
+    return f'orders_{estabelecimento_id}'
+
+def _record(estabelecimento_id, events):
+    """
+    Numera os eventos e grava no log de reenvio. O contador do estabelecimento
+    fica bloqueado só até o commit; o envio ao Redis é feito depois, fora da
+    transação. Retorna os eventos com o campo seq.
+    """
+    with transaction.atomic():
+        Estabelecimento.objects.filter(id=estabelecimento_id).update(
+            estabelecimento_evento_seq=F('estabelecimento_evento_seq') + len(events)
+        )
+        seq = Estabelecimento.objects.filter(id=estabelecimento_id).values_list(
+            'estabelecimento_evento_seq', flat=True
+        ).get()
+        primeiro = seq - len(events) + 1
+        events = [dict(event, seq=primeiro + i) for i, event in enumerate(events)]
+        EventoPedido.objects.bulk_create([
+            EventoPedido(
+                evento_estabelecimento_id=estabelecimento_id,
+                evento_seq=event['seq'],
+                evento_tipo=event['type'],
+                evento_dados=event
+            )
+            for event in events
+        ])
+        if seq // EVENT_LOG_PRUNE_EVERY != (primeiro - 1) // EVENT_LOG_PRUNE_EVERY:
+            EventoPedido.objects.filter(
+                evento_estabelecimento_id=estabelecimento_id,
+                evento_seq__lte=seq - EVENT_LOG_SIZE
+            ).delete()
+    return events
+
+def _broadcast(estabelecimento_id, events):
+    # Envios de processos diferentes podem chegar fora de ordem; o consumer
+    # ordena pelo seq e busca no log o que faltar
+    async_to_sync(get_channel_layer().group_send)(
+        order_group(estabelecimento_id),
+        {'type': 'order_events', 'events': events}
+    )
+
+def _send(estabelecimento_id, events):
+    try:
+        _broadcast(estabelecimento_id, events)
+    except Exception as e:
+        # Os eventos já estão no log: o consumer os recupera ao notar a lacuna de seq
+        logger.error("Erro ao enviar %s evento(s) no grupo %s: %s", len(events), order_group(estabelecimento_id), str(e))
+
+class EventCoalescer:
+    """
+    Junta os eventos de cada estabelecimento publicados dentro da janela em um
+    único group_send. Os eventos chegam já numerados e gravados no log (a
+    sequência segue a ordem dos commits, não a do envio), então um lote perdido
+    com o processo deixa uma lacuna de seq que o consumer preenche pelo log.
+    Uma thread por processo envia os lotes vencidos; o lote é enviado antes se
+    chegar a max_events.
+    """
+    def __init__(self, window, max_events):
+        self.window = window
+        self.max_events = max_events
+        self.pending = {}
+        self.deadlines = {}
+        self.cond = threading.Condition()
+        self.thread = None
+
+    def add(self, estabelecimento_id, event):
+        with self.cond:
+            eventos = self.pending.setdefault(estabelecimento_id, [])
+            if not eventos:
+                self.deadlines[estabelecimento_id] = time.monotonic() + self.window
+            eventos.append(event)
+            if len(eventos) >= self.max_events:
+                self.deadlines[estabelecimento_id] = 0
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='order-events', daemon=True)
+                self.thread.start()
+            self.cond.notify()
+
+    def take_due(self, todos=False):
+        with self.cond:
+            agora = time.monotonic()
+            prontos = [
+                estabelecimento_id for estabelecimento_id, prazo in self.deadlines.items()
+                if todos or prazo <= agora
+            ]
+            for estabelecimento_id in prontos:
+                del self.deadlines[estabelecimento_id]
+            # Threads de requisição diferentes podem enfileirar fora da ordem do seq
+            return [
+                (estabelecimento_id, sorted(self.pending.pop(estabelecimento_id), key=lambda event: event['seq']))
+                for estabelecimento_id in prontos
+            ]
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.deadlines:
+                    self.cond.wait()
+                espera = min(self.deadlines.values()) - time.monotonic()
+                if espera > 0:
+                    self.cond.wait(espera)
+                    continue
+            for estabelecimento_id, eventos in self.take_due():
+                _send(estabelecimento_id, eventos)
+
+    def flush(self):
+        # Envia o que estiver pendente (encerramento do processo)
+        for estabelecimento_id, eventos in self.take_due(todos=True):
+            _send(estabelecimento_id, eventos)
+
+_coalescer = EventCoalescer(EVENT_COALESCE_MS / 1000, EVENT_COALESCE_MAX)
+atexit.register(_coalescer.flush)
+
+def _dispatch(estabelecimento_id, event):
+    # A sequência é reservada aqui, logo após o commit; só o envio é agrupado
+    try:
+        event = _record(estabelecimento_id, [event])[0]
+    except Exception as e:
+        # Não interrompe a requisição, apenas loga o erro
+        logger.error("Erro ao registrar evento %s do grupo %s: %s", event.get('type'), order_group(estabelecimento_id), str(e))
+        return
+    if EVENT_COALESCE_MS <= 0:
+        _send(estabelecimento_id, [event])
+    else:
+        _coalescer.add(estabelecimento_id, event)
+
+def publish_order_event(estabelecimento_id, event):
+    """
+    Publica o evento no websocket do estabelecimento depois do commit da
+    transação corrente (ou imediatamente, fora de transação), para que os
+    clientes nunca recebam uma alteração que foi desfeita. Eventos próximos
+    do mesmo estabelecimento saem juntos em uma mensagem order_events.
+    """
+    transaction.on_commit(lambda: _dispatch(estabelecimento_id, event))
+
+def publish_status_changes(resumos, estabelecimentos):
+    """
+    Agrupa os resumos por estabelecimento e publica um evento por tipo:
+    cancelamentos em orders_cancelled e as demais mudanças em
+    orders_status_changed. estabelecimentos mapeia pedido_id -> estabelecimento_id.
+    """
+    eventos = {}
+    for resumo in resumos:
+        tipo = ORDERS_CANCELLED if resumo['pedido_status'] == 'cancelled' else ORDERS_STATUS_CHANGED
+        eventos.setdefault((estabelecimentos[resumo['id']], tipo), []).append(resumo)
+    for (estabelecimento_id, tipo), orders in eventos.items():
+        publish_order_event(estabelecimento_id, {'type': tipo, 'orders': orders})
+
+def current_seq(estabelecimento_id):
+    return Estabelecimento.objects.filter(id=estabelecimento_id).values_list(
+        'estabelecimento_evento_seq', flat=True
+    ).first() or 0
+
+def events_since(estabelecimento_id, last_seq):
+    """
+    Eventos com sequência maior que last_seq, em ordem. Retorna None quando não
+    é possível reenviar tudo (eventos já descartados do log, acima do limite de
+    reenvio ou sequência desconhecida); nesse caso o cliente deve recarregar os
+    pedidos.
+    """
+    atual = current_seq(estabelecimento_id)
+    if last_seq == atual:
+        return []
+    if last_seq > atual or atual - last_seq > EVENT_REPLAY_MAX:
+        return None
+    eventos = list(EventoPedido.objects.filter(
+        evento_estabelecimento_id=estabelecimento_id,
+        evento_seq__gt=last_seq
+    ).order_by('evento_seq').values_list('evento_dados', flat=True))
+    if not eventos or eventos[0]['seq'] != last_seq + 1:
+        return None
+    return eventos
@@ -0,0 +1,50 @@
+from datetime import timedelta
+from django.utils import timezone
+from .models import Pedido, Cliente
+from .summaries import ORDERS_PAGE_SIZE, PEDIDO_SUMMARY_FIELDS, active_orders, item_summary_queryset, order_list_queryset
+from .tickets import ticket_orders
+
+# Consultas mais frequentes do sistema, verificadas pelo comando explicar_consultas.
+# Cada função recebe o id do estabelecimento e devolve o queryset a ser explicado.
+HOT_QUERIES = {}
+
+def register_hot_query(name):
+    def decorator(func):
+        HOT_QUERIES[name] = func
+        return func
+    return decorator
+
+# Os querysets vêm das mesmas funções usadas pelas views, com o tamanho de
+# página padrão da listagem
+
+def _pedidos(estabelecimento_id):
+    return Pedido.objects.filter(pedido_estabelecimento_id=estabelecimento_id)
+
+@register_hot_query('orders_list')
+def orders_list(estabelecimento_id):
+    return order_list_queryset(_pedidos(estabelecimento_id), 'pending').values(*PEDIDO_SUMMARY_FIELDS)[:ORDERS_PAGE_SIZE + 1]
+
+@register_hot_query('orders_board')
+def orders_board(estabelecimento_id):
+    return active_orders(_pedidos(estabelecimento_id)).values(*PEDIDO_SUMMARY_FIELDS)
+
+@register_hot_query('orders_list_periodo')
+def orders_list_periodo(estabelecimento_id):
+    fim = timezone.now()
+    return order_list_queryset(
+        _pedidos(estabelecimento_id), 'completed', data_inicio=fim - timedelta(days=30), data_fim=fim
+    ).values(*PEDIDO_SUMMARY_FIELDS)[:ORDERS_PAGE_SIZE + 1]
+
+@register_hot_query('order_items')
+def order_items(estabelecimento_id):
+    pedido_ids = list(_pedidos(estabelecimento_id).order_by('-pedido_data').values_list('id', flat=True)[:ORDERS_PAGE_SIZE]) or [0]
+    return item_summary_queryset(pedido_ids)
+
+@register_hot_query('print_order')
+def print_order(estabelecimento_id):
+    pedido_id = _pedidos(estabelecimento_id).values_list('id', flat=True).first() or 0
+    return ticket_orders(id=pedido_id, pedido_estabelecimento_id=estabelecimento_id)
+
+@register_hot_query('search_client')
+def search_client(estabelecimento_id):
+    return Cliente.objects.filter(cliente_estabelecimento_id=estabelecimento_id, cliente_telefone='00000000000')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from delivery.archive import ARCHIVE_AFTER_DAYS, ARCHIVE_CHUNK_SIZE, archive_orders
+
+class Command(BaseCommand):
+    help = 'Move pedidos concluídos/cancelados antigos para a tabela de pedidos arquivados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=ARCHIVE_AFTER_DAYS, help=f'Idade mínima do pedido em dias (padrão: {ARCHIVE_AFTER_DAYS})')
+        parser.add_argument('--estabelecimento', type=int, help='ID do estabelecimento (padrão: todos)')
+        parser.add_argument('--lote', type=int, default=ARCHIVE_CHUNK_SIZE, help=f'Pedidos por transação (padrão: {ARCHIVE_CHUNK_SIZE})')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas conta os pedidos que seriam arquivados')
+
+    def handle(self, *args, **kwargs):
+        total = archive_orders(
+            dias=kwargs['dias'],
+            estabelecimento_id=kwargs.get('estabelecimento'),
+            lote=kwargs['lote'],
+            dry_run=kwargs['dry_run']
+        )
+        if kwargs['dry_run']:
+            self.stdout.write(f'{total} pedidos seriam arquivados')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{total} pedidos arquivados'))
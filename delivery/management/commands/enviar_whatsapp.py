@@ -0,0 +1,65 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from delivery.whatsapp import EvolutionSender, claim_batch, record_result
+
+logger = logging.getLogger(__name__)
+
+# Espera máxima entre tentativas quando o ciclo falha (banco fora do ar, por exemplo)
+BACKOFF_MAX_SECONDS = 60
+
+class Command(BaseCommand):
+    help = 'Envia as notificações de WhatsApp pendentes na outbox (com reenvio e limite por instância)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Processa as mensagens vencidas e sai')
+        parser.add_argument('--workers', type=int, default=4, help='Threads de envio (padrão: 4)')
+        parser.add_argument('--lote', type=int, default=50, help='Mensagens reservadas por ciclo (padrão: 50)')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera com a fila vazia (padrão: 2)')
+
+    def handle(self, *args, **kwargs):
+        sender = EvolutionSender()
+        self.stdout.write(f"Worker de WhatsApp iniciado com {kwargs['workers']} threads")
+
+        # As threads só fazem HTTP; o resultado é gravado no banco pela thread principal
+        falhas = 0
+        with ThreadPoolExecutor(max_workers=kwargs['workers']) as executor:
+            while True:
+                try:
+                    close_old_connections()
+                    lote = self.process_batch(sender, executor, kwargs['lote'])
+                    falhas = 0
+                except Exception as e:
+                    # O worker não pode morrer: start.sh não o reinicia. Mensagens
+                    # reservadas e não gravadas voltam para a fila pelo SENDING_TIMEOUT.
+                    falhas += 1
+                    espera = min(kwargs['intervalo'] * 2 ** falhas, BACKOFF_MAX_SECONDS)
+                    logger.error(f"Erro no ciclo do worker de WhatsApp (falha {falhas}), nova tentativa em {espera:.0f}s: {str(e)}")
+                    close_old_connections()
+                    time.sleep(espera)
+                    continue
+                if kwargs['once'] and not lote:
+                    break
+                if not lote:
+                    time.sleep(kwargs['intervalo'])
+
+    def process_batch(self, sender, executor, limite):
+        lote = claim_batch(limite)
+        if not lote:
+            return lote
+        futures = [executor.submit(sender.send, *item) for item in lote]
+        resultados = {'sent': 0, 'pending': 0, 'dead': 0}
+        for future in as_completed(futures):
+            try:
+                notificacao_id, erro, definitivo = future.result()
+                resultados[record_result(notificacao_id, erro, definitivo)] += 1
+            except Exception as e:
+                # Só esta mensagem fica em "sending" e volta para a fila depois
+                logger.error(f"Erro ao processar notificação WhatsApp: {str(e)}")
+        self.stdout.write(
+            f"{len(lote)} processadas: {resultados['sent']} enviadas, "
+            f"{resultados['pending']} reagendadas, {resultados['dead']} descartadas"
+        )
+        return lote
@@ -0,0 +1,51 @@
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from delivery.hot_queries import HOT_QUERIES
+from delivery.models import Estabelecimento
+
+# Padrões de varredura completa no plano de execução, por banco
+FULL_SCAN_PATTERNS = {
+    # Coluna type = ALL (o MariaDB não tem a coluna partitions)
+    'mysql': re.compile(r'^\S+\s+\S+\s+\S+\s+(\S+\s+)?ALL\b', re.MULTILINE),
+    'postgresql': re.compile(r'Seq Scan'),
+    'sqlite': re.compile(r'\bSCAN (?!.*USING (COVERING )?INDEX)'),
+}
+
+class Command(BaseCommand):
+    help = 'Executa EXPLAIN nas consultas críticas registradas e aponta varreduras completas de tabela'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estabelecimento', type=int, help='ID do estabelecimento usado nas consultas (padrão: o primeiro)')
+        parser.add_argument('--consulta', action='append', help='Explica apenas a consulta indicada (pode repetir)')
+        parser.add_argument('--strict', action='store_true', help='Falha se alguma consulta fizer varredura completa')
+
+    def handle(self, *args, **kwargs):
+        estabelecimento_id = kwargs.get('estabelecimento') or Estabelecimento.objects.values_list('id', flat=True).first()
+        if not estabelecimento_id:
+            raise CommandError('Nenhum estabelecimento cadastrado')
+
+        nomes = kwargs.get('consulta') or list(HOT_QUERIES)
+        desconhecidas = set(nomes) - set(HOT_QUERIES)
+        if desconhecidas:
+            raise CommandError(f'Consultas desconhecidas: {", ".join(sorted(desconhecidas))}')
+
+        padrao = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if padrao is None:
+            self.stdout.write(self.style.WARNING(f'Banco {connection.vendor} sem detecção de varredura completa'))
+
+        varreduras = []
+        for nome in nomes:
+            queryset = HOT_QUERIES[nome](estabelecimento_id)
+            plano = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {nome}'))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(plano)
+            if padrao and padrao.search(plano):
+                varreduras.append(nome)
+                self.stdout.write(self.style.ERROR(f'Varredura completa de tabela em {nome}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('OK'))
+
+        if varreduras and kwargs.get('strict'):
+            raise CommandError(f'Varreduras completas em: {", ".join(varreduras)}')
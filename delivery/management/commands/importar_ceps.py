@@ -0,0 +1,63 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from delivery.models import Cep
+from delivery.utils import normalize_cep
+
+def parse_coordenada(value):
+    try:
+        return float(str(value).replace(',', '.')) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+class Command(BaseCommand):
+    help = (
+        'Importa o índice local de CEPs a partir de um CSV com as colunas '
+        'cep, logradouro, bairro, cidade, estado, latitude e longitude'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo CSV')
+        parser.add_argument('--delimitador', default=',', help='Delimitador do CSV (padrão: ",")')
+        parser.add_argument('--encoding', default='utf-8', help='Codificação do arquivo (padrão: utf-8)')
+        parser.add_argument('--lote', type=int, default=5000, help='Registros por lote de inserção')
+
+    def handle(self, *args, **kwargs):
+        # MySQL/MariaDB fazem upsert pela chave primária sem aceitar unique_fields
+        upsert_kwargs = {
+            'update_conflicts': True,
+            'update_fields': ['cep_logradouro', 'cep_bairro', 'cep_cidade', 'cep_estado', 'cep_latitude', 'cep_longitude'],
+        }
+        if connection.features.supports_update_conflicts_with_target:
+            upsert_kwargs['unique_fields'] = ['cep_codigo']
+
+        total = 0
+        ignorados = 0
+        lote = []
+        try:
+            with open(kwargs['arquivo'], newline='', encoding=kwargs['encoding']) as arquivo:
+                for linha in csv.DictReader(arquivo, delimiter=kwargs['delimitador']):
+                    cep = normalize_cep(linha.get('cep'))
+                    if not cep or not linha.get('cidade') or not linha.get('estado'):
+                        ignorados += 1
+                        continue
+                    lote.append(Cep(
+                        cep_codigo=cep,
+                        cep_logradouro=(linha.get('logradouro') or '').strip(),
+                        cep_bairro=(linha.get('bairro') or '').strip(),
+                        cep_cidade=linha['cidade'].strip(),
+                        cep_estado=linha['estado'].strip().upper()[:2],
+                        cep_latitude=parse_coordenada(linha.get('latitude')),
+                        cep_longitude=parse_coordenada(linha.get('longitude')),
+                    ))
+                    if len(lote) >= kwargs['lote']:
+                        Cep.objects.bulk_create(lote, **upsert_kwargs)
+                        total += len(lote)
+                        lote = []
+                if lote:
+                    Cep.objects.bulk_create(lote, **upsert_kwargs)
+                    total += len(lote)
+        except OSError as e:
+            raise CommandError(f'Não foi possível ler o arquivo: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'{total} CEPs importados, {ignorados} linhas ignoradas'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from delivery.tickets import TICKET_CACHE_MAX_AGE, TICKET_CACHE_MAX_BYTES, evict_tickets
+
+class Command(BaseCommand):
+    help = 'Remove PDFs de pedidos do cache por idade e tamanho total'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-mb', type=int, default=TICKET_CACHE_MAX_BYTES // (1024 * 1024), help='Tamanho máximo do cache em MB')
+        parser.add_argument('--max-dias', type=float, default=TICKET_CACHE_MAX_AGE / 86400, help='Idade máxima dos PDFs em dias')
+
+    def handle(self, *args, **kwargs):
+        removidos = evict_tickets(
+            max_bytes=kwargs['max_mb'] * 1024 * 1024,
+            max_age=kwargs['max_dias'] * 86400
+        )
+        self.stdout.write(self.style.SUCCESS(f'{removidos} PDFs removidos do cache'))
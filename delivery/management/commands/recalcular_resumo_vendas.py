@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from delivery.rollups import rebuild_rollups
+
+class Command(BaseCommand):
+    help = 'Recalcula os consolidados de vendas (carga inicial ou correção) a partir dos pedidos e do arquivo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estabelecimento', type=int, help='ID do estabelecimento (padrão: todos)')
+        parser.add_argument('--inicio', help='Data inicial YYYY-MM-DD (padrão: desde o primeiro pedido)')
+        parser.add_argument('--fim', help='Data final YYYY-MM-DD, inclusive (padrão: hoje)')
+
+    def handle(self, *args, **kwargs):
+        datas = {}
+        for campo in ('inicio', 'fim'):
+            valor = kwargs.get(campo)
+            if valor:
+                datas[campo] = parse_date(valor)
+                if datas[campo] is None:
+                    raise CommandError(f'Data inválida: {valor}')
+
+        pedidos, (linhas_vendas, linhas_produtos) = rebuild_rollups(
+            estabelecimento_id=kwargs.get('estabelecimento'), **datas
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{pedidos} pedidos consolidados em {linhas_vendas} linhas de vendas e {linhas_produtos} de produtos'
+        ))
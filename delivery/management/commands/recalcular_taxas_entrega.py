@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from delivery.models import Estabelecimento
+from delivery.utils import recalculate_client_fees
+
+class Command(BaseCommand):
+    help = 'Recalcula cliente_taxa_entrega a partir da distância salva, sem chamar as APIs do Google'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estabelecimento', type=int, help='ID do estabelecimento (padrão: todos)')
+
+    def handle(self, *args, **kwargs):
+        estabelecimentos = Estabelecimento.objects.all()
+        if kwargs.get('estabelecimento'):
+            estabelecimentos = estabelecimentos.filter(id=kwargs['estabelecimento'])
+        for estabelecimento in estabelecimentos:
+            alterados = recalculate_client_fees(estabelecimento)
+            self.stdout.write(self.style.SUCCESS(f'{estabelecimento}: {alterados} clientes atualizados'))
@@ -0,0 +1,250 @@
+import asyncio
+import gc
+import json
+import os
+import resource
+import time
+from contextlib import nullcontext
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from delivery.consumers import OrderConsumer
+from delivery.events import NEW_ORDER
+
+# Camada em memória e cache local: o teste roda sem Redis
+OFFLINE_SETTINGS = {
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+}
+
+class TesteOrderConsumer(OrderConsumer):
+    # Grupos próprios: os eventos sintéticos nunca chegam aos tablets em produção,
+    # mesmo com --camada redis
+    group_prefix = 'teste_carga_orders_'
+
+def teste_group(estabelecimento_id):
+    return f'{TesteOrderConsumer.group_prefix}{estabelecimento_id}'
+
+def rss_bytes():
+    # Memória residente atual (Linux); fora dele, o pico informado pelo SO
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+class Conexao:
+    def __init__(self, communicator, estabelecimento_id):
+        self.communicator = communicator
+        self.estabelecimento_id = estabelecimento_id
+        self.recebidos = 0
+        self.latencias = []
+        self.leitor = None
+
+    async def ler(self, timeout):
+        # Timeout longo: no ApplicationCommunicator, um timeout cancela o consumer
+        while True:
+            evento = json.loads(await self.communicator.receive_from(timeout=timeout))
+            if evento.get('type') == NEW_ORDER and 'bench_ts' in evento:
+                self.recebidos += 1
+                self.latencias.append(time.time() - evento['bench_ts'])
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga/soak do websocket de pedidos: abre conexões autenticadas em '
+        'ws/orders/<id>/ neste processo (como um processo do daphne, sem a camada de rede), '
+        'publica eventos new_order sintéticos pela channel layer e mede latência de '
+        'entrega, memória por conexão e mensagens perdidas. Os clientes sintéticos dividem a '
+        'CPU com os consumers, então os números são um limite inferior para um processo '
+        'dedicado. Os eventos vão para grupos próprios do teste, nunca para os tablets, '
+        'e nada é gravado no banco.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conexoes', type=int, default=1000, help='Total de conexões (padrão: 1000)')
+        parser.add_argument('--estabelecimentos', type=int, default=10, help='Estabelecimentos com usuário ativo entre os quais as conexões são divididas (padrão: 10)')
+        parser.add_argument('--eventos', type=int, default=20, help='Eventos publicados por estabelecimento (padrão: 20)')
+        parser.add_argument('--taxa', type=float, default=10, help='Eventos por segundo em cada estabelecimento (padrão: 10)')
+        parser.add_argument('--duracao', type=float, help='Soak: publica durante N segundos em vez de um número fixo de eventos')
+        parser.add_argument('--camada', choices=['memoria', 'redis'], default='memoria', help='memoria: InMemoryChannelLayer e cache local; redis: CHANNEL_LAYERS e CACHES do settings (padrão: memoria)')
+        parser.add_argument('--concorrencia', type=int, default=100, help='Conexões abertas em paralelo (padrão: 100)')
+        parser.add_argument('--espera', type=float, default=5, help='Segundos aguardando as últimas entregas (padrão: 5)')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['conexoes'] < 1 or kwargs['estabelecimentos'] < 1 or kwargs['taxa'] <= 0:
+            raise CommandError('--conexoes, --estabelecimentos e --taxa devem ser positivos')
+
+        # Um usuário ativo por estabelecimento; os tokens são gerados sem consultar o banco
+        usuarios = {}
+        for user in User.objects.filter(is_active=True, profile__isnull=False).select_related('profile').order_by('profile__estabelecimento_id', 'id'):
+            if len(usuarios) >= kwargs['estabelecimentos']:
+                break
+            usuarios.setdefault(user.profile.estabelecimento_id, user)
+        if not usuarios:
+            raise CommandError('Nenhum usuário ativo com estabelecimento para autenticar as conexões')
+
+        contexto = override_settings(**OFFLINE_SETTINGS) if kwargs['camada'] == 'memoria' else nullcontext()
+        with contexto:
+            # Mesma pilha do setup.asgi, com o consumer de grupos próprios do teste
+            from channels.auth import AuthMiddlewareStack
+            from channels.routing import URLRouter
+            from django.urls import re_path
+            application = AuthMiddlewareStack(URLRouter([
+                re_path(r'ws/orders/(?P<estabelecimento_id>\d+)/$', TesteOrderConsumer.as_asgi()),
+            ]))
+            resultado = asyncio.run(self.executar(application, usuarios, kwargs))
+        self.relatorio(resultado, kwargs)
+
+    def token(self, user, cache_tokens):
+        # O token de acesso dura pouco; renova a cada 30s durante a abertura das conexões
+        token, criado = cache_tokens.get(user.id, (None, 0))
+        if token is None or time.monotonic() - criado > 30:
+            access = AccessToken.for_user(user)
+            access['estabelecimento_id'] = user.profile.estabelecimento_id
+            access['is_superuser'] = user.is_superuser
+            token = str(access)
+            cache_tokens[user.id] = (token, time.monotonic())
+        return token
+
+    async def executar(self, application, usuarios, kwargs):
+        from channels.layers import get_channel_layer
+        from channels.testing import WebsocketCommunicator
+
+        estabelecimentos = list(usuarios)
+        leitura_timeout = (kwargs['duracao'] or kwargs['eventos'] / kwargs['taxa']) + kwargs['espera'] + 3600
+        cache_tokens = {}
+        semaforo = asyncio.Semaphore(kwargs['concorrencia'])
+        conexoes = []
+        falhas = 0
+        tempos_conexao = []
+
+        async def conectar(i):
+            nonlocal falhas
+            estabelecimento_id = estabelecimentos[i % len(estabelecimentos)]
+            token = self.token(usuarios[estabelecimento_id], cache_tokens)
+            communicator = WebsocketCommunicator(application, f'/ws/orders/{estabelecimento_id}/?token={token}')
+            async with semaforo:
+                inicio = time.perf_counter()
+                conectado, _ = await communicator.connect(timeout=30)
+                tempos_conexao.append(time.perf_counter() - inicio)
+            if not conectado:
+                falhas += 1
+                return
+            conexao = Conexao(communicator, estabelecimento_id)
+            conexao.leitor = asyncio.create_task(conexao.ler(leitura_timeout))
+            conexoes.append(conexao)
+
+        gc.collect()
+        memoria_inicial = rss_bytes()
+        inicio = time.perf_counter()
+        await asyncio.gather(*(conectar(i) for i in range(kwargs['conexoes'])))
+        tempo_abertura = time.perf_counter() - inicio
+        # Deixa os consumers enviarem o sync inicial antes de medir a memória
+        await asyncio.sleep(1)
+        gc.collect()
+        memoria_conectado = rss_bytes()
+
+        por_estabelecimento = {}
+        for conexao in conexoes:
+            por_estabelecimento[conexao.estabelecimento_id] = por_estabelecimento.get(conexao.estabelecimento_id, 0) + 1
+
+        # Publicação: um group_send por estabelecimento a cada tick, como os eventos reais
+        layer = get_channel_layer()
+        intervalo = 1 / kwargs['taxa']
+        publicados = 0
+        esperadas = 0
+        falhas_envio = 0
+        seq = 0
+        inicio_publicacao = time.perf_counter()
+        while True:
+            decorrido = time.perf_counter() - inicio_publicacao
+            if kwargs['duracao'] is not None:
+                if decorrido >= kwargs['duracao']:
+                    break
+            elif seq >= kwargs['eventos']:
+                break
+            seq += 1
+            for estabelecimento_id in estabelecimentos:
+                evento = {
+                    'type': NEW_ORDER,
+                    'seq': seq,
+                    'order': {'id': seq, 'pedido_status': 'pending'},
+                    'bench_ts': time.time(),
+                }
+                try:
+                    await layer.group_send(teste_group(estabelecimento_id), {'type': 'order_events', 'events': [evento]})
+                    publicados += 1
+                    esperadas += por_estabelecimento.get(estabelecimento_id, 0)
+                except Exception:
+                    falhas_envio += 1
+            atraso = inicio_publicacao + seq * intervalo - time.perf_counter()
+            if atraso > 0:
+                await asyncio.sleep(atraso)
+        tempo_publicacao = time.perf_counter() - inicio_publicacao
+
+        # Aguarda as últimas entregas
+        limite = time.perf_counter() + kwargs['espera']
+        while time.perf_counter() < limite and sum(conexao.recebidos for conexao in conexoes) < esperadas:
+            await asyncio.sleep(0.05)
+
+        for conexao in conexoes:
+            conexao.leitor.cancel()
+        await asyncio.gather(*(conexao.leitor for conexao in conexoes), return_exceptions=True)
+        await asyncio.gather(*(conexao.communicator.disconnect() for conexao in conexoes), return_exceptions=True)
+
+        return {
+            'conexoes': len(conexoes),
+            'falhas_conexao': falhas,
+            'estabelecimentos': len(estabelecimentos),
+            'tempo_abertura': tempo_abertura,
+            'tempos_conexao': tempos_conexao,
+            'memoria_inicial': memoria_inicial,
+            'memoria_conectado': memoria_conectado,
+            'publicados': publicados,
+            'falhas_envio': falhas_envio,
+            'tempo_publicacao': tempo_publicacao,
+            'esperadas': esperadas,
+            'recebidas': sum(conexao.recebidos for conexao in conexoes),
+            'latencias': [latencia for conexao in conexoes for latencia in conexao.latencias],
+        }
+
+    def relatorio(self, r, kwargs):
+        ms = lambda segundos: f'{segundos * 1000:.1f} ms'
+        memoria = r['memoria_conectado'] - r['memoria_inicial']
+        perdidas = r['esperadas'] - r['recebidas']
+        self.stdout.write(f"Camada: {kwargs['camada']}")
+        self.stdout.write(
+            f"Conexões: {r['conexoes']} abertas em {r['estabelecimentos']} estabelecimentos, "
+            f"{r['falhas_conexao']} recusadas, {r['tempo_abertura']:.1f}s "
+            f"({r['conexoes'] / r['tempo_abertura']:.0f}/s)"
+        )
+        self.stdout.write(
+            f"Tempo de conexão: p50 {ms(percentil(r['tempos_conexao'], 50))}, "
+            f"p95 {ms(percentil(r['tempos_conexao'], 95))}, máx {ms(max(r['tempos_conexao'], default=0))}"
+        )
+        self.stdout.write(
+            f"Memória: +{memoria / 1024 / 1024:.1f} MB, "
+            f"{memoria / max(r['conexoes'], 1) / 1024:.1f} KB por conexão"
+        )
+        self.stdout.write(
+            f"Eventos: {r['publicados']} publicados em {r['tempo_publicacao']:.1f}s "
+            f"({r['falhas_envio']} falhas de envio)"
+        )
+        self.stdout.write(
+            f"Mensagens: {r['esperadas']} esperadas, {r['recebidas']} recebidas, "
+            f"{perdidas} perdidas ({perdidas / max(r['esperadas'], 1) * 100:.2f}%)"
+        )
+        self.stdout.write(
+            f"Latência de entrega: p50 {ms(percentil(r['latencias'], 50))}, "
+            f"p95 {ms(percentil(r['latencias'], 95))}, p99 {ms(percentil(r['latencias'], 99))}, "
+            f"máx {ms(max(r['latencias'], default=0))}"
+        )
+        estilo = self.style.SUCCESS if perdidas == 0 and r['falhas_conexao'] == 0 else self.style.WARNING
+        self.stdout.write(estilo('Sem perdas' if perdidas == 0 else f'{perdidas} mensagens não entregues'))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-19 01:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0017_estabelecimento_estabelecimento_instagram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='cliente_distancia_km',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='cliente_endereco_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='cliente_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='cliente_location_type',
+            field=models.CharField(blank=True, max_length=30, null=True),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='cliente_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='cliente_partial_match',
+            field=models.BooleanField(default=False),
+        ),
+    ]
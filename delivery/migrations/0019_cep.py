@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-19 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0018_cliente_localizacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cep',
+            fields=[
+                ('cep_codigo', models.CharField(max_length=8, primary_key=True, serialize=False)),
+                ('cep_logradouro', models.CharField(blank=True, max_length=255)),
+                ('cep_bairro', models.CharField(blank=True, max_length=255)),
+                ('cep_cidade', models.CharField(max_length=100)),
+                ('cep_estado', models.CharField(max_length=2)),
+                ('cep_latitude', models.FloatField(blank=True, null=True)),
+                ('cep_longitude', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'CEP',
+                'verbose_name_plural': 'CEPs',
+            },
+        ),
+    ]
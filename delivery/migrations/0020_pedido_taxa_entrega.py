@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0019_cep'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='pedido_distancia_km',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='pedido_taxa_entrega',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+        ),
+    ]
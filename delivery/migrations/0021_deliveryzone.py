@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-19 01:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0020_pedido_taxa_entrega'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryZone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nome da zona')),
+                ('polygon', models.TextField(help_text='Vértices do polígono no formato de polyline codificada do Google (lat/lng).', verbose_name='Polígono')),
+                ('delivery_fee', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Taxa de entrega (R$)')),
+                ('priority', models.PositiveIntegerField(default=0, help_text='Zonas sobrepostas: vale a de menor prioridade.', verbose_name='Prioridade')),
+                ('active', models.BooleanField(default=True, verbose_name='Ativa')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('estabelecimento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='delivery_zones', to='delivery.estabelecimento', verbose_name='Estabelecimento')),
+            ],
+            options={
+                'verbose_name': 'Zona de entrega',
+                'verbose_name_plural': 'Zonas de entrega',
+                'ordering': ['priority', 'id'],
+                'indexes': [models.Index(fields=['estabelecimento', 'active'], name='delivery_de_estabel_d5a60d_idx')],
+            },
+        ),
+    ]
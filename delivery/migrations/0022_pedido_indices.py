@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-19 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0021_deliveryzone'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['pedido_estabelecimento', 'pedido_status', 'pedido_data'], name='pedido_estab_status_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['pedido_estabelecimento', 'pedido_data'], name='pedido_estab_data_idx'),
+        ),
+    ]
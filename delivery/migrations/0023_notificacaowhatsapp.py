@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-19 01:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0022_pedido_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificacaoWhatsApp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notificacao_instancia', models.CharField(max_length=100)),
+                ('notificacao_telefone', models.CharField(max_length=20)),
+                ('notificacao_mensagem', models.TextField()),
+                ('notificacao_status', models.CharField(choices=[('pending', 'Pendente'), ('sending', 'Enviando'), ('sent', 'Enviada'), ('dead', 'Falhou')], default='pending', max_length=20)),
+                ('notificacao_tentativas', models.PositiveIntegerField(default=0)),
+                ('notificacao_proxima_tentativa', models.DateTimeField(default=django.utils.timezone.now)),
+                ('notificacao_ultimo_erro', models.TextField(blank=True, null=True)),
+                ('notificacao_enviada_em', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('notificacao_estabelecimento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes_whatsapp', to='delivery.estabelecimento')),
+                ('notificacao_pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notificacoes_whatsapp', to='delivery.pedido')),
+            ],
+            options={
+                'verbose_name': 'Notificação WhatsApp',
+                'verbose_name_plural': 'Notificações WhatsApp',
+                'indexes': [models.Index(fields=['notificacao_status', 'notificacao_proxima_tentativa'], name='notificacao_fila_idx')],
+            },
+        ),
+    ]
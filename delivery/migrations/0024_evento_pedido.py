@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 01:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0023_notificacaowhatsapp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estabelecimento',
+            name='estabelecimento_evento_seq',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='EventoPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('evento_seq', models.PositiveBigIntegerField()),
+                ('evento_tipo', models.CharField(max_length=30)),
+                ('evento_dados', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('evento_estabelecimento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos_pedido', to='delivery.estabelecimento')),
+            ],
+            options={
+                'verbose_name': 'Evento de Pedido',
+                'verbose_name_plural': 'Eventos de Pedido',
+                'constraints': [models.UniqueConstraint(fields=('evento_estabelecimento', 'evento_seq'), name='evento_estab_seq_uniq')],
+            },
+        ),
+    ]
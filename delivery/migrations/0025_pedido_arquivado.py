@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-19 01:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0024_evento_pedido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PedidoArquivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('pedido_arquivado_data', models.DateTimeField()),
+                ('pedido_arquivado_status', models.CharField(max_length=20)),
+                ('pedido_arquivado_tipo_entrega', models.CharField(max_length=20)),
+                ('pedido_arquivado_valor_total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('pedido_arquivado_taxa_entrega', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('pedido_arquivado_forma_pagamento', models.CharField(max_length=50)),
+                ('pedido_arquivado_dados', models.JSONField()),
+                ('arquivado_em', models.DateTimeField(auto_now_add=True)),
+                ('pedido_arquivado_cliente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pedidos_arquivados', to='delivery.cliente')),
+                ('pedido_arquivado_estabelecimento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pedidos_arquivados', to='delivery.estabelecimento')),
+            ],
+            options={
+                'verbose_name': 'Pedido Arquivado',
+                'verbose_name_plural': 'Pedidos Arquivados',
+                'indexes': [models.Index(fields=['pedido_arquivado_estabelecimento', 'pedido_arquivado_data'], name='arquivado_estab_data_idx'), models.Index(fields=['pedido_arquivado_cliente', 'pedido_arquivado_data'], name='arquivado_cliente_data_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-19 01:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0025_pedido_arquivado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoVendas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resumo_vendas_data', models.DateField()),
+                ('resumo_vendas_hora', models.PositiveSmallIntegerField()),
+                ('resumo_vendas_forma_pagamento', models.CharField(max_length=50)),
+                ('resumo_vendas_tipo_entrega', models.CharField(max_length=20)),
+                ('resumo_vendas_pedidos', models.IntegerField(default=0)),
+                ('resumo_vendas_faturamento', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('resumo_vendas_taxa_entrega', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('resumo_vendas_cancelados', models.IntegerField(default=0)),
+                ('resumo_vendas_valor_cancelado', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('resumo_vendas_estabelecimento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_vendas', to='delivery.estabelecimento')),
+            ],
+            options={
+                'verbose_name': 'Resumo de Vendas',
+                'verbose_name_plural': 'Resumos de Vendas',
+                'constraints': [models.UniqueConstraint(fields=('resumo_vendas_estabelecimento', 'resumo_vendas_data', 'resumo_vendas_hora', 'resumo_vendas_forma_pagamento', 'resumo_vendas_tipo_entrega'), name='resumo_vendas_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumoVendasProduto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resumo_produto_data', models.DateField()),
+                ('resumo_produto_nome', models.CharField(max_length=255)),
+                ('resumo_produto_quantidade', models.IntegerField(default=0)),
+                ('resumo_produto_faturamento', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('resumo_produto_estabelecimento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_produtos', to='delivery.estabelecimento')),
+                ('resumo_produto_produto', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='delivery.produto')),
+            ],
+            options={
+                'verbose_name': 'Resumo de Vendas por Produto',
+                'verbose_name_plural': 'Resumos de Vendas por Produto',
+                'constraints': [models.UniqueConstraint(fields=('resumo_produto_estabelecimento', 'resumo_produto_data', 'resumo_produto_produto'), name='resumo_produto_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0026_resumo_vendas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estabelecimento',
+            name='estabelecimento_colunas_ticket',
+            field=models.PositiveSmallIntegerField(default=48),
+        ),
+        migrations.AddField(
+            model_name='estabelecimento',
+            name='estabelecimento_formato_ticket',
+            field=models.CharField(choices=[('pdf', 'PDF'), ('escpos', 'ESC/POS (impressora térmica)'), ('texto', 'Texto')], default='pdf', max_length=10),
+        ),
+    ]
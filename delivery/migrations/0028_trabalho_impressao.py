@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-19 01:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0027_estabelecimento_formato_ticket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estabelecimento',
+            name='estabelecimento_impressao_automatica',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='TrabalhoImpressao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trabalho_status', models.CharField(choices=[('pending', 'Pendente'), ('sent', 'Enviado'), ('printed', 'Impresso'), ('failed', 'Falhou')], default='pending', max_length=20)),
+                ('trabalho_tentativas', models.PositiveIntegerField(default=0)),
+                ('trabalho_agente', models.CharField(blank=True, max_length=255, null=True)),
+                ('trabalho_enviado_em', models.DateTimeField(blank=True, null=True)),
+                ('trabalho_impresso_em', models.DateTimeField(blank=True, null=True)),
+                ('trabalho_ultimo_erro', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('trabalho_estabelecimento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabalhos_impressao', to='delivery.estabelecimento')),
+                ('trabalho_pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabalhos_impressao', to='delivery.pedido')),
+            ],
+            options={
+                'verbose_name': 'Trabalho de Impressão',
+                'verbose_name_plural': 'Trabalhos de Impressão',
+                'indexes': [models.Index(fields=['trabalho_estabelecimento', 'trabalho_status', 'id'], name='trabalho_fila_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-19 02:19
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_created_at(apps, schema_editor):
+    # Trabalhos existentes expiram pela data de criação, como antes
+    TrabalhoImpressao = apps.get_model('delivery', 'TrabalhoImpressao')
+    TrabalhoImpressao.objects.update(trabalho_enfileirado_em=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0028_trabalho_impressao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabalhoimpressao',
+            name='trabalho_enfileirado_em',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(copy_created_at, migrations.RunPython.noop),
+    ]
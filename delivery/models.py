@@ -1,13 +1,22 @@
 from decimal import Decimal
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django import forms
 from django.forms import inlineformset_factory
+from googlemaps.convert import decode_polyline
 
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
 class Estabelecimento(models.Model):
+    FORMATO_TICKET_CHOICES = (
+        ('pdf', 'PDF'),
+        ('escpos', 'ESC/POS (impressora térmica)'),
+        ('texto', 'Texto'),
+    )
+
     estabelecimento_nome = models.CharField(max_length=255)
     estabelecimento_url = models.SlugField(max_length=255, unique=True)  
     estabelecimento_cnpj = models.CharField(max_length=14, unique=True)  
@@ -27,6 +36,13 @@ class Estabelecimento(models.Model):
     estabelecimento_longitude = models.FloatField()
     estabelecimento_prazo_entrega = models.IntegerField(default=0)
     estabelecimento_aberto = models.BooleanField(default=True)
+    # Impressão dos pedidos: formato padrão e colunas da impressora térmica (32 = 58 mm, 48 = 80 mm)
+    estabelecimento_formato_ticket = models.CharField(max_length=10, choices=FORMATO_TICKET_CHOICES, default='pdf')
+    estabelecimento_colunas_ticket = models.PositiveSmallIntegerField(default=48)
+    # Envia os tickets dos novos pedidos para o agente de impressão local
+    estabelecimento_impressao_automatica = models.BooleanField(default=False)
+    # Último número de sequência dos eventos de pedido enviados pelo websocket
+    estabelecimento_evento_seq = models.PositiveBigIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -62,10 +78,83 @@ class DeliveryRange(models.Model):
     def __str__(self):
             return f"{self.estabelecimento.estabelecimento_nome}: {self.min_distance}km - {self.max_distance}km: R${self.delivery_fee}"
 
+class DeliveryZone(models.Model):
+    estabelecimento = models.ForeignKey(
+        Estabelecimento,
+        on_delete=models.CASCADE,
+        related_name="delivery_zones",
+        verbose_name="Estabelecimento"
+    )
+    name = models.CharField(max_length=100, verbose_name="Nome da zona")
+    polygon = models.TextField(
+        verbose_name="Polígono",
+        help_text="Vértices do polígono no formato de polyline codificada do Google (lat/lng)."
+    )
+    delivery_fee = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Taxa de entrega (R$)")
+    priority = models.PositiveIntegerField(default=0, verbose_name="Prioridade", help_text="Zonas sobrepostas: vale a de menor prioridade.")
+    active = models.BooleanField(default=True, verbose_name="Ativa")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Zona de entrega"
+        verbose_name_plural = "Zonas de entrega"
+        ordering = ['priority', 'id']
+        indexes = [
+            models.Index(fields=['estabelecimento', 'active']),
+        ]
+
+    def clean(self):
+        try:
+            vertices = decode_polyline(self.polygon or '')
+        except Exception:
+            raise ValidationError({'polygon': "Polyline inválida."})
+        if len(vertices) < 3:
+            raise ValidationError({'polygon': "O polígono precisa de pelo menos 3 vértices."})
+
+    def __str__(self):
+        return f"{self.estabelecimento.estabelecimento_nome}: {self.name} - R${self.delivery_fee}"
+
+class Cep(models.Model):
+    # Índice local de CEPs importado de base pública (ver comando importar_ceps)
+    cep_codigo = models.CharField(max_length=8, primary_key=True)
+    cep_logradouro = models.CharField(max_length=255, blank=True)
+    cep_bairro = models.CharField(max_length=255, blank=True)
+    cep_cidade = models.CharField(max_length=100)
+    cep_estado = models.CharField(max_length=2)
+    cep_latitude = models.FloatField(null=True, blank=True)
+    cep_longitude = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "CEP"
+        verbose_name_plural = "CEPs"
+
+    def __str__(self):
+        return f"{self.cep_codigo} - {self.cep_logradouro}, {self.cep_cidade}/{self.cep_estado}"
+
+class UserProfileQuerySet(models.QuerySet):
+    # update() e bulk_update() não disparam post_save: invalida aqui o vínculo
+    # usuário -> estabelecimento guardado em cache pela autenticação do websocket
+
+    def update(self, **kwargs):
+        from .auth import invalidate_users_membership
+        user_ids = list(self.values_list('user_id', flat=True))
+        atualizados = super().update(**kwargs)
+        invalidate_users_membership(user_ids)
+        return atualizados
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        from .auth import invalidate_users_membership
+        objs = list(objs)
+        atualizados = super().bulk_update(objs, fields, batch_size=batch_size)
+        invalidate_users_membership(obj.user_id for obj in objs)
+        return atualizados
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     estabelecimento = models.ForeignKey(Estabelecimento, on_delete=models.CASCADE, related_name='users')
 
+    objects = UserProfileQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Perfil de Usuário"
         verbose_name_plural = "Perfis de Usuários"
@@ -199,6 +288,13 @@ class Cliente(models.Model):
     cliente_numero = models.CharField(max_length=10)
     cliente_complemento = models.CharField(max_length=100, blank=True, null=True)
     cliente_taxa_entrega = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Resultado da geocodificação, reaproveitado enquanto o endereço não mudar
+    cliente_latitude = models.FloatField(null=True, blank=True)
+    cliente_longitude = models.FloatField(null=True, blank=True)
+    cliente_location_type = models.CharField(max_length=30, blank=True, null=True)
+    cliente_partial_match = models.BooleanField(default=False)
+    cliente_distancia_km = models.FloatField(null=True, blank=True)
+    cliente_endereco_hash = models.CharField(max_length=64, blank=True, null=True)
 
     class Meta:
         verbose_name = "Cliente"
@@ -238,6 +334,19 @@ class Pedido(models.Model):
         ('retirada', 'Retirada'),
     )
 
+    # Status em andamento (colunas do quadro de pedidos); completed e cancelled são finais
+    ACTIVE_STATUSES = ('pending', 'preparing', 'ready', 'delivery')
+
+    # Transições aceitas na alteração de status em lote (status atual -> novos status)
+    STATUS_TRANSITIONS = {
+        'pending': ('preparing', 'cancelled'),
+        'preparing': ('ready', 'cancelled'),
+        'ready': ('delivery', 'completed', 'cancelled'),
+        'delivery': ('completed', 'cancelled'),
+        'completed': (),
+        'cancelled': (),
+    }
+
     pedido_estabelecimento = models.ForeignKey(Estabelecimento, on_delete=models.CASCADE, related_name='pedido')
     pedido_cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
     pedido_data = models.DateTimeField(auto_now_add=True)
@@ -247,13 +356,23 @@ class Pedido(models.Model):
     pedido_valor_total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     pedido_forma_pagamento = models.ForeignKey(FormasDePagamento, on_delete=models.CASCADE, blank=False, null=False)
     pedido_troco = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)  
+    pedido_taxa_entrega = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    pedido_distancia_km = models.FloatField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Quadro de pedidos e listagem: estabelecimento + status, ordenado por data
+            models.Index(fields=['pedido_estabelecimento', 'pedido_status', 'pedido_data'], name='pedido_estab_status_data_idx'),
+            # Relatórios e histórico por período, sem filtro de status
+            models.Index(fields=['pedido_estabelecimento', 'pedido_data'], name='pedido_estab_data_idx'),
+        ]
+
     def calcular_valor_total(self):
         itens = ItensPedido.objects.filter(itens_pedido_pedido=self).prefetch_related('itens_pedido_acrescimos')
         total = sum(item.itens_pedido_preco_final for item in itens)
-        self.pedido_valor_total = total
+        self.pedido_valor_total = total + Decimal(str(self.pedido_taxa_entrega or 0))
         self.save()
 
     def __str__(self):
@@ -297,6 +416,174 @@ class ItensPedido(models.Model):
     def __str__(self):
         return f'Item {self.id}'
 
+class PedidoArquivado(models.Model):
+    """
+    Pedido finalizado movido para fora da tabela de pedidos. O id é o mesmo do
+    pedido original; os itens ficam no JSON (mesmo formato do resumo da listagem).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    pedido_arquivado_estabelecimento = models.ForeignKey(Estabelecimento, on_delete=models.CASCADE, related_name='pedidos_arquivados')
+    pedido_arquivado_cliente = models.ForeignKey(Cliente, on_delete=models.SET_NULL, null=True, blank=True, related_name='pedidos_arquivados')
+    pedido_arquivado_data = models.DateTimeField()
+    pedido_arquivado_status = models.CharField(max_length=20)
+    pedido_arquivado_tipo_entrega = models.CharField(max_length=20)
+    pedido_arquivado_valor_total = models.DecimalField(max_digits=10, decimal_places=2)
+    pedido_arquivado_taxa_entrega = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    pedido_arquivado_forma_pagamento = models.CharField(max_length=50)
+    pedido_arquivado_dados = models.JSONField()
+    arquivado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Pedido Arquivado"
+        verbose_name_plural = "Pedidos Arquivados"
+        indexes = [
+            models.Index(fields=['pedido_arquivado_estabelecimento', 'pedido_arquivado_data'], name='arquivado_estab_data_idx'),
+            models.Index(fields=['pedido_arquivado_cliente', 'pedido_arquivado_data'], name='arquivado_cliente_data_idx'),
+        ]
+
+    def __str__(self):
+        return f'Pedido {self.id} (arquivado)'
+
+class ResumoVendas(models.Model):
+    """
+    Consolidado de vendas por estabelecimento, dia e hora (horário local),
+    aberto por forma de pagamento e tipo de entrega. Atualizado de forma
+    incremental quando um pedido é concluído ou cancelado.
+    """
+    resumo_vendas_estabelecimento = models.ForeignKey(Estabelecimento, on_delete=models.CASCADE, related_name='resumos_vendas')
+    resumo_vendas_data = models.DateField()
+    resumo_vendas_hora = models.PositiveSmallIntegerField()
+    resumo_vendas_forma_pagamento = models.CharField(max_length=50)
+    resumo_vendas_tipo_entrega = models.CharField(max_length=20)
+    resumo_vendas_pedidos = models.IntegerField(default=0)
+    resumo_vendas_faturamento = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    resumo_vendas_taxa_entrega = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+    resumo_vendas_cancelados = models.IntegerField(default=0)
+    resumo_vendas_valor_cancelado = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+
+    class Meta:
+        verbose_name = "Resumo de Vendas"
+        verbose_name_plural = "Resumos de Vendas"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['resumo_vendas_estabelecimento', 'resumo_vendas_data', 'resumo_vendas_hora', 'resumo_vendas_forma_pagamento', 'resumo_vendas_tipo_entrega'],
+                name='resumo_vendas_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.resumo_vendas_data} {self.resumo_vendas_hora}h'
+
+class ResumoVendasProduto(models.Model):
+    # Quantidade e faturamento por produto e dia (pedidos concluídos)
+    resumo_produto_estabelecimento = models.ForeignKey(Estabelecimento, on_delete=models.CASCADE, related_name='resumos_produtos')
+    resumo_produto_data = models.DateField()
+    # Sem constraint: o histórico continua valendo se o produto for excluído
+    resumo_produto_produto = models.ForeignKey(Produto, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    resumo_produto_nome = models.CharField(max_length=255)
+    resumo_produto_quantidade = models.IntegerField(default=0)
+    resumo_produto_faturamento = models.DecimalField(max_digits=12, decimal_places=2, default=0.00)
+
+    class Meta:
+        verbose_name = "Resumo de Vendas por Produto"
+        verbose_name_plural = "Resumos de Vendas por Produto"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['resumo_produto_estabelecimento', 'resumo_produto_data', 'resumo_produto_produto'],
+                name='resumo_produto_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.resumo_produto_nome} {self.resumo_produto_data}'
+
+class NotificacaoWhatsApp(models.Model):
+    # Outbox de mensagens: gravada na mesma transação da mudança de status e
+    # enviada pelo comando enviar_whatsapp
+
+    STATUS_CHOICES = (
+        ('pending', 'Pendente'),
+        ('sending', 'Enviando'),
+        ('sent', 'Enviada'),
+        ('dead', 'Falhou'),
+    )
+
+    notificacao_estabelecimento = models.ForeignKey(Estabelecimento, on_delete=models.CASCADE, related_name='notificacoes_whatsapp')
+    notificacao_pedido = models.ForeignKey('Pedido', on_delete=models.SET_NULL, null=True, blank=True, related_name='notificacoes_whatsapp')
+    notificacao_instancia = models.CharField(max_length=100)
+    notificacao_telefone = models.CharField(max_length=20)
+    notificacao_mensagem = models.TextField()
+    notificacao_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    notificacao_tentativas = models.PositiveIntegerField(default=0)
+    notificacao_proxima_tentativa = models.DateTimeField(default=timezone.now)
+    notificacao_ultimo_erro = models.TextField(blank=True, null=True)
+    notificacao_enviada_em = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Notificação WhatsApp"
+        verbose_name_plural = "Notificações WhatsApp"
+        indexes = [
+            models.Index(fields=['notificacao_status', 'notificacao_proxima_tentativa'], name='notificacao_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"Notificação {self.id} ({self.notificacao_status})"
+
+class EventoPedido(models.Model):
+    # Log limitado dos eventos do websocket, para reenvio após reconexão
+    evento_estabelecimento = models.ForeignKey(Estabelecimento, on_delete=models.CASCADE, related_name='eventos_pedido')
+    evento_seq = models.PositiveBigIntegerField()
+    evento_tipo = models.CharField(max_length=30)
+    evento_dados = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Evento de Pedido"
+        verbose_name_plural = "Eventos de Pedido"
+        constraints = [
+            models.UniqueConstraint(fields=['evento_estabelecimento', 'evento_seq'], name='evento_estab_seq_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Evento {self.evento_seq} ({self.evento_tipo})"
+
+class TrabalhoImpressao(models.Model):
+    # Fila de impressão dos agentes locais: o trabalho fica pendente até o
+    # agente confirmar a impressão, mesmo que esteja desconectado
+
+    STATUS_CHOICES = (
+        ('pending', 'Pendente'),
+        ('sent', 'Enviado'),
+        ('printed', 'Impresso'),
+        ('failed', 'Falhou'),
+    )
+
+    trabalho_estabelecimento = models.ForeignKey(Estabelecimento, on_delete=models.CASCADE, related_name='trabalhos_impressao')
+    trabalho_pedido = models.ForeignKey('Pedido', on_delete=models.SET_NULL, null=True, blank=True, related_name='trabalhos_impressao')
+    trabalho_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    trabalho_tentativas = models.PositiveIntegerField(default=0)
+    # Canal do agente que recebeu o trabalho e ainda não confirmou
+    trabalho_agente = models.CharField(max_length=255, blank=True, null=True)
+    trabalho_enviado_em = models.DateTimeField(blank=True, null=True)
+    trabalho_impresso_em = models.DateTimeField(blank=True, null=True)
+    trabalho_ultimo_erro = models.TextField(blank=True, null=True)
+    # Entrada na fila (criação ou reimpressão pelo admin), base da expiração PRINT_JOB_MAX_AGE
+    trabalho_enfileirado_em = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Trabalho de Impressão"
+        verbose_name_plural = "Trabalhos de Impressão"
+        indexes = [
+            models.Index(fields=['trabalho_estabelecimento', 'trabalho_status', 'id'], name='trabalho_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"Impressão {self.id} do pedido {self.trabalho_pedido_id} ({self.trabalho_status})"
+
 class Promocao(models.Model):
     promocao_estabelecimento = models.ForeignKey('Estabelecimento', on_delete=models.CASCADE, related_name='promoco7630es')
     promocao_image = models.ImageField(upload_to='delivery/imgs', blank=True, null=True)
@@ -0,0 +1,158 @@
+import base64
+import logging
+from datetime import timedelta
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import TrabalhoImpressao
+from .receipts import load_receipt_data, render_text, render_escpos
+
+logger = logging.getLogger(__name__)
+
+# Trabalho enviado e não confirmado nesse prazo volta a ser entregue
+PRINT_JOB_ACK_TIMEOUT = getattr(settings, 'PRINT_JOB_ACK_TIMEOUT', 120)
+# Trabalhos na fila há mais que isso não são mais impressos (ex.: agente desligado desde ontem)
+PRINT_JOB_MAX_AGE = getattr(settings, 'PRINT_JOB_MAX_AGE', 12 * 3600)
+PRINT_JOB_MAX_TENTATIVAS = getattr(settings, 'PRINT_JOB_MAX_TENTATIVAS', 5)
+PRINT_JOB_BATCH = 20
+# Intervalo em que cada agente conectado procura trabalhos sem confirmação vencidos
+PRINT_JOB_RECLAIM_INTERVAL = getattr(settings, 'PRINT_JOB_RECLAIM_INTERVAL', 30)
+
+# Formatos aceitos pelo agente: bytes ESC/POS (base64), texto ou os dados do ticket
+PRINT_AGENT_FORMATS = ('escpos', 'texto', 'dados')
+
+def printer_group(estabelecimento_id):
+    return f'printers_{estabelecimento_id}'
+
+def _notify_agents(estabelecimento_id):
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            printer_group(estabelecimento_id),
+            {'type': 'print_jobs_available'}
+        )
+    except Exception as e:
+        # Os trabalhos continuam na fila e são entregues na próxima conexão do agente
+        logger.error("Erro ao avisar agentes de impressão do estabelecimento %s: %s", estabelecimento_id, str(e))
+
+def enqueue_print_jobs(estabelecimento_id, pedido_ids):
+    """
+    Grava os trabalhos de impressão e avisa os agentes conectados depois do
+    commit. Agentes desconectados recebem os pendentes ao reconectar.
+    """
+    trabalhos = TrabalhoImpressao.objects.bulk_create([
+        TrabalhoImpressao(trabalho_estabelecimento_id=estabelecimento_id, trabalho_pedido_id=pedido_id)
+        for pedido_id in pedido_ids
+    ])
+    transaction.on_commit(lambda: _notify_agents(estabelecimento_id))
+    return trabalhos
+
+def claim_print_jobs(estabelecimento_id, agente, limit=PRINT_JOB_BATCH):
+    """
+    Reserva para o agente os trabalhos pendentes (e os enviados sem confirmação
+    há mais de PRINT_JOB_ACK_TIMEOUT), em ordem de criação. Com vários agentes
+    no mesmo estabelecimento, cada trabalho vai para apenas um deles.
+    Retorna ([(trabalho_id, pedido_id)], linhas lidas); as linhas lidas incluem
+    os trabalhos descartados por excesso de tentativas, para que o chamador
+    saiba se a fila pode ter mais trabalhos.
+    """
+    agora = timezone.now()
+    fila = TrabalhoImpressao.objects.filter(trabalho_estabelecimento_id=estabelecimento_id)
+    with transaction.atomic():
+        fila.filter(
+            trabalho_status__in=('pending', 'sent'),
+            trabalho_enfileirado_em__lt=agora - timedelta(seconds=PRINT_JOB_MAX_AGE)
+        ).update(trabalho_status='failed', trabalho_agente=None, trabalho_ultimo_erro='Expirado sem impressão', updated_at=agora)
+
+        pendentes = fila.filter(
+            Q(trabalho_status='pending') |
+            Q(trabalho_status='sent', trabalho_enviado_em__lt=agora - timedelta(seconds=PRINT_JOB_ACK_TIMEOUT))
+        ).order_by('id').select_for_update(skip_locked=True)
+        lote = list(pendentes.values_list('id', 'trabalho_pedido_id', 'trabalho_tentativas')[:limit])
+        lidos = len(lote)
+
+        esgotados = [trabalho_id for trabalho_id, _, tentativas in lote if tentativas >= PRINT_JOB_MAX_TENTATIVAS]
+        if esgotados:
+            logger.error(f"Trabalhos de impressão descartados após {PRINT_JOB_MAX_TENTATIVAS} tentativas: {esgotados}")
+            TrabalhoImpressao.objects.filter(id__in=esgotados).update(
+                trabalho_status='failed', trabalho_agente=None, updated_at=agora
+            )
+        lote = [(trabalho_id, pedido_id) for trabalho_id, pedido_id, tentativas in lote if tentativas < PRINT_JOB_MAX_TENTATIVAS]
+        if lote:
+            TrabalhoImpressao.objects.filter(id__in=[trabalho_id for trabalho_id, _ in lote]).update(
+                trabalho_status='sent',
+                trabalho_agente=agente,
+                trabalho_enviado_em=agora,
+                trabalho_tentativas=F('trabalho_tentativas') + 1,
+                updated_at=agora
+            )
+    return lote, lidos
+
+def build_print_messages(lote, formato, colunas=None):
+    """
+    Mensagens do websocket para os trabalhos reservados. Os tickets são montados
+    no envio (3 consultas para o lote); trabalhos cujo pedido não existe mais
+    são marcados como falhos.
+    """
+    dados = {item['id']: item for item in load_receipt_data([pedido_id for _, pedido_id in lote if pedido_id])}
+    mensagens = []
+    perdidos = []
+    for trabalho_id, pedido_id in lote:
+        ticket = dados.get(pedido_id)
+        if ticket is None:
+            perdidos.append(trabalho_id)
+            continue
+        mensagem = {'type': 'print_job', 'job_id': trabalho_id, 'pedido_id': pedido_id, 'formato': formato}
+        if formato == 'escpos':
+            mensagem['conteudo'] = base64.b64encode(render_escpos(ticket, colunas)).decode('ascii')
+        elif formato == 'texto':
+            mensagem['conteudo'] = render_text(ticket, colunas)
+        else:
+            mensagem['dados'] = ticket
+        mensagens.append(mensagem)
+    if perdidos:
+        TrabalhoImpressao.objects.filter(id__in=perdidos).update(
+            trabalho_status='failed', trabalho_agente=None, trabalho_ultimo_erro='Pedido não encontrado', updated_at=timezone.now()
+        )
+    return mensagens
+
+def confirm_print_job(estabelecimento_id, trabalho_id):
+    agora = timezone.now()
+    return bool(TrabalhoImpressao.objects.filter(
+        id=trabalho_id, trabalho_estabelecimento_id=estabelecimento_id, trabalho_status='sent'
+    ).update(
+        trabalho_status='printed', trabalho_agente=None, trabalho_impresso_em=agora,
+        trabalho_ultimo_erro=None, updated_at=agora
+    ))
+
+def fail_print_job(estabelecimento_id, trabalho_id, erro):
+    """
+    O agente não conseguiu imprimir (sem papel, impressora desligada...): o
+    trabalho volta para a fila e é reenviado no próximo aviso ou reconexão.
+    """
+    logger.warning(f"Agente de impressão falhou no trabalho {trabalho_id}: {erro}")
+    return bool(TrabalhoImpressao.objects.filter(
+        id=trabalho_id, trabalho_estabelecimento_id=estabelecimento_id, trabalho_status='sent'
+    ).update(
+        trabalho_status='pending', trabalho_agente=None, trabalho_ultimo_erro=str(erro)[:1000], updated_at=timezone.now()
+    ))
+
+def release_print_jobs(estabelecimento_id, agente):
+    # Agente desconectou: o que ele não confirmou volta para a fila dos outros agentes
+    with transaction.atomic():
+        liberados = TrabalhoImpressao.objects.filter(
+            trabalho_estabelecimento_id=estabelecimento_id, trabalho_status='sent', trabalho_agente=agente
+        ).update(trabalho_status='pending', trabalho_agente=None, updated_at=timezone.now())
+        if liberados:
+            transaction.on_commit(lambda: _notify_agents(estabelecimento_id))
+    return liberados
+
+def requeue_print_jobs(trabalhos):
+    # Reimpressão manual (admin): recoloca na fila, inclusive os que falharam
+    estabelecimentos = set(trabalhos.values_list('trabalho_estabelecimento_id', flat=True))
+    agora = timezone.now()
+    trabalhos.update(trabalho_status='pending', trabalho_tentativas=0, trabalho_agente=None, trabalho_enfileirado_em=agora, updated_at=agora)
+    for estabelecimento_id in estabelecimentos:
+        transaction.on_commit(lambda estabelecimento_id=estabelecimento_id: _notify_agents(estabelecimento_id))
@@ -0,0 +1,157 @@
+import textwrap
+from datetime import datetime
+from decimal import Decimal
+from .models import Pedido
+from .summaries import PEDIDO_SUMMARY_FIELDS, summarize_order_rows
+
+# Renderização de tickets em texto puro e ESC/POS para impressoras térmicas,
+# sem WeasyPrint: os mesmos dados do resumo do pedido, formatados em colunas.
+
+# Larguras aceitas (caracteres por linha), de bobinas de 58 mm a 80 mm com fonte condensada
+TICKET_COLUMNS_MIN = 24
+TICKET_COLUMNS_MAX = 64
+
+def parse_columns(value):
+    """
+    Converte o parâmetro ?colunas=; None quando ausente. Levanta ValueError
+    fora de TICKET_COLUMNS_MIN..TICKET_COLUMNS_MAX.
+    """
+    if value in (None, ''):
+        return None
+    colunas = int(value)
+    if not TICKET_COLUMNS_MIN <= colunas <= TICKET_COLUMNS_MAX:
+        raise ValueError(f"Colunas devem estar entre {TICKET_COLUMNS_MIN} e {TICKET_COLUMNS_MAX}")
+    return colunas
+
+RECEIPT_EXTRA_FIELDS = (
+    'pedido_estabelecimento__estabelecimento_nome',
+    'pedido_estabelecimento__estabelecimento_formato_ticket',
+    'pedido_estabelecimento__estabelecimento_colunas_ticket',
+    'pedido_cliente__cliente_rua',
+    'pedido_cliente__cliente_numero',
+    'pedido_cliente__cliente_complemento',
+    'pedido_cliente__cliente_bairro',
+)
+
+# Comandos ESC/POS
+ESC_INIT = b'\x1b@'
+ESC_CODEPAGE_PC860 = b'\x1bt\x03'  # Português
+ESC_ALIGN_LEFT = b'\x1ba\x00'
+ESC_ALIGN_CENTER = b'\x1ba\x01'
+ESC_BOLD_ON = b'\x1bE\x01'
+ESC_BOLD_OFF = b'\x1bE\x00'
+GS_DOUBLE_HEIGHT = b'\x1d!\x01'
+GS_NORMAL_SIZE = b'\x1d!\x00'
+GS_FEED_AND_CUT = b'\x1dVB\x03'
+ESCPOS_ENCODING = 'cp860'
+
+def load_receipt_data(pedido_ids, **filtros):
+    """
+    Dados dos tickets na ordem de pedido_ids: um SELECT para os pedidos e dois
+    para itens e acréscimos, qualquer que seja a quantidade.
+    """
+    rows = list(Pedido.objects.filter(id__in=pedido_ids, **filtros).values(*PEDIDO_SUMMARY_FIELDS, *RECEIPT_EXTRA_FIELDS))
+    extras = {row['id']: row for row in rows}
+    dados = {}
+    for resumo in summarize_order_rows(rows):
+        row = extras[resumo['id']]
+        resumo.update({
+            'estabelecimento_nome': row['pedido_estabelecimento__estabelecimento_nome'],
+            'formato_ticket': row['pedido_estabelecimento__estabelecimento_formato_ticket'],
+            'colunas_ticket': row['pedido_estabelecimento__estabelecimento_colunas_ticket'],
+        })
+        resumo['pedido_cliente'].update({
+            'cliente_rua': row['pedido_cliente__cliente_rua'],
+            'cliente_numero': row['pedido_cliente__cliente_numero'],
+            'cliente_complemento': row['pedido_cliente__cliente_complemento'],
+            'cliente_bairro': row['pedido_cliente__cliente_bairro'],
+        })
+        dados[resumo['id']] = resumo
+    return [dados[pedido_id] for pedido_id in pedido_ids if pedido_id in dados]
+
+def _money(valor):
+    valor = Decimal(str(valor or 0)).quantize(Decimal('0.01'))
+    inteiro, centavos = f"{valor:,.2f}".split('.')
+    return f"R$ {inteiro.replace(',', '.')},{centavos}"
+
+def _columns(esquerda, direita, largura):
+    # Texto à esquerda (quebrado se preciso) e valor alinhado à direita na última linha
+    linhas = textwrap.wrap(esquerda, largura - len(direita) - 1) or ['']
+    linhas[-1] = linhas[-1].ljust(largura - len(direita)) + direita
+    return linhas
+
+def receipt_lines(dados, largura):
+    """
+    Linhas do ticket como (texto, estilo, centralizado); estilo é None,
+    'titulo' ou 'negrito'.
+    """
+    separador = ('-' * largura, None, False)
+    linhas = []
+
+    def add(texto, estilo=None, centro=False, recuo=''):
+        for parte in textwrap.wrap(texto, largura, subsequent_indent=recuo) or ['']:
+            linhas.append((parte, estilo, centro))
+
+    add(dados['estabelecimento_nome'] or '', 'titulo', True)
+    add(f"Pedido #{str(dados['id']).zfill(6)}", 'negrito', True)
+    data = datetime.fromisoformat(dados['pedido_data']) if dados['pedido_data'] else None
+    if data:
+        add(data.strftime('%d/%m/%Y %H:%M'), centro=True)
+    linhas.append(separador)
+
+    cliente = dados['pedido_cliente']
+    add(f"Cliente: {cliente['cliente_nome']}")
+    add(f"Tel: {cliente['cliente_telefone']}")
+    if dados['pedido_tipo_entrega'] == 'retirada':
+        add('Retirada no local', 'negrito')
+    else:
+        endereco = f"{cliente['cliente_rua']}, {cliente['cliente_numero']}"
+        if cliente['cliente_complemento']:
+            endereco += f" - {cliente['cliente_complemento']}"
+        if cliente['cliente_bairro']:
+            endereco += f" - {cliente['cliente_bairro']}"
+        add(f"Entrega: {endereco}", recuo='  ')
+    linhas.append(separador)
+
+    for item in dados['itens']:
+        nome = f"{item['itens_pedido_quantidade']}x {item['produto_nome']}"
+        if item['tamanho_nome']:
+            nome += f" ({item['tamanho_nome']})"
+        for parte in _columns(nome, _money(item['itens_pedido_preco_final']), largura):
+            linhas.append((parte, 'negrito', False))
+        for acrescimo in item['acrescimos']:
+            add(f"   + {acrescimo}", recuo='     ')
+    linhas.append(separador)
+
+    if Decimal(dados['pedido_taxa_entrega'] or 0):
+        linhas.extend((parte, None, False) for parte in _columns('Taxa de entrega', _money(dados['pedido_taxa_entrega']), largura))
+    linhas.extend((parte, 'negrito', False) for parte in _columns('TOTAL', _money(dados['pedido_valor_total']), largura))
+    add(f"Pagamento: {dados['pedido_forma_pagamento']}")
+    if dados['pedido_troco']:
+        add(f"Troco: {_money(dados['pedido_troco'])}")
+    if dados['pedido_observacao']:
+        linhas.append(separador)
+        add(f"Obs: {dados['pedido_observacao']}", 'negrito')
+    return linhas
+
+def render_text(dados, largura=None):
+    largura = largura or dados['colunas_ticket']
+    return '\n'.join(
+        texto.center(largura).rstrip() if centro else texto
+        for texto, _, centro in receipt_lines(dados, largura)
+    ) + '\n'
+
+def render_escpos(dados, largura=None):
+    largura = largura or dados['colunas_ticket']
+    saida = [ESC_INIT, ESC_CODEPAGE_PC860]
+    for texto, estilo, centro in receipt_lines(dados, largura):
+        saida.append(ESC_ALIGN_CENTER if centro else ESC_ALIGN_LEFT)
+        if estilo == 'titulo':
+            saida.append(GS_DOUBLE_HEIGHT + ESC_BOLD_ON)
+        elif estilo == 'negrito':
+            saida.append(ESC_BOLD_ON)
+        saida.append(texto.encode(ESCPOS_ENCODING, errors='replace') + b'\n')
+        if estilo:
+            saida.append(GS_NORMAL_SIZE + ESC_BOLD_OFF)
+    saida.append(GS_FEED_AND_CUT)
+    return b''.join(saida)
@@ -0,0 +1,228 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Pedido, ItensPedido, PedidoArquivado, ResumoVendas, ResumoVendasProduto
+
+logger = logging.getLogger(__name__)
+
+# Só pedidos nesses status entram nos consolidados de vendas
+ROLLUP_STATUSES = ('completed', 'cancelled')
+
+PEDIDO_ROLLUP_FIELDS = (
+    'id',
+    'pedido_estabelecimento_id',
+    'pedido_data',
+    'pedido_status',
+    'pedido_tipo_entrega',
+    'pedido_valor_total',
+    'pedido_taxa_entrega',
+    'pedido_forma_pagamento__forma_pagamento_nome',
+)
+
+class RollupDelta:
+    # Variações acumuladas em memória, aplicadas no banco de uma vez por chave
+    def __init__(self):
+        self.vendas = defaultdict(lambda: {
+            'resumo_vendas_pedidos': 0,
+            'resumo_vendas_faturamento': Decimal('0'),
+            'resumo_vendas_taxa_entrega': Decimal('0'),
+            'resumo_vendas_cancelados': 0,
+            'resumo_vendas_valor_cancelado': Decimal('0'),
+        })
+        self.produtos = defaultdict(lambda: {
+            'resumo_produto_quantidade': 0,
+            'resumo_produto_faturamento': Decimal('0'),
+        })
+        self.nomes = {}
+
+    def add_order(self, estabelecimento_id, data, status, tipo_entrega, forma_pagamento, valor_total, taxa_entrega, itens, sinal=1):
+        local = timezone.localtime(data)
+        chave = (estabelecimento_id, local.date(), local.hour, forma_pagamento or '', tipo_entrega)
+        valor_total = Decimal(str(valor_total or 0))
+        if status == 'completed':
+            self.vendas[chave]['resumo_vendas_pedidos'] += sinal
+            self.vendas[chave]['resumo_vendas_faturamento'] += sinal * valor_total
+            self.vendas[chave]['resumo_vendas_taxa_entrega'] += sinal * Decimal(str(taxa_entrega or 0))
+            for produto_id, nome, quantidade, preco_final in itens:
+                chave_produto = (estabelecimento_id, local.date(), produto_id)
+                self.nomes[chave_produto] = nome
+                self.produtos[chave_produto]['resumo_produto_quantidade'] += sinal * quantidade
+                self.produtos[chave_produto]['resumo_produto_faturamento'] += sinal * Decimal(str(preco_final or 0))
+        elif status == 'cancelled':
+            self.vendas[chave]['resumo_vendas_cancelados'] += sinal
+            self.vendas[chave]['resumo_vendas_valor_cancelado'] += sinal * valor_total
+
+    def _increment(self, model, chave, deltas, valores=None):
+        valores = valores or {}
+        incrementos = {campo: F(campo) + valor for campo, valor in deltas.items()}
+        if model.objects.filter(**chave).update(**incrementos, **valores):
+            return
+        try:
+            with transaction.atomic():
+                model.objects.create(**chave, **deltas, **valores)
+        except IntegrityError:
+            # Criada por outra transação entre o UPDATE e o INSERT
+            model.objects.filter(**chave).update(**incrementos, **valores)
+
+    def apply(self):
+        for (estabelecimento_id, data, hora, forma_pagamento, tipo_entrega), deltas in self.vendas.items():
+            self._increment(ResumoVendas, {
+                'resumo_vendas_estabelecimento_id': estabelecimento_id,
+                'resumo_vendas_data': data,
+                'resumo_vendas_hora': hora,
+                'resumo_vendas_forma_pagamento': forma_pagamento,
+                'resumo_vendas_tipo_entrega': tipo_entrega,
+            }, deltas)
+        for (estabelecimento_id, data, produto_id), deltas in self.produtos.items():
+            self._increment(ResumoVendasProduto, {
+                'resumo_produto_estabelecimento_id': estabelecimento_id,
+                'resumo_produto_data': data,
+                'resumo_produto_produto_id': produto_id,
+            }, deltas, {'resumo_produto_nome': self.nomes[(estabelecimento_id, data, produto_id)]})
+
+    def create(self, batch_size=1000):
+        # Para recálculo completo: as linhas do período já foram apagadas
+        ResumoVendas.objects.bulk_create([
+            ResumoVendas(
+                resumo_vendas_estabelecimento_id=estabelecimento_id,
+                resumo_vendas_data=data,
+                resumo_vendas_hora=hora,
+                resumo_vendas_forma_pagamento=forma_pagamento,
+                resumo_vendas_tipo_entrega=tipo_entrega,
+                **deltas
+            )
+            for (estabelecimento_id, data, hora, forma_pagamento, tipo_entrega), deltas in self.vendas.items()
+        ], batch_size=batch_size)
+        ResumoVendasProduto.objects.bulk_create([
+            ResumoVendasProduto(
+                resumo_produto_estabelecimento_id=estabelecimento_id,
+                resumo_produto_data=data,
+                resumo_produto_produto_id=produto_id,
+                resumo_produto_nome=self.nomes[(estabelecimento_id, data, produto_id)],
+                **deltas
+            )
+            for (estabelecimento_id, data, produto_id), deltas in self.produtos.items()
+        ], batch_size=batch_size)
+        return len(self.vendas), len(self.produtos)
+
+def _order_items(pedido_ids):
+    itens = defaultdict(list)
+    rows = ItensPedido.objects.filter(itens_pedido_pedido_id__in=pedido_ids).values_list(
+        'itens_pedido_pedido_id', 'itens_pedido_produto_id', 'itens_pedido_produto__produto_nome',
+        'itens_pedido_quantidade', 'itens_pedido_preco_final'
+    )
+    for pedido_id, *item in rows:
+        itens[pedido_id].append(item)
+    return itens
+
+def _add_order_row(delta, row, status, itens, sinal=1):
+    delta.add_order(
+        row['pedido_estabelecimento_id'],
+        row['pedido_data'],
+        status,
+        row['pedido_tipo_entrega'],
+        row['pedido_forma_pagamento__forma_pagamento_nome'],
+        row['pedido_valor_total'],
+        row['pedido_taxa_entrega'],
+        itens,
+        sinal
+    )
+
+def apply_status_change(pedido_ids, status_anteriores, novo_status):
+    """
+    Atualiza os consolidados para pedidos que mudaram de status: desfaz a
+    contribuição do status anterior e soma a do novo. Chamar dentro da
+    transação da mudança de status.
+    """
+    afetados = [
+        pedido_id for pedido_id in pedido_ids
+        if status_anteriores.get(pedido_id) != novo_status
+        and (status_anteriores.get(pedido_id) in ROLLUP_STATUSES or novo_status in ROLLUP_STATUSES)
+    ]
+    if not afetados:
+        return
+    rows = list(Pedido.objects.filter(id__in=afetados).values(*PEDIDO_ROLLUP_FIELDS))
+    precisa_itens = novo_status == 'completed' or any(status_anteriores[pedido_id] == 'completed' for pedido_id in afetados)
+    itens = _order_items(afetados) if precisa_itens else {}
+
+    delta = RollupDelta()
+    for row in rows:
+        anterior = status_anteriores[row['id']]
+        if anterior in ROLLUP_STATUSES:
+            _add_order_row(delta, row, anterior, itens.get(row['id'], []), sinal=-1)
+        if novo_status in ROLLUP_STATUSES:
+            _add_order_row(delta, row, novo_status, itens.get(row['id'], []))
+    delta.apply()
+
+def _local_bounds(inicio, fim):
+    # Datas locais (inclusive) -> intervalo [início, fim) em datetime com fuso
+    inicio_dt = timezone.make_aware(datetime.combine(inicio, dt_time.min)) if inicio else None
+    fim_dt = timezone.make_aware(datetime.combine(fim + timedelta(days=1), dt_time.min)) if fim else None
+    return inicio_dt, fim_dt
+
+def rebuild_rollups(estabelecimento_id=None, inicio=None, fim=None, lote=2000):
+    """
+    Recalcula os consolidados do período (datas locais, inclusive) a partir dos
+    pedidos e dos pedidos arquivados. Usado para a carga inicial e correções.
+    """
+    inicio_dt, fim_dt = _local_bounds(inicio, fim)
+    vendas = ResumoVendas.objects.all()
+    produtos = ResumoVendasProduto.objects.all()
+    pedidos = Pedido.objects.filter(pedido_status__in=ROLLUP_STATUSES)
+    arquivados = PedidoArquivado.objects.filter(pedido_arquivado_status__in=ROLLUP_STATUSES)
+    if estabelecimento_id:
+        vendas = vendas.filter(resumo_vendas_estabelecimento_id=estabelecimento_id)
+        produtos = produtos.filter(resumo_produto_estabelecimento_id=estabelecimento_id)
+        pedidos = pedidos.filter(pedido_estabelecimento_id=estabelecimento_id)
+        arquivados = arquivados.filter(pedido_arquivado_estabelecimento_id=estabelecimento_id)
+    if inicio:
+        vendas = vendas.filter(resumo_vendas_data__gte=inicio)
+        produtos = produtos.filter(resumo_produto_data__gte=inicio)
+        pedidos = pedidos.filter(pedido_data__gte=inicio_dt)
+        arquivados = arquivados.filter(pedido_arquivado_data__gte=inicio_dt)
+    if fim:
+        vendas = vendas.filter(resumo_vendas_data__lte=fim)
+        produtos = produtos.filter(resumo_produto_data__lte=fim)
+        pedidos = pedidos.filter(pedido_data__lt=fim_dt)
+        arquivados = arquivados.filter(pedido_arquivado_data__lt=fim_dt)
+
+    delta = RollupDelta()
+    total = 0
+    ultimo_id = 0
+    while True:
+        rows = list(pedidos.filter(id__gt=ultimo_id).order_by('id').values(*PEDIDO_ROLLUP_FIELDS)[:lote])
+        if not rows:
+            break
+        ultimo_id = rows[-1]['id']
+        itens = _order_items([row['id'] for row in rows])
+        for row in rows:
+            _add_order_row(delta, row, row['pedido_status'], itens.get(row['id'], []))
+        total += len(rows)
+
+    sem_produto = 0
+    rows = arquivados.order_by('id').values_list(
+        'pedido_arquivado_estabelecimento_id', 'pedido_arquivado_data', 'pedido_arquivado_status',
+        'pedido_arquivado_tipo_entrega', 'pedido_arquivado_forma_pagamento', 'pedido_arquivado_valor_total',
+        'pedido_arquivado_taxa_entrega', 'pedido_arquivado_dados'
+    ).iterator(chunk_size=lote)
+    for *row, dados in rows:
+        itens = []
+        for item in dados.get('itens', []):
+            if item.get('produto_id') is None:
+                sem_produto += 1
+                continue
+            itens.append((item['produto_id'], item['produto_nome'], item['itens_pedido_quantidade'], item['itens_pedido_preco_final']))
+        delta.add_order(*row, itens)
+        total += 1
+    if sem_produto:
+        logger.warning(f"{sem_produto} itens arquivados sem produto_id ficaram fora do resumo por produto")
+
+    with transaction.atomic():
+        vendas.delete()
+        produtos.delete()
+        linhas = delta.create()
+    return total, linhas
@@ -1,6 +1,7 @@
 from django.urls import re_path
-from .consumers import OrderConsumer
+from .consumers import OrderConsumer, PrintAgentConsumer
 
 websocket_urlpatterns = [
     re_path(r'ws/orders/(?P<estabelecimento_id>\d+)/$', OrderConsumer.as_asgi()),
+    re_path(r'ws/printers/(?P<estabelecimento_id>\d+)/$', PrintAgentConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -1,10 +1,11 @@
 from rest_framework import serializers
 from .models import Produto, TipoProduto, TamanhoProduto, Acrescimo, Cliente, Pedido, FormasDePagamento, ItensPedido, Estabelecimento, ItensPromocao, GrupoItensPromocao, Promocao
+from .receipts import TICKET_COLUMNS_MIN, TICKET_COLUMNS_MAX
 
 class EstabelecimentoUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Estabelecimento
-        fields = ['estabelecimento_prazo_entrega', 'estabelecimento_aberto']
+        fields = ['estabelecimento_prazo_entrega', 'estabelecimento_aberto', 'estabelecimento_formato_ticket', 'estabelecimento_colunas_ticket', 'estabelecimento_impressao_automatica']
     
     def validate_estabelecimento_prazo_entrega(self, value):
         if value is None:
@@ -13,6 +14,11 @@ class EstabelecimentoUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Prazo de entrega não pode ser negativo.")
         return value
 
+    def validate_estabelecimento_colunas_ticket(self, value):
+        if not TICKET_COLUMNS_MIN <= value <= TICKET_COLUMNS_MAX:
+            raise serializers.ValidationError(f"Colunas do ticket devem estar entre {TICKET_COLUMNS_MIN} e {TICKET_COLUMNS_MAX}.")
+        return value
+
 class ClientAddressSerializer(serializers.Serializer):
     rua = serializers.CharField(max_length=200)
     numero = serializers.CharField(max_length=10)
@@ -20,14 +26,16 @@ class ClientAddressSerializer(serializers.Serializer):
     complemento = serializers.CharField(max_length=100, required=False, allow_blank=True)
     cidade = serializers.CharField(max_length=100, required=False, allow_blank=True)
     estado = serializers.CharField(max_length=2, required=False, allow_blank=True)
+    cep = serializers.CharField(max_length=9, required=False, allow_blank=True)
 
 class DeliveryFeeRequestSerializer(serializers.Serializer):
     estabelecimento_id = serializers.PrimaryKeyRelatedField(queryset=Estabelecimento.objects.all())
     client_address = ClientAddressSerializer()
 
 class DeliveryFeeResponseSerializer(serializers.Serializer):
-    distance_km = serializers.FloatField()
+    distance_km = serializers.FloatField(allow_null=True)
     delivery_fee = serializers.DecimalField(max_digits=10, decimal_places=2)
+    quote = serializers.CharField()
 
 class ProdutoSerializer(serializers.ModelSerializer):
     class Meta:
@@ -91,6 +99,7 @@ class PedidoSerializer(serializers.ModelSerializer):
             'pedido_valor_total',
             'pedido_forma_pagamento',
             'pedido_troco',
+            'pedido_taxa_entrega',
             'pedido_cliente',
             'itens',
             'pedido_tipo_entrega',
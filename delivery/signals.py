@@ -0,0 +1,14 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .auth import invalidate_user_membership
+from .models import UserProfile
+
+# Perfil ou usuário alterado: o websocket volta a consultar o banco na próxima conexão
+@receiver([post_save, post_delete], sender=UserProfile)
+def userprofile_changed(sender, instance, **kwargs):
+    invalidate_user_membership(instance.user_id)
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user_membership(instance.id)
@@ -0,0 +1,146 @@
+from collections import defaultdict
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import Pedido, ItensPedido
+
+# Campos do cabeçalho do pedido lidos com .values() (um único SELECT com joins)
+PEDIDO_SUMMARY_FIELDS = (
+    'id',
+    'pedido_estabelecimento_id',
+    'pedido_data',
+    'pedido_status',
+    'pedido_tipo_entrega',
+    'pedido_valor_total',
+    'pedido_taxa_entrega',
+    'pedido_troco',
+    'pedido_observacao',
+    'pedido_forma_pagamento__forma_pagamento_nome',
+    'pedido_cliente__cliente_nome',
+    'pedido_cliente__cliente_telefone',
+)
+
+def _decimal(value):
+    return str(value) if value is not None else None
+
+def _datetime(value):
+    return timezone.localtime(value).isoformat() if value is not None else None
+
+# Tamanho de página da listagem de pedidos (padrão e máximo permitido via ?limite=)
+ORDERS_PAGE_SIZE = getattr(settings, 'ORDERS_PAGE_SIZE', 50)
+ORDERS_PAGE_SIZE_MAX = getattr(settings, 'ORDERS_PAGE_SIZE_MAX', 200)
+
+# Consultas das listagens, usadas pelas views e pelo comando explicar_consultas
+# (delivery.hot_queries): o EXPLAIN verifica sempre o mesmo SQL que a view executa
+
+def order_list_queryset(pedidos, status, data_inicio=None, data_fim=None, cliente_id=None, telefone=None, cursor=None):
+    """
+    Listagem de pedidos (views.orders): filtros por status, período e cliente e
+    paginação por keyset em (pedido_data, id), do mais recente para o mais antigo.
+    """
+    pedidos = pedidos.filter(pedido_status=status)
+    if data_inicio:
+        pedidos = pedidos.filter(pedido_data__gte=data_inicio)
+    if data_fim:
+        pedidos = pedidos.filter(pedido_data__lt=data_fim)
+    if cliente_id:
+        pedidos = pedidos.filter(pedido_cliente_id=cliente_id)
+    if telefone:
+        pedidos = pedidos.filter(pedido_cliente__cliente_telefone=telefone)
+    if cursor:
+        cursor_data, cursor_id = cursor
+        pedidos = pedidos.filter(
+            Q(pedido_data__lt=cursor_data) | Q(pedido_data=cursor_data, id__lt=cursor_id)
+        )
+    return pedidos.order_by('-pedido_data', '-id')
+
+def active_orders(pedidos):
+    # Pedidos em andamento do quadro, do mais antigo para o mais recente
+    return pedidos.filter(pedido_status__in=Pedido.ACTIVE_STATUSES).order_by('pedido_data', 'id')
+
+def item_summary_queryset(pedido_ids):
+    return ItensPedido.objects.filter(itens_pedido_pedido_id__in=pedido_ids).order_by('id').values(
+        'id',
+        'itens_pedido_pedido_id',
+        'itens_pedido_produto__produto_nome',
+        'itens_pedido_tamanho__tamanho_produto_nome',
+        'itens_pedido_quantidade',
+        'itens_pedido_preco_final',
+    )
+
+def load_item_summaries(pedido_ids):
+    """
+    Itens resumidos dos pedidos, agrupados por pedido: dois SELECTs (itens e
+    acréscimos), independentemente da quantidade de pedidos.
+    """
+    itens = list(item_summary_queryset(pedido_ids))
+    acrescimos = defaultdict(list)
+    if itens:
+        relacoes = ItensPedido.itens_pedido_acrescimos.through.objects.filter(
+            itenspedido_id__in=[item['id'] for item in itens]
+        ).values_list('itenspedido_id', 'acrescimo__acrescimo_nome')
+        for item_id, nome in relacoes:
+            acrescimos[item_id].append(nome)
+
+    por_pedido = defaultdict(list)
+    for item in itens:
+        por_pedido[item['itens_pedido_pedido_id']].append({
+            'id': item['id'],
+            'produto_nome': item['itens_pedido_produto__produto_nome'],
+            'tamanho_nome': item['itens_pedido_tamanho__tamanho_produto_nome'],
+            'itens_pedido_quantidade': item['itens_pedido_quantidade'],
+            'itens_pedido_preco_final': _decimal(item['itens_pedido_preco_final']),
+            'acrescimos': acrescimos.get(item['id'], []),
+        })
+    return por_pedido
+
+def summarize_order_rows(rows):
+    """
+    Monta a representação resumida a partir das linhas de .values() com
+    PEDIDO_SUMMARY_FIELDS. Decimais e datas saem como texto, prontos para JSON
+    e para a camada de canais.
+    """
+    rows = list(rows)
+    itens = load_item_summaries([row['id'] for row in rows]) if rows else {}
+    return [
+        {
+            'id': row['id'],
+            'pedido_data': _datetime(row['pedido_data']),
+            'pedido_status': row['pedido_status'],
+            'pedido_tipo_entrega': row['pedido_tipo_entrega'],
+            'pedido_valor_total': _decimal(row['pedido_valor_total']),
+            'pedido_taxa_entrega': _decimal(row['pedido_taxa_entrega']),
+            'pedido_troco': _decimal(row['pedido_troco']),
+            'pedido_observacao': row['pedido_observacao'] or '',
+            'pedido_forma_pagamento': row['pedido_forma_pagamento__forma_pagamento_nome'],
+            'pedido_cliente': {
+                'cliente_nome': row['pedido_cliente__cliente_nome'],
+                'cliente_telefone': row['pedido_cliente__cliente_telefone'],
+            },
+            'itens': itens.get(row['id'], []),
+        }
+        for row in rows
+    ]
+
+def summarize_orders(pedidos):
+    # Resumo de um queryset de pedidos, preservando a ordenação do queryset
+    return summarize_order_rows(pedidos.values(*PEDIDO_SUMMARY_FIELDS))
+
+def summarize_order(pedido_id):
+    resumo = summarize_orders(Pedido.objects.filter(id=pedido_id))
+    return resumo[0] if resumo else None
+
+def build_order_board(pedidos):
+    """
+    Quadro de pedidos em andamento agrupados por status: contagens em uma
+    consulta agregada, pedidos em um SELECT e itens em mais dois.
+    """
+    ativos = active_orders(pedidos)
+    contagens = dict(ativos.order_by().values_list('pedido_status').annotate(total=Count('id')))
+    colunas = {status: [] for status in Pedido.ACTIVE_STATUSES}
+    for resumo in summarize_orders(ativos):
+        colunas[resumo['pedido_status']].append(resumo)
+    return {
+        'contagens': {status: contagens.get(status, 0) for status in Pedido.ACTIVE_STATUSES},
+        'pedidos': colunas,
+    }
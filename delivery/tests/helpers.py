@@ -0,0 +1,69 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from delivery.auth import add_user_claims
+from delivery.models import Cliente, Estabelecimento, FormasDePagamento, ItensPedido, Pedido, Produto, TipoProduto, UserProfile
+
+# Dados comuns aos testes
+
+def criar_estabelecimento(cnpj='1'):
+    return Estabelecimento.objects.create(
+        estabelecimento_cnpj=cnpj,
+        estabelecimento_url=f'loja-{cnpj}',
+        estabelecimento_nome='Loja',
+        estabelecimento_proprietario='Dono',
+        estabelecimento_telefone=f'1130000000{cnpj}',
+        estabelecimento_instagram='loja',
+        estabelecimento_email=f'loja{cnpj}@exemplo.com',
+        estabelecimento_endereco='Rua A',
+        estabelecimento_bairro='Centro',
+        estabelecimento_numero='1',
+        estabelecimento_cidade='Cidade',
+        estabelecimento_estado='SP',
+        estabelecimento_latitude=-23.5,
+        estabelecimento_longitude=-46.6,
+    )
+
+def criar_operador(estabelecimento, username='operador'):
+    user = User.objects.create_user(username, password='senha')
+    UserProfile.objects.create(user=user, estabelecimento=estabelecimento)
+    return user
+
+def api_client(user):
+    # Cliente autenticado com o mesmo JWT (com claims) emitido no login
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {add_user_claims(AccessToken.for_user(user), user)}')
+    return client
+
+class PedidosMixin:
+    # Estabelecimento com cliente, forma de pagamento e produto para criar pedidos
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.estabelecimento = criar_estabelecimento()
+        cls.forma_pagamento = FormasDePagamento.objects.create(
+            forma_pagamento_estabelecimento=cls.estabelecimento, forma_pagamento_nome='Pix'
+        )
+        cls.cliente = Cliente.objects.create(
+            cliente_estabelecimento=cls.estabelecimento, cliente_telefone='11988887777',
+            cliente_nome='Ana', cliente_rua='Rua B', cliente_bairro='Centro', cliente_numero='2'
+        )
+        tipo = TipoProduto.objects.create(tipo_produto_estabelecimento=cls.estabelecimento, tipo_produto_nome='Lanche')
+        cls.produto = Produto.objects.create(
+            produto_estabelecimento=cls.estabelecimento, produto_nome='X-Burguer',
+            produto_descricao='Pão, carne e queijo', produto_preco=Decimal('10'), produto_tipo=tipo
+        )
+
+    def criar_pedido(self, status='pending', quantidade=1):
+        pedido = Pedido.objects.create(
+            pedido_estabelecimento=self.estabelecimento, pedido_cliente=self.cliente,
+            pedido_forma_pagamento=self.forma_pagamento, pedido_status=status,
+            pedido_valor_total=Decimal('10') * quantidade
+        )
+        ItensPedido.objects.create(
+            itens_pedido_estabelecimento=self.estabelecimento, itens_pedido_pedido=pedido,
+            itens_pedido_produto=self.produto, itens_pedido_quantidade=quantidade,
+            itens_pedido_preco_unitario=Decimal('10'), itens_pedido_preco_final=Decimal('10') * quantidade
+        )
+        return pedido
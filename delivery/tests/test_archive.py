@@ -0,0 +1,62 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from delivery.archive import archive_chunk, archive_orders
+from delivery.models import ItensPedido, Pedido, PedidoArquivado
+from .helpers import PedidosMixin, api_client, criar_operador
+
+class ArchiveTests(PedidosMixin, TestCase):
+    def envelhecer(self, *pedidos, dias=120):
+        Pedido.objects.filter(id__in=[pedido.id for pedido in pedidos]).update(
+            pedido_data=timezone.now() - timedelta(days=dias)
+        )
+
+    def test_archive_chunk(self):
+        concluido = self.criar_pedido('completed', quantidade=2)
+        em_preparo = self.criar_pedido('preparing')
+        self.assertEqual(archive_chunk([concluido.id, em_preparo.id]), 1)
+
+        # Só o pedido finalizado sai da tabela, com os itens
+        self.assertFalse(Pedido.objects.filter(id=concluido.id).exists())
+        self.assertFalse(ItensPedido.objects.filter(itens_pedido_pedido_id=concluido.id).exists())
+        self.assertTrue(Pedido.objects.filter(id=em_preparo.id).exists())
+
+        arquivado = PedidoArquivado.objects.get(id=concluido.id)
+        self.assertEqual(arquivado.pedido_arquivado_status, 'completed')
+        self.assertEqual(arquivado.pedido_arquivado_valor_total, Decimal('20'))
+        dados = arquivado.pedido_arquivado_dados
+        self.assertEqual(dados['pedido_cliente']['cliente_rua'], 'Rua B')
+        self.assertEqual(dados['itens'][0]['produto_id'], self.produto.id)
+        self.assertEqual(dados['itens'][0]['itens_pedido_preco_unitario'], '10.00')
+
+    def test_conflito_mantem_o_pedido(self):
+        pedido = self.criar_pedido('completed')
+        outro = self.criar_pedido('cancelled')
+        PedidoArquivado.objects.create(
+            id=pedido.id, pedido_arquivado_estabelecimento=self.estabelecimento, pedido_arquivado_cliente=self.cliente,
+            pedido_arquivado_data=timezone.now(), pedido_arquivado_status='completed', pedido_arquivado_tipo_entrega='delivery',
+            pedido_arquivado_valor_total=0, pedido_arquivado_taxa_entrega=0, pedido_arquivado_forma_pagamento='Pix',
+            pedido_arquivado_dados={}
+        )
+        self.assertEqual(archive_chunk([pedido.id, outro.id]), 1)
+        self.assertTrue(Pedido.objects.filter(id=pedido.id).exists())
+        self.assertFalse(Pedido.objects.filter(id=outro.id).exists())
+
+    def test_archive_orders_em_lotes(self):
+        antigos = [self.criar_pedido('completed') for _ in range(3)]
+        recente = self.criar_pedido('completed')
+        ativo_antigo = self.criar_pedido('pending')
+        self.envelhecer(*antigos, ativo_antigo)
+        self.assertEqual(archive_orders(dry_run=True), 3)
+        self.assertEqual(archive_orders(lote=2), 3)
+        self.assertEqual(set(PedidoArquivado.objects.values_list('id', flat=True)), {pedido.id for pedido in antigos})
+        self.assertEqual(set(Pedido.objects.values_list('id', flat=True)), {recente.id, ativo_antigo.id})
+
+    def test_detalhe_de_pedido_arquivado(self):
+        pedido = self.criar_pedido('completed')
+        archive_chunk([pedido.id])
+        response = api_client(criar_operador(self.estabelecimento)).get(f'/orders_detail/{pedido.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['arquivado'])
+        self.assertEqual(response.data['pedido']['id'], pedido.id)
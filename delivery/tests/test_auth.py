@@ -0,0 +1,54 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from delivery.auth import (
+    ClaimsJWTAuthentication, ClaimsUser, EstabelecimentoTokenRefreshSerializer, VerifiedMembership, add_user_claims
+)
+from delivery.models import UserProfile
+from .helpers import criar_estabelecimento, criar_operador
+
+class ClaimsAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.estabelecimento = criar_estabelecimento()
+        cls.outro = criar_estabelecimento(cnpj='2')
+        cls.user = criar_operador(cls.estabelecimento)
+        cls.sem_perfil = User.objects.create_user('sem_perfil', password='senha')
+
+    def token(self, user):
+        return add_user_claims(AccessToken.for_user(user), user)
+
+    def test_usuario_dos_claims_sem_consulta(self):
+        token = self.token(self.user)
+        with self.assertNumQueries(0):
+            user = ClaimsJWTAuthentication().get_user(token)
+            self.assertIsInstance(user, ClaimsUser)
+            self.assertTrue(hasattr(user, 'profile'))
+            self.assertEqual(user.profile.estabelecimento.id, self.estabelecimento.id)
+            self.assertFalse(user.is_superuser)
+
+    def test_sem_perfil(self):
+        user = ClaimsJWTAuthentication().get_user(self.token(self.sem_perfil))
+        self.assertIsInstance(user, ClaimsUser)
+        self.assertFalse(hasattr(user, 'profile'))
+
+    def test_token_antigo_autentica_pelo_banco(self):
+        user = ClaimsJWTAuthentication().get_user(AccessToken.for_user(self.user))
+        self.assertIsInstance(user, User)
+        self.assertEqual(user.profile.estabelecimento_id, self.estabelecimento.id)
+
+    def test_renovacao_le_claims_do_banco(self):
+        refresh = RefreshToken.for_user(self.user)
+        UserProfile.objects.filter(user=self.user).update(estabelecimento=self.outro)
+        serializer = EstabelecimentoTokenRefreshSerializer(data={'refresh': str(refresh)})
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(AccessToken(serializer.validated_data['access'])['estabelecimento_id'], self.outro.id)
+
+    def test_permissao_confere_vinculo_no_banco(self):
+        class Request:
+            user = ClaimsJWTAuthentication().get_user(self.token(self.user))
+
+        permissao = VerifiedMembership()
+        self.assertTrue(permissao.has_permission(Request, None))
+        UserProfile.objects.filter(user=self.user).update(estabelecimento=self.outro)
+        self.assertFalse(permissao.has_permission(Request, None))
@@ -0,0 +1,55 @@
+from django.test import SimpleTestCase, TestCase
+from delivery.autocomplete import AddressPrefixIndex, EstablishmentAddressIndex, street_keys
+from delivery.models import Cep, Cliente
+from .helpers import criar_estabelecimento
+
+class AddressPrefixIndexTests(SimpleTestCase):
+    def test_busca_por_prefixo_pela_grafia_mais_usada(self):
+        index = AddressPrefixIndex()
+        for rua in ('Rua das Flores', 'rua das flores', 'Rua das Flores', 'Rua da Paz'):
+            index.add(rua, street_keys(rua))
+        self.assertEqual(index.search('flo'), ['Rua das Flores', 'rua das flores'])
+        self.assertEqual(index.search('RUA DA'), ['Rua das Flores', 'Rua da Paz', 'rua das flores'])
+        self.assertEqual(index.search('paz'), ['Rua da Paz'])
+        self.assertEqual(index.search(''), [])
+        self.assertEqual(index.search('rua', limit=1), ['Rua das Flores'])
+
+    def test_forma_canonica(self):
+        index = AddressPrefixIndex()
+        for bairro in ('Jardim América', 'Jardim América', 'jardim america'):
+            index.add(bairro)
+        self.assertEqual(index.canonical('JARDIM AMERICA'), 'Jardim América')
+        self.assertEqual(index.canonical('Centro'), 'Centro')
+
+class EstablishmentAddressIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.estabelecimento = criar_estabelecimento()
+        Cep.objects.create(
+            cep_codigo='01000000', cep_logradouro='Avenida Brasil', cep_bairro='Jardim América',
+            cep_cidade=cls.estabelecimento.estabelecimento_cidade, cep_estado=cls.estabelecimento.estabelecimento_estado
+        )
+        Cep.objects.create(cep_codigo='02000000', cep_logradouro='Avenida Brasa', cep_cidade='Outra', cep_estado='RJ')
+
+    def criar_cliente(self, telefone, rua, bairro):
+        return Cliente.objects.create(
+            cliente_estabelecimento=self.estabelecimento, cliente_telefone=telefone,
+            cliente_nome='Ana', cliente_rua=rua, cliente_bairro=bairro, cliente_numero='1'
+        )
+
+    def test_ceps_da_cidade_e_clientes(self):
+        self.criar_cliente('11900000001', 'Rua das Flores', 'Centro')
+        index = EstablishmentAddressIndex(self.estabelecimento.id)
+        index.rebuild()
+        self.assertEqual(index.search('rua', 'avenida bra', 10), ['Avenida Brasil'])
+        self.assertEqual(index.search('rua', 'flo', 10), ['Rua das Flores'])
+        self.assertEqual(index.search('bairro', 'jard', 10), ['Jardim América'])
+
+        # Atualização incremental: só os clientes novos
+        self.criar_cliente('11900000002', 'Rua Nova', 'centro')
+        self.criar_cliente('11900000003', 'rua nova', 'Centro')
+        self.criar_cliente('11900000004', 'Rua Nova', 'Vila Nova')
+        with self.assertNumQueries(1):
+            index.update()
+        self.assertEqual(index.search('rua', 'nova', 10), ['Rua Nova', 'rua nova'])
+        self.assertEqual(index.canonical('RUA NOVA', 'CENTRO'), ('Rua Nova', 'Centro'))
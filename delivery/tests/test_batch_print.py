@@ -0,0 +1,42 @@
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from delivery.tickets import TICKET_BATCH_MAX, load_ticket_orders
+from .helpers import PedidosMixin, api_client, criar_operador
+
+class BatchPrintTests(PedidosMixin, TestCase):
+    def setUp(self):
+        self.pedidos = [self.criar_pedido() for _ in range(3)]
+        self.client = api_client(criar_operador(self.estabelecimento))
+
+    def imprimir(self, **params):
+        return self.client.get('/orders_print_batch', params)
+
+    def test_load_ticket_orders(self):
+        ids = [self.pedidos[2].id, self.pedidos[0].id, 0]
+        with self.assertNumQueries(3):
+            pedidos = load_ticket_orders(ids)
+            itens = [len(lista) for _, lista in pedidos]
+        self.assertEqual([pedido.id for pedido, _ in pedidos], ids[:2])
+        self.assertEqual(itens, [1, 1])
+
+    def test_texto_por_ids(self):
+        response = self.imprimir(ids=f'{self.pedidos[1].id},{self.pedidos[0].id}', formato='texto')
+        self.assertEqual(response.status_code, 200)
+        texto = response.content.decode()
+        # Na ordem pedida
+        self.assertLess(texto.index(f'#{str(self.pedidos[1].id).zfill(6)}'), texto.index(f'#{str(self.pedidos[0].id).zfill(6)}'))
+
+    def test_pdf_desde(self):
+        with mock.patch('delivery.views.fetch_tickets_pdf', return_value=(b'%PDF', 3)) as fetch:
+            response = self.imprimir(desde=(timezone.now() - timedelta(hours=1)).isoformat())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Ticket-Count'], '3')
+        self.assertEqual(fetch.call_args.args[0], [pedido.id for pedido in self.pedidos])
+
+    def test_validacao(self):
+        self.assertEqual(self.imprimir().status_code, 400)
+        self.assertEqual(self.imprimir(ids='1,x').status_code, 400)
+        self.assertEqual(self.imprimir(ids=','.join(str(n) for n in range(1, TICKET_BATCH_MAX + 2))).status_code, 400)
+        self.assertEqual(self.imprimir(ids='999999', formato='texto').status_code, 404)
@@ -0,0 +1,27 @@
+from django.test import TestCase
+from delivery.models import Pedido
+from delivery.summaries import build_order_board
+from .helpers import PedidosMixin, api_client, criar_operador
+
+class OrderBoardTests(PedidosMixin, TestCase):
+    def setUp(self):
+        self.pendentes = [self.criar_pedido('pending') for _ in range(2)]
+        self.pronto = self.criar_pedido('ready')
+        self.criar_pedido('completed')
+        self.criar_pedido('cancelled')
+
+    def test_contagens_e_colunas(self):
+        with self.assertNumQueries(4):
+            quadro = build_order_board(Pedido.objects.filter(pedido_estabelecimento=self.estabelecimento))
+        self.assertEqual(quadro['contagens'], {'pending': 2, 'preparing': 0, 'ready': 1, 'delivery': 0})
+        self.assertEqual(list(quadro['pedidos']), list(Pedido.ACTIVE_STATUSES))
+        # Mais antigos primeiro em cada coluna; finalizados ficam de fora
+        self.assertEqual([resumo['id'] for resumo in quadro['pedidos']['pending']], [pedido.id for pedido in self.pendentes])
+        self.assertEqual([resumo['id'] for resumo in quadro['pedidos']['ready']], [self.pronto.id])
+        self.assertEqual(quadro['pedidos']['delivery'], [])
+
+    def test_endpoint(self):
+        response = api_client(criar_operador(self.estabelecimento)).get('/orders_board')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['contagens']['pending'], 2)
+        self.assertEqual(response.data['seq'], 0)
@@ -0,0 +1,61 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from delivery.models import Cliente, FormasDePagamento, Pedido, ResumoVendas
+from .helpers import PedidosMixin, api_client, criar_estabelecimento, criar_operador
+
+class OrdersBulkStatusTests(PedidosMixin, TestCase):
+    def setUp(self):
+        self.client = api_client(criar_operador(self.estabelecimento))
+
+    def post(self, ids, novo_status):
+        return self.client.post('/orders_bulk_status', {'ids': ids, 'status': novo_status}, format='json')
+
+    def test_transicoes(self):
+        pendente = self.criar_pedido('pending')
+        pronto = self.criar_pedido('ready')
+        concluido = self.criar_pedido('completed')
+        response = self.post([pendente.id, pronto.id, concluido.id, 999999], 'cancelled')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['atualizados'], sorted([pendente.id, pronto.id]))
+        self.assertEqual({item['id'] for item in response.data['ignorados']}, {concluido.id, 999999})
+        self.assertEqual(
+            {resumo['id']: resumo['status_anterior'] for resumo in response.data['pedidos']},
+            {pendente.id: 'pending', pronto.id: 'ready'}
+        )
+        self.assertEqual(
+            set(Pedido.objects.filter(pedido_status='cancelled').values_list('id', flat=True)),
+            {pendente.id, pronto.id}
+        )
+        resumo = ResumoVendas.objects.get(resumo_vendas_estabelecimento=self.estabelecimento)
+        self.assertEqual(resumo.resumo_vendas_cancelados, 2)
+
+    def test_transicao_nao_permitida(self):
+        pendente = self.criar_pedido('pending')
+        response = self.post([pendente.id], 'completed')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['atualizados'], [])
+        pendente.refresh_from_db()
+        self.assertEqual(pendente.pedido_status, 'pending')
+
+    def test_pedido_de_outro_estabelecimento(self):
+        outro = criar_estabelecimento(cnpj='2')
+        forma = FormasDePagamento.objects.create(forma_pagamento_estabelecimento=outro, forma_pagamento_nome='Pix')
+        cliente = Cliente.objects.create(
+            cliente_estabelecimento=outro, cliente_telefone='11911112222',
+            cliente_nome='Bia', cliente_rua='Rua C', cliente_bairro='Centro', cliente_numero='3'
+        )
+        pedido = Pedido.objects.create(pedido_estabelecimento=outro, pedido_cliente=cliente, pedido_forma_pagamento=forma)
+        response = self.post([pedido.id], 'preparing')
+        self.assertEqual(response.data['atualizados'], [])
+        self.assertEqual(response.data['ignorados'], [{'id': pedido.id, 'motivo': 'Pedido não encontrado'}])
+
+    def test_validacao(self):
+        self.assertEqual(self.post([1], 'entregue').status_code, 400)
+        self.assertEqual(self.post([], 'preparing').status_code, 400)
+        self.assertEqual(self.post(['x'], 'preparing').status_code, 400)
+
+    def test_usuario_sem_perfil(self):
+        self.client = api_client(User.objects.create_user('sem_perfil', password='senha'))
+        response = self.post([self.criar_pedido().id], 'preparing')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"error": "Usuário não possui perfil associado"})
@@ -0,0 +1,27 @@
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TransactionTestCase
+from delivery.management.commands.testar_carga_websocket import percentil
+from .helpers import criar_estabelecimento, criar_operador
+
+class PercentilTests(SimpleTestCase):
+    def test_percentil(self):
+        self.assertEqual(percentil([], 50), 0.0)
+        self.assertEqual(percentil([3, 1, 2, 4], 50), 3)
+        self.assertEqual(percentil(list(range(100)), 99), 99)
+
+class TestarCargaWebsocketTests(TransactionTestCase):
+    def test_sem_usuario(self):
+        with self.assertRaises(CommandError):
+            call_command('testar_carga_websocket', conexoes=1, stdout=StringIO())
+
+    def test_entrega_sem_perdas(self):
+        criar_operador(criar_estabelecimento())
+        criar_operador(criar_estabelecimento(cnpj='2'), username='operador2')
+        saida = StringIO()
+        call_command(
+            'testar_carga_websocket', conexoes=4, estabelecimentos=2, eventos=3, taxa=100, espera=5,
+            stdout=saida
+        )
+        self.assertIn('4 abertas em 2 estabelecimentos, 0 recusadas', saida.getvalue())
+        self.assertIn('Mensagens: 12 esperadas, 12 recebidas, 0 perdidas', saida.getvalue())
@@ -0,0 +1,52 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from delivery.models import Cep
+from delivery.utils import geocode_client, geocode_from_cep, lookup_cep, normalize_cep
+
+class CepIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Cep.objects.create(
+            cep_codigo='01310100', cep_logradouro='Avenida Paulista', cep_bairro='Bela Vista',
+            cep_cidade='São Paulo', cep_estado='SP', cep_latitude=-23.561, cep_longitude=-46.656
+        )
+        # CEP geral da cidade: sem logradouro
+        Cep.objects.create(
+            cep_codigo='13560000', cep_cidade='São Carlos', cep_estado='SP',
+            cep_latitude=-22.01, cep_longitude=-47.89
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_normaliza_cep(self):
+        self.assertEqual(normalize_cep('01310-100'), '01310100')
+        self.assertIsNone(normalize_cep('1310-100'))
+        self.assertIsNone(normalize_cep(None))
+
+    def test_encontrado_fica_em_cache(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(lookup_cep('01310-100')['cep_logradouro'], 'Avenida Paulista')
+        with self.assertNumQueries(0):
+            self.assertEqual(lookup_cep('01310100')['cep_bairro'], 'Bela Vista')
+
+    def test_nao_encontrado_nao_fica_em_cache(self):
+        self.assertIsNone(lookup_cep('99999999'))
+        Cep.objects.create(cep_codigo='99999999', cep_logradouro='Rua Nova', cep_cidade='São Paulo', cep_estado='SP')
+        self.assertEqual(lookup_cep('99999999')['cep_logradouro'], 'Rua Nova')
+
+    def test_coordenadas_pelo_cep(self):
+        geo = geocode_from_cep('01310-100', rua='av. paulista')
+        self.assertEqual((geo['lat'], geo['lng'], geo['location_type']), (-23.561, -46.656, 'CEP'))
+        # Rua diferente da cadastrada ou CEP geral: resultado ambíguo
+        self.assertIsNone(geocode_from_cep('01310-100', rua='Rua Augusta'))
+        self.assertIsNone(geocode_from_cep('13560-000'))
+
+    def test_google_so_sem_resultado_local(self):
+        gmaps = mock.Mock()
+        with mock.patch('delivery.utils.geocode_client_address') as geocode:
+            geocode_client(gmaps, 'Avenida Paulista, 1000', cep='01310100', rua='Avenida Paulista')
+            geocode.assert_not_called()
+            geocode_client(gmaps, 'Rua Augusta, 10', cep='01310100', rua='Rua Augusta')
+            geocode.assert_called_once_with(gmaps, 'Rua Augusta, 10')
@@ -0,0 +1,73 @@
+from decimal import Decimal
+from unittest import mock
+from django.test import TestCase
+from delivery.models import Cliente, DeliveryRange
+from delivery.utils import address_hash, clear_client_location, recalculate_client_fees, resolve_client_delivery
+from .helpers import criar_estabelecimento
+
+class ClientLocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.estabelecimento = criar_estabelecimento()
+        cls.faixa = DeliveryRange.objects.create(
+            estabelecimento=cls.estabelecimento, min_distance=0, max_distance=5, delivery_fee=Decimal('5')
+        )
+        DeliveryRange.objects.create(
+            estabelecimento=cls.estabelecimento, min_distance=5, max_distance=10, delivery_fee=Decimal('9')
+        )
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            cliente_estabelecimento=self.estabelecimento, cliente_telefone='11988887777',
+            cliente_nome='Ana', cliente_rua='Rua B', cliente_bairro='Centro', cliente_numero='2'
+        )
+
+    def endereco_hash(self):
+        return address_hash(
+            self.cliente.cliente_rua, self.cliente.cliente_numero, self.cliente.cliente_bairro,
+            self.estabelecimento.estabelecimento_cidade, self.estabelecimento.estabelecimento_estado
+        )
+
+    def test_geocodifica_e_preenche_localizacao(self):
+        delivery = {
+            'lat': -23.51, 'lng': -46.61, 'location_type': 'ROOFTOP', 'partial_match': False,
+            'distance_km': 3.2, 'delivery_fee': Decimal('5'),
+        }
+        with mock.patch('delivery.utils.calculate_delivery', return_value=delivery) as calculate:
+            resultado = resolve_client_delivery(self.estabelecimento, self.cliente, 'Rua B, 2')
+        calculate.assert_called_once()
+        self.assertEqual(resultado, (3.2, Decimal('5')))
+        self.assertEqual((self.cliente.cliente_latitude, self.cliente.cliente_longitude), (-23.51, -46.61))
+        self.assertEqual(self.cliente.cliente_location_type, 'ROOFTOP')
+        self.assertEqual(self.cliente.cliente_distancia_km, 3.2)
+        self.assertEqual(self.cliente.cliente_endereco_hash, self.endereco_hash())
+
+    def test_reaproveita_distancia_salva(self):
+        self.cliente.cliente_latitude, self.cliente.cliente_longitude = -23.51, -46.61
+        self.cliente.cliente_distancia_km = 7.5
+        self.cliente.cliente_endereco_hash = self.endereco_hash()
+        with mock.patch('delivery.utils.calculate_delivery') as calculate, \
+                mock.patch('delivery.utils.route_distance_from') as route:
+            resultado = resolve_client_delivery(self.estabelecimento, self.cliente, 'Rua B, 2')
+        calculate.assert_not_called()
+        route.assert_not_called()
+        self.assertEqual(resultado, (7.5, Decimal('9')))
+
+    def test_endereco_alterado_descarta_localizacao(self):
+        self.cliente.cliente_latitude, self.cliente.cliente_longitude = -23.51, -46.61
+        self.cliente.cliente_distancia_km = 7.5
+        self.cliente.cliente_endereco_hash = self.endereco_hash()
+        clear_client_location(self.cliente)
+        self.assertIsNone(self.cliente.cliente_latitude)
+        self.assertIsNone(self.cliente.cliente_distancia_km)
+        self.assertIsNone(self.cliente.cliente_endereco_hash)
+
+    def test_recalcula_taxas_sem_apis(self):
+        Cliente.objects.filter(id=self.cliente.id).update(cliente_distancia_km=3.2, cliente_taxa_entrega=Decimal('5'))
+        self.faixa.delivery_fee = Decimal('6')
+        self.faixa.save()
+        with mock.patch('delivery.utils.get_gmaps_client') as gmaps:
+            self.assertEqual(recalculate_client_fees(self.estabelecimento), 1)
+        gmaps.assert_not_called()
+        self.cliente.refresh_from_db()
+        self.assertEqual(self.cliente.cliente_taxa_entrega, Decimal('6'))
@@ -0,0 +1,58 @@
+import time
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from delivery.events import EventCoalescer, _dispatch
+from .helpers import criar_estabelecimento
+
+class EventCoalescerTests(SimpleTestCase):
+    def coalescer(self, window=60, max_events=3):
+        coalescer = EventCoalescer(window, max_events)
+        # Sem a thread de envio: os lotes são retirados pelo próprio teste
+        coalescer.thread = mock.Mock(**{'is_alive.return_value': True})
+        return coalescer
+
+    def test_lote_sai_no_fim_da_janela_ordenado_pelo_seq(self):
+        coalescer = self.coalescer()
+        coalescer.add(1, {'seq': 2})
+        coalescer.add(1, {'seq': 1})
+        coalescer.add(2, {'seq': 7})
+        self.assertEqual(coalescer.take_due(), [])
+        self.assertEqual(coalescer.take_due(todos=True), [(1, [{'seq': 1}, {'seq': 2}]), (2, [{'seq': 7}])])
+        self.assertEqual(coalescer.pending, {})
+
+    def test_lote_cheio_sai_antes(self):
+        coalescer = self.coalescer()
+        for seq in (3, 1, 2):
+            coalescer.add(1, {'seq': seq})
+        coalescer.add(2, {'seq': 9})
+        self.assertEqual(coalescer.take_due(), [(1, [{'seq': 1}, {'seq': 2}, {'seq': 3}])])
+
+    def test_thread_envia_lote_vencido(self):
+        coalescer = EventCoalescer(0.05, 50)
+        with mock.patch('delivery.events._send') as send:
+            coalescer.add(1, {'seq': 1})
+            coalescer.add(1, {'seq': 2})
+            prazo = time.monotonic() + 5
+            while not send.called and time.monotonic() < prazo:
+                time.sleep(0.01)
+        send.assert_called_once_with(1, [{'seq': 1}, {'seq': 2}])
+
+class DispatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.estabelecimento = criar_estabelecimento()
+
+    def test_sem_janela_envia_na_hora(self):
+        with mock.patch('delivery.events.EVENT_COALESCE_MS', 0), mock.patch('delivery.events._send') as send:
+            _dispatch(self.estabelecimento.id, {'type': 'order_created'})
+        estabelecimento_id, eventos = send.call_args.args
+        self.assertEqual(estabelecimento_id, self.estabelecimento.id)
+        self.assertEqual(eventos[0]['type'], 'order_created')
+        self.assertEqual(eventos[0]['seq'], 1)
+
+    def test_com_janela_agrupa(self):
+        with mock.patch('delivery.events._coalescer') as coalescer, mock.patch('delivery.events._send') as send:
+            _dispatch(self.estabelecimento.id, {'type': 'order_created'})
+        send.assert_not_called()
+        estabelecimento_id, evento = coalescer.add.call_args.args
+        self.assertEqual((estabelecimento_id, evento['seq']), (self.estabelecimento.id, 1))
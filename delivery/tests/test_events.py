@@ -0,0 +1,110 @@
+import json
+from unittest import mock
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, TransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from delivery.auth import add_user_claims
+from delivery.events import (
+    EVENT_REPLAY_MAX, ORDERS_CANCELLED, ORDERS_STATUS_CHANGED, _record, events_since, publish_status_changes
+)
+from delivery.models import EventoPedido
+from delivery.routing import websocket_urlpatterns
+from .helpers import PedidosMixin, api_client, criar_estabelecimento, criar_operador
+
+class StatusEventTests(PedidosMixin, TestCase):
+    def publicados(self, func):
+        # Eventos entregues a _dispatch depois do commit
+        with mock.patch('delivery.events._dispatch') as dispatch:
+            with self.captureOnCommitCallbacks(execute=True):
+                func()
+        return [chamada.args for chamada in dispatch.call_args_list]
+
+    def test_um_evento_por_tipo(self):
+        resumos = [
+            {'id': 1, 'pedido_status': 'ready'},
+            {'id': 2, 'pedido_status': 'cancelled'},
+            {'id': 3, 'pedido_status': 'ready'},
+        ]
+        eventos = self.publicados(lambda: publish_status_changes(resumos, {1: 10, 2: 10, 3: 10}))
+        self.assertEqual(sorted(eventos, key=lambda evento: evento[1]['type']), [
+            (10, {'type': ORDERS_CANCELLED, 'orders': [resumos[1]]}),
+            (10, {'type': ORDERS_STATUS_CHANGED, 'orders': [resumos[0], resumos[2]]}),
+        ])
+
+    def test_nada_publicado_sem_commit(self):
+        with mock.patch('delivery.events._dispatch') as dispatch:
+            with self.captureOnCommitCallbacks(execute=False):
+                publish_status_changes([{'id': 1, 'pedido_status': 'ready'}], {1: 10})
+        dispatch.assert_not_called()
+
+    def test_alteracao_em_lote_publica_resumos(self):
+        client = api_client(criar_operador(self.estabelecimento))
+        pedido = self.criar_pedido()
+        eventos = self.publicados(lambda: client.post('/orders_bulk_status', {'ids': [pedido.id], 'status': 'preparing'}, format='json'))
+        self.assertEqual(len(eventos), 1)
+        estabelecimento_id, evento = eventos[0]
+        self.assertEqual((estabelecimento_id, evento['type']), (self.estabelecimento.id, ORDERS_STATUS_CHANGED))
+        self.assertEqual(evento['orders'][0]['id'], pedido.id)
+        self.assertEqual(evento['orders'][0]['status_anterior'], 'pending')
+
+class EventLogTests(TestCase):
+    def setUp(self):
+        self.estabelecimento = criar_estabelecimento()
+
+    def test_record_numera_em_sequencia(self):
+        primeiros = _record(self.estabelecimento.id, [{'type': 'new_order'}, {'type': 'new_order'}])
+        seguinte = _record(self.estabelecimento.id, [{'type': 'orders_status_changed'}])
+        self.assertEqual([evento['seq'] for evento in primeiros + seguinte], [1, 2, 3])
+        self.assertEqual(EventoPedido.objects.filter(evento_estabelecimento=self.estabelecimento).count(), 3)
+
+    def test_events_since(self):
+        _record(self.estabelecimento.id, [{'type': 'new_order', 'n': n} for n in range(5)])
+        self.assertEqual([evento['seq'] for evento in events_since(self.estabelecimento.id, 2)], [3, 4, 5])
+        self.assertEqual(events_since(self.estabelecimento.id, 5), [])
+        # Sequência desconhecida (maior que a atual): o cliente recarrega
+        self.assertIsNone(events_since(self.estabelecimento.id, 9))
+
+    def test_events_since_descartados(self):
+        _record(self.estabelecimento.id, [{'type': 'new_order'} for _ in range(3)])
+        EventoPedido.objects.filter(evento_seq__lte=2).delete()
+        self.assertIsNone(events_since(self.estabelecimento.id, 0))
+        self.assertEqual(len(events_since(self.estabelecimento.id, 2)), 1)
+
+    def test_events_since_acima_do_limite(self):
+        _record(self.estabelecimento.id, [{'type': 'new_order'} for _ in range(EVENT_REPLAY_MAX + 1)])
+        self.assertIsNone(events_since(self.estabelecimento.id, 0))
+        self.assertEqual(len(events_since(self.estabelecimento.id, 1)), EVENT_REPLAY_MAX)
+
+class OrderReplayTests(TransactionTestCase):
+    # O consumer lê o log em outra thread: os dados precisam estar commitados
+
+    def setUp(self):
+        self.estabelecimento = criar_estabelecimento()
+        user = criar_operador(self.estabelecimento)
+        self.token = add_user_claims(AccessToken.for_user(user), user)
+
+    def receber(self, last_seq):
+        async def conectar():
+            path = f'/ws/orders/{self.estabelecimento.id}/?token={self.token}&last_seq={last_seq}'
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+            conectado, _ = await communicator.connect()
+            self.assertTrue(conectado)
+            mensagens = []
+            while not await communicator.receive_nothing(timeout=0.2):
+                mensagens.append(json.loads(await communicator.receive_from()))
+            await communicator.disconnect()
+            return mensagens
+        return async_to_sync(conectar)()
+
+    def test_reenvia_o_que_foi_perdido(self):
+        _record(self.estabelecimento.id, [{'type': 'new_order', 'n': n} for n in range(3)])
+        mensagens = self.receber(1)
+        self.assertEqual([mensagem.get('seq') for mensagem in mensagens], [2, 3, 3])
+        self.assertEqual(mensagens[-1]['type'], 'sync')
+
+    def test_resync_quando_o_log_nao_cobre(self):
+        _record(self.estabelecimento.id, [{'type': 'new_order'} for _ in range(3)])
+        EventoPedido.objects.filter(evento_seq=1).delete()
+        self.assertEqual(self.receber(0), [{'type': 'resync_required', 'seq': 3}])
@@ -0,0 +1,41 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.test import SimpleTestCase
+from django.utils import timezone
+from delivery.utils import FEE_QUOTE_MAX_AGE, address_hash, create_fee_quote, verify_fee_quote
+
+class FeeQuoteTests(SimpleTestCase):
+    def setUp(self):
+        self.hash = address_hash('Rua das Flores', '10', 'Centro', 'São José', 'SC')
+
+    def test_round_trip(self):
+        token = create_fee_quote(1, self.hash, 3.14159, Decimal('7.50'))
+        self.assertEqual(verify_fee_quote(token, 1, self.hash), (3.142, Decimal('7.50')))
+
+    def test_expirada(self):
+        token = create_fee_quote(1, self.hash, 2, Decimal('5'))
+        depois = timezone.now() + timedelta(seconds=FEE_QUOTE_MAX_AGE + 1)
+        with mock.patch('django.core.signing.time.time', return_value=depois.timestamp()):
+            with self.assertRaisesMessage(ValueError, 'expirada'):
+                verify_fee_quote(token, 1, self.hash)
+
+    def test_adulterada(self):
+        token = create_fee_quote(1, self.hash, 2, Decimal('5'))
+        with self.assertRaisesMessage(ValueError, 'inválida'):
+            verify_fee_quote(token[:-2] + ('aa' if token[-2:] != 'aa' else 'bb'), 1, self.hash)
+
+    def test_outro_endereco_ou_estabelecimento(self):
+        token = create_fee_quote(1, self.hash, 2, Decimal('5'))
+        outro = address_hash('Rua das Flores', '12', 'Centro', 'São José', 'SC')
+        with self.assertRaises(ValueError):
+            verify_fee_quote(token, 1, outro)
+        with self.assertRaises(ValueError):
+            verify_fee_quote(token, 2, self.hash)
+
+    def test_hash_normaliza_grafia(self):
+        # A cotação feita com a grafia digitada vale para o endereço salvo do cliente
+        self.assertEqual(
+            address_hash('r. das flores', '10', 'centro', 'Sao Jose', 'sc'),
+            self.hash
+        )
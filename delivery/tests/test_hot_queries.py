@@ -0,0 +1,39 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from delivery.hot_queries import HOT_QUERIES
+from delivery.models import Pedido
+from delivery.summaries import build_order_board
+from .helpers import PedidosMixin, api_client, criar_operador
+
+class HotQueriesTests(PedidosMixin, TestCase):
+    def setUp(self):
+        self.criar_pedido()
+
+    def executadas(self, func):
+        with CaptureQueriesContext(connection) as contexto:
+            func()
+        return [query['sql'] for query in contexto.captured_queries]
+
+    def explicada(self, nome):
+        queryset = HOT_QUERIES[nome](self.estabelecimento.id)
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            return connection.ops.last_executed_query(cursor, sql, params)
+
+    def test_quadro_explica_a_consulta_da_view(self):
+        executadas = self.executadas(lambda: build_order_board(Pedido.objects.filter(pedido_estabelecimento=self.estabelecimento)))
+        self.assertIn(self.explicada('orders_board'), executadas)
+
+    def test_listagem_explica_a_consulta_da_view(self):
+        client = api_client(criar_operador(self.estabelecimento))
+        executadas = self.executadas(lambda: client.get('/orders_list'))
+        self.assertIn(self.explicada('orders_list'), executadas)
+
+    def test_comando(self):
+        saida = StringIO()
+        call_command('explicar_consultas', estabelecimento=self.estabelecimento.id, stdout=saida)
+        for nome in HOT_QUERIES:
+            self.assertIn(f'== {nome}', saida.getvalue())
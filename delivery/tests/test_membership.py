@@ -0,0 +1,58 @@
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from delivery.auth import SEM_ESTABELECIMENTO, membership_key, user_estabelecimento_id
+from delivery.models import UserProfile
+from .helpers import criar_estabelecimento, criar_operador
+
+class MembershipCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.estabelecimento = criar_estabelecimento()
+        cls.outro = criar_estabelecimento(cnpj='2')
+        cls.user = criar_operador(cls.estabelecimento)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_consulta_uma_vez(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(user_estabelecimento_id(self.user.id), self.estabelecimento.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(user_estabelecimento_id(self.user.id), self.estabelecimento.id)
+
+    def test_sem_perfil_e_inativo_ficam_em_cache(self):
+        sem_perfil = User.objects.create_user('sem_perfil', password='senha')
+        inativo = criar_operador(self.estabelecimento, username='inativo')
+        User.objects.filter(id=inativo.id).update(is_active=False)
+        for user in (sem_perfil, inativo):
+            self.assertIsNone(user_estabelecimento_id(user.id))
+            self.assertEqual(cache.get(membership_key(user.id)), SEM_ESTABELECIMENTO)
+            with self.assertNumQueries(0):
+                self.assertIsNone(user_estabelecimento_id(user.id))
+
+    def test_sinais_invalidam(self):
+        user_estabelecimento_id(self.user.id)
+        self.user.profile.estabelecimento = self.outro
+        self.user.profile.save()
+        self.assertEqual(user_estabelecimento_id(self.user.id), self.outro.id)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(user_estabelecimento_id(self.user.id))
+
+    def test_update_em_massa_invalida(self):
+        user_estabelecimento_id(self.user.id)
+        UserProfile.objects.filter(user=self.user).update(estabelecimento=self.outro)
+        self.assertEqual(user_estabelecimento_id(self.user.id), self.outro.id)
+
+        profile = UserProfile.objects.get(user=self.user)
+        profile.estabelecimento = self.estabelecimento
+        UserProfile.objects.bulk_update([profile], ['estabelecimento'])
+        self.assertEqual(user_estabelecimento_id(self.user.id), self.estabelecimento.id)
+
+    def test_acao_desativar_do_admin(self):
+        user_estabelecimento_id(self.user.id)
+        admin.site._registry[User].desativar(None, User.objects.filter(id=self.user.id))
+        self.assertIsNone(user_estabelecimento_id(self.user.id))
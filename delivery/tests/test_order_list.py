@@ -0,0 +1,38 @@
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from delivery.utils import decode_order_cursor, encode_order_cursor
+from .helpers import PedidosMixin, api_client, criar_operador
+
+class OrderCursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        data = timezone.now().replace(microsecond=123456)
+        self.assertEqual(decode_order_cursor(encode_order_cursor(data, 42)), (data, 42))
+
+    def test_cursor_invalido(self):
+        for cursor in ('', 'nao-e-base64!', 'eyJ4IjoxfQ'):
+            with self.assertRaises(ValueError):
+                decode_order_cursor(cursor)
+
+class OrderListTests(PedidosMixin, TestCase):
+    def setUp(self):
+        self.client = api_client(criar_operador(self.estabelecimento))
+
+    def test_paginas_sem_repeticao(self):
+        ids = [self.criar_pedido().id for _ in range(5)]
+        self.criar_pedido('completed')
+        vistos = []
+        params = {'limite': 2}
+        while True:
+            response = self.client.get('/orders_list', params)
+            self.assertEqual(response.status_code, 200)
+            vistos.extend(pedido['id'] for pedido in response.data['pedidos'])
+            if not response.data['proximo_cursor']:
+                break
+            params['cursor'] = response.data['proximo_cursor']
+        # Do mais recente para o mais antigo, só os do status pedido
+        self.assertEqual(vistos, sorted(ids, reverse=True))
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get('/orders_list', {'cursor': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/orders_list', {'limite': 0}).status_code, 400)
+        self.assertEqual(self.client.get('/orders_list', {'data_inicio': 'ontem'}).status_code, 400)
@@ -0,0 +1,69 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from delivery.models import TrabalhoImpressao
+from delivery.printing import (
+    PRINT_JOB_MAX_AGE, PRINT_JOB_MAX_TENTATIVAS, claim_print_jobs, confirm_print_job, fail_print_job,
+    release_print_jobs, requeue_print_jobs
+)
+from .helpers import PedidosMixin
+
+class PrintJobTests(PedidosMixin, TestCase):
+    def setUp(self):
+        self.pedidos = [self.criar_pedido() for _ in range(3)]
+        self.trabalhos = TrabalhoImpressao.objects.bulk_create([
+            TrabalhoImpressao(trabalho_estabelecimento=self.estabelecimento, trabalho_pedido=pedido)
+            for pedido in self.pedidos
+        ])
+
+    def test_claim_confirm(self):
+        lote, lidos = claim_print_jobs(self.estabelecimento.id, 'agente-1')
+        self.assertEqual(lote, [(trabalho.id, trabalho.trabalho_pedido_id) for trabalho in self.trabalhos])
+        self.assertEqual(lidos, 3)
+        # Já reservados: outro agente não recebe os mesmos trabalhos
+        self.assertEqual(claim_print_jobs(self.estabelecimento.id, 'agente-2'), ([], 0))
+
+        self.assertTrue(confirm_print_job(self.estabelecimento.id, self.trabalhos[0].id))
+        self.assertFalse(confirm_print_job(self.estabelecimento.id, self.trabalhos[0].id))
+        self.trabalhos[0].refresh_from_db()
+        self.assertEqual(self.trabalhos[0].trabalho_status, 'printed')
+
+    def test_limite_do_lote(self):
+        lote, lidos = claim_print_jobs(self.estabelecimento.id, 'agente-1', limit=2)
+        self.assertEqual((len(lote), lidos), (2, 2))
+
+    def test_release_e_falha_voltam_para_a_fila(self):
+        claim_print_jobs(self.estabelecimento.id, 'agente-1')
+        self.assertTrue(fail_print_job(self.estabelecimento.id, self.trabalhos[0].id, 'Sem papel'))
+        self.assertEqual(release_print_jobs(self.estabelecimento.id, 'agente-1'), 2)
+        lote, _ = claim_print_jobs(self.estabelecimento.id, 'agente-2')
+        self.assertEqual(len(lote), 3)
+
+    def test_sem_confirmacao_e_reenviado(self):
+        claim_print_jobs(self.estabelecimento.id, 'agente-1')
+        TrabalhoImpressao.objects.update(trabalho_enviado_em=timezone.now() - timedelta(hours=1))
+        lote, _ = claim_print_jobs(self.estabelecimento.id, 'agente-2')
+        self.assertEqual(len(lote), 3)
+
+    def test_tentativas_esgotadas(self):
+        TrabalhoImpressao.objects.filter(id=self.trabalhos[0].id).update(trabalho_tentativas=PRINT_JOB_MAX_TENTATIVAS)
+        lote, lidos = claim_print_jobs(self.estabelecimento.id, 'agente-1')
+        # O descartado conta nas linhas lidas, mas não é entregue
+        self.assertEqual((len(lote), lidos), (2, 3))
+        self.trabalhos[0].refresh_from_db()
+        self.assertEqual(self.trabalhos[0].trabalho_status, 'failed')
+
+    def test_expirado_e_reimpressao(self):
+        antigo = timezone.now() - timedelta(seconds=PRINT_JOB_MAX_AGE + 60)
+        TrabalhoImpressao.objects.update(trabalho_enfileirado_em=antigo, created_at=antigo)
+        self.assertEqual(claim_print_jobs(self.estabelecimento.id, 'agente-1'), ([], 0))
+        self.assertEqual(TrabalhoImpressao.objects.filter(trabalho_status='failed').count(), 3)
+
+        with self.captureOnCommitCallbacks():
+            requeue_print_jobs(TrabalhoImpressao.objects.filter(id=self.trabalhos[0].id))
+        trabalho = TrabalhoImpressao.objects.get(id=self.trabalhos[0].id)
+        # A data de criação continua a original; só a entrada na fila é renovada
+        self.assertEqual(trabalho.created_at, antigo)
+        self.assertGreater(trabalho.trabalho_enfileirado_em, antigo)
+        lote, _ = claim_print_jobs(self.estabelecimento.id, 'agente-1')
+        self.assertEqual(lote, [(trabalho.id, trabalho.trabalho_pedido_id)])
@@ -0,0 +1,95 @@
+from django.test import SimpleTestCase, TestCase
+from delivery.receipts import ESC_INIT, GS_FEED_AND_CUT, load_receipt_data, parse_columns, render_escpos, render_text
+from .helpers import PedidosMixin, api_client, criar_operador
+
+class ReceiptTests(SimpleTestCase):
+    def dados(self, **extra):
+        dados = {
+            'id': 7,
+            'estabelecimento_nome': 'Lanchonete Boa Vista',
+            'colunas_ticket': 32,
+            'pedido_data': '2024-05-10T19:30:00-03:00',
+            'pedido_tipo_entrega': 'delivery',
+            'pedido_cliente': {
+                'cliente_nome': 'João', 'cliente_telefone': '11999999999',
+                'cliente_rua': 'Rua das Flores', 'cliente_numero': '10',
+                'cliente_complemento': 'Ap 3', 'cliente_bairro': 'Centro',
+            },
+            'itens': [{
+                'itens_pedido_quantidade': 2, 'produto_nome': 'X-Burguer', 'tamanho_nome': None,
+                'itens_pedido_preco_final': '30.00', 'acrescimos': ['Bacon'],
+            }],
+            'pedido_taxa_entrega': '5.00',
+            'pedido_valor_total': '35.00',
+            'pedido_forma_pagamento': 'Pix',
+            'pedido_troco': None,
+            'pedido_observacao': 'Sem cebola',
+        }
+        dados.update(extra)
+        return dados
+
+    def test_render_text(self):
+        texto = render_text(self.dados())
+        linhas = texto.splitlines()
+        self.assertTrue(all(len(linha) <= 32 for linha in linhas))
+        self.assertIn('Pedido #000007', texto)
+        self.assertIn('10/05/2024 19:30', texto)
+        # Endereço longo quebra com recuo
+        self.assertIn('Entrega: Rua das Flores, 10 - Ap\n  3 - Centro', texto)
+        self.assertIn('   + Bacon', texto)
+        self.assertTrue(any(linha.startswith('TOTAL') and linha.endswith('R$ 35,00') for linha in linhas))
+        self.assertIn('Obs: Sem cebola', texto)
+
+    def test_render_text_retirada_sem_taxa(self):
+        texto = render_text(self.dados(pedido_tipo_entrega='retirada', pedido_taxa_entrega='0'), 40)
+        self.assertIn('Retirada no local', texto)
+        self.assertNotIn('Taxa de entrega', texto)
+        self.assertTrue(all(len(linha) <= 40 for linha in texto.splitlines()))
+
+    def test_render_escpos(self):
+        saida = render_escpos(self.dados())
+        self.assertTrue(saida.startswith(ESC_INIT))
+        self.assertTrue(saida.endswith(GS_FEED_AND_CUT))
+        self.assertIn('João'.encode('cp860'), saida)
+
+    def test_parse_columns(self):
+        self.assertIsNone(parse_columns(None))
+        self.assertIsNone(parse_columns(''))
+        self.assertEqual(parse_columns('48'), 48)
+        for valor in ('23', '65', 'abc'):
+            with self.assertRaises(ValueError):
+                parse_columns(valor)
+
+class ReceiptEndpointTests(PedidosMixin, TestCase):
+    def setUp(self):
+        self.pedido = self.criar_pedido(quantidade=2)
+        self.client = api_client(criar_operador(self.estabelecimento))
+
+    def imprimir(self, **params):
+        return self.client.get(f'/orders_print/{self.pedido.id}/', params)
+
+    def test_load_receipt_data(self):
+        outro = self.criar_pedido()
+        with self.assertNumQueries(3):
+            dados = load_receipt_data([outro.id, self.pedido.id, 0])
+        self.assertEqual([item['id'] for item in dados], [outro.id, self.pedido.id])
+        self.assertEqual(dados[1]['estabelecimento_nome'], 'Loja')
+        self.assertEqual(dados[1]['pedido_cliente']['cliente_rua'], 'Rua B')
+
+    def test_texto(self):
+        response = self.imprimir(formato='texto', colunas=40)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        texto = response.content.decode()
+        self.assertIn(f'Pedido #{str(self.pedido.id).zfill(6)}', texto)
+        self.assertTrue(all(len(linha) <= 40 for linha in texto.splitlines()))
+
+    def test_escpos(self):
+        response = self.imprimir(formato='escpos')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(ESC_INIT))
+
+    def test_colunas_invalidas(self):
+        for colunas in ('10', '200', 'x'):
+            self.assertEqual(self.imprimir(formato='texto', colunas=colunas).status_code, 400)
+
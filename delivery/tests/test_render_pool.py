@@ -0,0 +1,69 @@
+import multiprocessing
+import time
+from concurrent.futures import Future
+from unittest import mock
+from django.test import SimpleTestCase
+from delivery import tickets
+from delivery.tickets import RenderPool, get_render_pool, run_render
+
+class RenderPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = RenderPool()
+        self.addCleanup(self.pool.shutdown, terminate=True)
+
+    def test_travado_so_sem_terminar_alem_do_limite(self):
+        self.assertFalse(self.pool.stalled())
+        self.pool.ativos[Future()] = 10
+        self.pool.progresso = time.monotonic() - 5
+        self.assertFalse(self.pool.stalled())
+        self.pool.progresso = time.monotonic() - 20
+        self.assertTrue(self.pool.stalled())
+
+    def test_termino_remove_pendente(self):
+        future = Future()
+        self.pool.ativos[future] = 10
+        self.pool.progresso = time.monotonic() - 20
+        self.pool._done(future)
+        self.assertEqual(self.pool.ativos, {})
+        self.assertFalse(self.pool.stalled())
+
+    def test_encerra_processo_travado(self):
+        future = self.pool.submit(time.sleep, limite=60)
+        prazo = time.monotonic() + 30
+        while not self.pool.worker_pids() and time.monotonic() < prazo:
+            time.sleep(0.1)
+        pids = self.pool.worker_pids()
+        self.assertEqual(len(pids), 1)
+
+        self.pool.shutdown(terminate=True)
+        prazo = time.monotonic() + 10
+        while any(processo.pid in pids for processo in multiprocessing.active_children()) and time.monotonic() < prazo:
+            time.sleep(0.1)
+        self.assertFalse(any(processo.pid in pids for processo in multiprocessing.active_children()))
+        self.assertTrue(future.done())
+
+class RunRenderTests(SimpleTestCase):
+    def setUp(self):
+        self.future = Future()
+        self.pool = mock.Mock(spec=RenderPool)
+        self.pool.submit.return_value = self.future
+        patcher = mock.patch('delivery.tickets.RenderPool', return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tickets._render_pool = None
+        self.addCleanup(setattr, tickets, '_render_pool', None)
+        # Libera a vaga da fila ao fim do teste
+        self.addCleanup(self.future.cancel)
+
+    def test_pool_travado_e_descartado(self):
+        self.pool.stalled.return_value = True
+        with self.assertRaises(TimeoutError):
+            run_render(time.sleep, 1)
+        self.pool.shutdown.assert_called_once_with(terminate=True)
+        self.assertIsNone(tickets._render_pool)
+
+    def test_resultado(self):
+        self.future.set_result('ok')
+        self.assertEqual(run_render(time.sleep, 1), 'ok')
+        self.assertIs(get_render_pool(), self.pool)
+        self.pool.shutdown.assert_not_called()
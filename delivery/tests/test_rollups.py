@@ -0,0 +1,49 @@
+from decimal import Decimal
+from django.test import TestCase
+from delivery.models import Pedido, ResumoVendas, ResumoVendasProduto
+from delivery.archive import archive_chunk
+from delivery.rollups import apply_status_change, rebuild_rollups
+from .helpers import PedidosMixin
+
+class RollupTests(PedidosMixin, TestCase):
+    def test_concluir_e_cancelar(self):
+        pedido = self.criar_pedido(status='ready', quantidade=2)
+        apply_status_change([pedido.id], {pedido.id: 'ready'}, 'completed')
+        resumo = ResumoVendas.objects.get(resumo_vendas_estabelecimento=self.estabelecimento)
+        self.assertEqual(resumo.resumo_vendas_pedidos, 1)
+        self.assertEqual(resumo.resumo_vendas_faturamento, Decimal('20'))
+        produto = ResumoVendasProduto.objects.get(resumo_produto_produto=self.produto)
+        self.assertEqual(produto.resumo_produto_quantidade, 2)
+
+        # Pedido concluído e depois cancelado sai do faturamento e entra nos cancelados
+        apply_status_change([pedido.id], {pedido.id: 'completed'}, 'cancelled')
+        resumo.refresh_from_db()
+        self.assertEqual(resumo.resumo_vendas_pedidos, 0)
+        self.assertEqual(resumo.resumo_vendas_faturamento, Decimal('0'))
+        self.assertEqual(resumo.resumo_vendas_cancelados, 1)
+        self.assertEqual(resumo.resumo_vendas_valor_cancelado, Decimal('20'))
+        produto.refresh_from_db()
+        self.assertEqual(produto.resumo_produto_quantidade, 0)
+
+    def test_status_fora_do_consolidado(self):
+        pedido = self.criar_pedido()
+        apply_status_change([pedido.id], {pedido.id: 'pending'}, 'preparing')
+        self.assertFalse(ResumoVendas.objects.exists())
+
+    def test_recalculo_igual_ao_incremental(self):
+        # Pedidos arquivados continuam contando no recálculo completo
+        concluidos = [self.criar_pedido('ready', quantidade=n) for n in (1, 3)]
+        cancelado = self.criar_pedido('pending')
+        apply_status_change([pedido.id for pedido in concluidos], {pedido.id: 'ready' for pedido in concluidos}, 'completed')
+        apply_status_change([cancelado.id], {cancelado.id: 'pending'}, 'cancelled')
+        Pedido.objects.filter(id__in=[pedido.id for pedido in concluidos]).update(pedido_status='completed')
+        Pedido.objects.filter(id=cancelado.id).update(pedido_status='cancelled')
+        archive_chunk([concluidos[0].id])
+
+        campos = ('resumo_vendas_pedidos', 'resumo_vendas_faturamento', 'resumo_vendas_cancelados', 'resumo_vendas_valor_cancelado')
+        incremental = list(ResumoVendas.objects.values(*campos))
+        produtos = list(ResumoVendasProduto.objects.values('resumo_produto_quantidade', 'resumo_produto_faturamento'))
+        self.assertEqual(rebuild_rollups(self.estabelecimento.id), (3, (1, 1)))
+        self.assertEqual(list(ResumoVendas.objects.values(*campos)), incremental)
+        self.assertEqual(list(ResumoVendasProduto.objects.values('resumo_produto_quantidade', 'resumo_produto_faturamento')), produtos)
+        self.assertEqual(incremental[0]['resumo_vendas_pedidos'], 2)
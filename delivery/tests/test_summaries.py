@@ -0,0 +1,29 @@
+from decimal import Decimal
+from django.test import TestCase
+from delivery.models import Acrescimo, Pedido
+from delivery.summaries import summarize_order, summarize_orders
+from .helpers import PedidosMixin
+
+class OrderSummaryTests(PedidosMixin, TestCase):
+    def test_resumo(self):
+        pedido = self.criar_pedido(quantidade=2)
+        bacon = Acrescimo.objects.create(acrescimo_nome='Bacon', acrescimo_preco=Decimal('3'), acrescimo_tipo=self.produto.produto_tipo)
+        pedido.itens.get().itens_pedido_acrescimos.add(bacon)
+
+        resumo = summarize_order(pedido.id)
+        self.assertEqual(resumo['pedido_status'], 'pending')
+        self.assertEqual(resumo['pedido_valor_total'], '20.00')
+        self.assertEqual(resumo['pedido_forma_pagamento'], 'Pix')
+        self.assertEqual(resumo['pedido_cliente'], {'cliente_nome': 'Ana', 'cliente_telefone': '11988887777'})
+        self.assertEqual(len(resumo['itens']), 1)
+        item = resumo['itens'][0]
+        self.assertEqual((item['produto_nome'], item['itens_pedido_quantidade'], item['acrescimos']), ('X-Burguer', 2, ['Bacon']))
+        self.assertIsNone(summarize_order(0))
+
+    def test_consultas_fixas(self):
+        # Pedidos, itens e acréscimos: três SELECTs qualquer que seja a quantidade
+        for _ in range(5):
+            self.criar_pedido()
+        with self.assertNumQueries(3):
+            resumos = summarize_orders(Pedido.objects.order_by('-id'))
+        self.assertEqual([resumo['id'] for resumo in resumos], list(Pedido.objects.order_by('-id').values_list('id', flat=True)))
@@ -0,0 +1,93 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+from django.test import TestCase
+from delivery.models import Pedido
+from delivery.tickets import RenderPoolBusy, fetch_ticket, load_ticket_order, schedule_ticket_prerender, store_ticket, ticket_version
+from .helpers import PedidosMixin, api_client, criar_operador
+
+PDF = b'%PDF-1.7 ticket'
+
+class TicketCacheTests(PedidosMixin, TestCase):
+    def setUp(self):
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio, ignore_errors=True)
+        patcher = mock.patch('delivery.tickets.TICKET_CACHE_DIR', Path(diretorio))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pedido = self.criar_pedido()
+        self.client = api_client(criar_operador(self.estabelecimento))
+        # O pool roda a mesma função do worker; aqui a "renderização" só grava o PDF
+        self.renderizacoes = 0
+
+        def run_render(fn, pedido_id, limite=None):
+            self.renderizacoes += 1
+            pedido = load_ticket_order(pedido_id)
+            return str(store_ticket(pedido, ticket_version(pedido), PDF)), ticket_version(pedido), False
+
+        patcher = mock.patch('delivery.tickets.run_render', side_effect=run_render)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def imprimir(self, **headers):
+        return self.client.get(f'/orders_print/{self.pedido.id}/', {'formato': 'pdf'}, headers=headers)
+
+    def test_miss_e_hit(self):
+        response = self.imprimir()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Ticket-Cache'], 'MISS')
+        self.assertEqual(b''.join(response.streaming_content), PDF)
+
+        response = self.imprimir()
+        self.assertEqual(response['X-Ticket-Cache'], 'HIT')
+        self.assertEqual(b''.join(response.streaming_content), PDF)
+        self.assertEqual(self.renderizacoes, 1)
+
+    def test_etag(self):
+        etag = self.imprimir()['ETag']
+        self.assertEqual(etag, f'"{ticket_version(load_ticket_order(self.pedido.id))}"')
+        response = self.imprimir(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # Mudança de status não altera o ticket; mudança de conteúdo sim
+        Pedido.objects.filter(id=self.pedido.id).update(pedido_status='preparing')
+        self.assertEqual(self.imprimir(if_none_match=etag).status_code, 304)
+        Pedido.objects.filter(id=self.pedido.id).update(pedido_observacao='Sem cebola')
+        response = self.imprimir(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response['X-Ticket-Cache'], 'MISS')
+
+    def test_pdf_removido_antes_de_abrir(self):
+        # O PDF recém-gravado some antes da abertura (limpeza do cache): renderiza de novo
+        pedido = load_ticket_order(self.pedido.id)
+        caminhos = iter([str(Path(tempfile.gettempdir()) / 'inexistente.pdf'), None])
+
+        def run_render(fn, pedido_id, limite=None):
+            caminho = next(caminhos) or str(store_ticket(pedido, ticket_version(pedido), PDF))
+            return caminho, ticket_version(pedido), False
+
+        with mock.patch('delivery.tickets.run_render', side_effect=run_render):
+            arquivo, _, cache_hit = fetch_ticket(pedido)
+        with arquivo:
+            self.assertEqual(arquivo.read(), PDF)
+        self.assertFalse(cache_hit)
+
+class TicketPrerenderTests(TestCase):
+    def test_agendada_depois_do_commit(self):
+        with mock.patch('delivery.tickets._submit_render', return_value=(mock.Mock(), mock.Mock())) as submit_render:
+            with self.captureOnCommitCallbacks() as callbacks:
+                schedule_ticket_prerender([1, 2])
+            submit_render.assert_not_called()
+            for callback in callbacks:
+                callback()
+        self.assertEqual([chamada.args[1] for chamada in submit_render.call_args_list], [1, 2])
+
+    def test_fila_cheia_nao_falha(self):
+        # Pré-renderização é só otimização: com a fila cheia, desiste sem erro
+        with mock.patch('delivery.tickets._submit_render', side_effect=RenderPoolBusy) as submit_render:
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_ticket_prerender([1, 2])
+        self.assertEqual(submit_render.call_count, 1)
@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from delivery.models import NotificacaoWhatsApp
+from delivery.whatsapp import (
+    MAX_TENTATIVAS, SENDING_TIMEOUT_SECONDS, EvolutionSender, claim_batch, record_result
+)
+from delivery.management.commands.enviar_whatsapp import Command as EnviarWhatsApp
+from .helpers import criar_estabelecimento
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.estabelecimento = criar_estabelecimento()
+
+    def criar(self, **campos):
+        return NotificacaoWhatsApp.objects.create(
+            notificacao_estabelecimento=self.estabelecimento, notificacao_instancia='loja',
+            notificacao_telefone='5511988887777', notificacao_mensagem='Olá', **campos
+        )
+
+    def recarregar(self, notificacao):
+        notificacao.refresh_from_db()
+        return notificacao
+
+    def test_claim_batch(self):
+        vencida = self.criar()
+        self.criar(notificacao_proxima_tentativa=timezone.now() + timedelta(minutes=5))
+        self.criar(notificacao_status='sent')
+        lote = claim_batch(10)
+        self.assertEqual(lote, [(vencida.id, 'loja', '5511988887777', 'Olá')])
+        self.assertEqual(self.recarregar(vencida).notificacao_status, 'sending')
+        # Já reservada: não sai de novo no próximo ciclo
+        self.assertEqual(claim_batch(10), [])
+
+    def test_claim_batch_recupera_envio_interrompido(self):
+        presa = self.criar(notificacao_status='sending')
+        NotificacaoWhatsApp.objects.filter(id=presa.id).update(
+            updated_at=timezone.now() - timedelta(seconds=SENDING_TIMEOUT_SECONDS + 1)
+        )
+        self.assertEqual([item[0] for item in claim_batch(10)], [presa.id])
+
+    def test_claim_batch_limite(self):
+        for _ in range(3):
+            self.criar()
+        self.assertEqual(len(claim_batch(2)), 2)
+        self.assertEqual(len(claim_batch(2)), 1)
+
+    def test_enviada(self):
+        notificacao = self.criar(notificacao_status='sending')
+        self.assertEqual(record_result(notificacao.id, None), 'sent')
+        notificacao = self.recarregar(notificacao)
+        self.assertEqual(notificacao.notificacao_status, 'sent')
+        self.assertIsNotNone(notificacao.notificacao_enviada_em)
+
+    def test_erro_temporario_reagenda(self):
+        notificacao = self.criar(notificacao_status='sending')
+        antes = timezone.now()
+        self.assertEqual(record_result(notificacao.id, 'HTTP 503'), 'pending')
+        notificacao = self.recarregar(notificacao)
+        self.assertEqual(notificacao.notificacao_tentativas, 1)
+        self.assertEqual(notificacao.notificacao_ultimo_erro, 'HTTP 503')
+        self.assertGreater(notificacao.notificacao_proxima_tentativa, antes)
+
+    def test_descartada_apos_tentativas(self):
+        notificacao = self.criar(notificacao_status='sending', notificacao_tentativas=MAX_TENTATIVAS - 1)
+        self.assertEqual(record_result(notificacao.id, 'timeout'), 'dead')
+        self.assertEqual(self.recarregar(notificacao).notificacao_tentativas, MAX_TENTATIVAS)
+
+    def test_erro_definitivo(self):
+        notificacao = self.criar(notificacao_status='sending')
+        self.assertEqual(record_result(notificacao.id, 'HTTP 400', definitivo=True), 'dead')
+        self.assertEqual(self.recarregar(notificacao).notificacao_tentativas, 1)
+
+    def test_worker_grava_os_resultados_do_lote(self):
+        ok, falha, quebrada = self.criar(), self.criar(), self.criar()
+
+        def send(notificacao_id, *args):
+            if notificacao_id == quebrada.id:
+                raise RuntimeError('falha inesperada')
+            return notificacao_id, 'HTTP 503' if notificacao_id == falha.id else None, False
+
+        comando = EnviarWhatsApp(stdout=StringIO())
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            comando.process_batch(mock.Mock(send=send), executor, 10)
+        # Uma mensagem com erro inesperado não impede as outras de serem gravadas
+        self.assertEqual(
+            [self.recarregar(n).notificacao_status for n in (ok, falha, quebrada)],
+            ['sent', 'pending', 'sending']
+        )
+
+class EvolutionSenderTests(SimpleTestCase):
+    def setUp(self):
+        with mock.patch('delivery.whatsapp.config', side_effect=lambda nome, **kwargs: kwargs.get('default', 'x')):
+            self.sender = EvolutionSender(rate=1000)
+        self.sender.local.session = mock.Mock()
+
+    def enviar(self, status_code):
+        self.sender.local.session.post.return_value = mock.Mock(status_code=status_code, text='erro')
+        return self.sender.send(1, 'loja', '5511988887777', 'Olá')
+
+    def test_classificacao_das_respostas(self):
+        self.assertEqual(self.enviar(201), (1, None, False))
+        # 4xx não muda com reenvio; 429 e 5xx sim
+        self.assertTrue(self.enviar(400)[2])
+        self.assertFalse(self.enviar(429)[2])
+        self.assertFalse(self.enviar(503)[2])
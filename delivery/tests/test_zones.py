@@ -0,0 +1,38 @@
+from decimal import Decimal
+from django.test import TestCase
+from googlemaps.convert import encode_polyline
+from delivery.models import DeliveryZone
+from delivery.zones import find_delivery_zone, invalidate_zone_index, point_in_polygon
+from .helpers import criar_estabelecimento
+
+QUADRADO = [(0.0, 0.0), (0.0, 1.0), (1.0, 1.0), (1.0, 0.0)]
+
+class DeliveryZoneTests(TestCase):
+    def test_point_in_polygon(self):
+        self.assertTrue(point_in_polygon(0.5, 0.5, QUADRADO))
+        self.assertFalse(point_in_polygon(1.5, 0.5, QUADRADO))
+        self.assertFalse(point_in_polygon(0.5, -0.1, QUADRADO))
+
+    def test_point_in_polygon_concavo(self):
+        # Formato de "U": o ponto no recorte fica fora, embora dentro do retângulo envolvente
+        u = [(0, 0), (0, 3), (3, 3), (3, 2), (1, 2), (1, 1), (3, 1), (3, 0)]
+        self.assertFalse(point_in_polygon(2, 1.5, u))
+        self.assertTrue(point_in_polygon(0.5, 1.5, u))
+
+    def test_find_delivery_zone_por_prioridade(self):
+        estabelecimento = criar_estabelecimento()
+        self.addCleanup(invalidate_zone_index, estabelecimento.id)
+        grande = [(-1.0, -1.0), (-1.0, 2.0), (2.0, 2.0), (2.0, -1.0)]
+        DeliveryZone.objects.create(
+            estabelecimento=estabelecimento, name='Bairros', delivery_fee=Decimal('9'),
+            polygon=encode_polyline(grande), priority=2
+        )
+        DeliveryZone.objects.create(
+            estabelecimento=estabelecimento, name='Centro', delivery_fee=Decimal('5'),
+            polygon=encode_polyline(QUADRADO), priority=1
+        )
+        invalidate_zone_index(estabelecimento.id)
+        self.assertEqual(find_delivery_zone(estabelecimento.id, 0.5, 0.5).name, 'Centro')
+        self.assertEqual(find_delivery_zone(estabelecimento.id, 1.5, 1.5).name, 'Bairros')
+        self.assertIsNone(find_delivery_zone(estabelecimento.id, 5, 5))
+        self.assertIsNone(find_delivery_zone(estabelecimento.id, None, 0.5))
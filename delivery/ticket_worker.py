@@ -0,0 +1,60 @@
+# Funções executadas nos processos do pool de renderização de tickets.
+# O módulo não importa models no topo: no processo filho (spawn) o Django
+# ainda não foi inicializado quando ele é importado.
+import logging
+import os
+import signal
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+def init_worker(fila_pids=None):
+    # Informa o PID ao RenderPool, que encerra o processo se ele travar
+    if fila_pids is not None:
+        fila_pids.put(os.getpid())
+    import django
+    django.setup()
+
+def _timeout(signum, frame):
+    raise TimeoutError("Tempo esgotado ao renderizar o ticket")
+
+@contextmanager
+def time_limit(segundos):
+    # As tarefas rodam na thread principal do processo filho, então o SIGALRM interrompe o WeasyPrint
+    anterior = signal.signal(signal.SIGALRM, _timeout)
+    signal.setitimer(signal.ITIMER_REAL, segundos)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, anterior)
+
+def render_ticket(pedido_id, timeout):
+    from django.db import close_old_connections
+    from .tickets import load_ticket_order, get_or_render_ticket
+
+    # O processo vive muito tempo; descarta conexões expiradas pelo banco
+    close_old_connections()
+    pedido = load_ticket_order(pedido_id)
+    if pedido is None:
+        return None
+    with time_limit(timeout):
+        path, version, cache_hit = get_or_render_ticket(pedido)
+    return str(path), version, cache_hit
+
+def prerender_ticket(pedido_id, timeout):
+    resultado = render_ticket(pedido_id, timeout)
+    if resultado and not resultado[2]:
+        logger.info(f"Ticket do pedido {pedido_id} pré-renderizado")
+    return resultado
+
+def render_tickets(pedido_ids, filtros, timeout):
+    from django.db import close_old_connections
+    from .tickets import load_ticket_orders, render_tickets_pdf
+
+    close_old_connections()
+    pedidos = load_ticket_orders(pedido_ids, **filtros)
+    if not pedidos:
+        return None, 0
+    with time_limit(timeout):
+        return render_tickets_pdf(pedidos), len(pedidos)
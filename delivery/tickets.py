@@ -0,0 +1,440 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from pathlib import Path
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import get_template, render_to_string
+from .models import Pedido, ItensPedido
+
+logger = logging.getLogger(__name__)
+
+TICKET_TEMPLATE = 'delivery/order_print.html'
+# Incrementar ao alterar o template para invalidar os PDFs em cache
+TICKET_TEMPLATE_VERSION = getattr(settings, 'ORDER_TICKET_TEMPLATE_VERSION', '1')
+TICKET_CACHE_DIR = Path(getattr(settings, 'ORDER_TICKET_CACHE_DIR', settings.BASE_DIR / 'cache' / 'tickets'))
+TICKET_CACHE_MAX_BYTES = getattr(settings, 'ORDER_TICKET_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+TICKET_CACHE_MAX_AGE = getattr(settings, 'ORDER_TICKET_CACHE_MAX_AGE', 7 * 24 * 3600)
+# A limpeza do cache roda, em média, a cada N gravações
+TICKET_CACHE_EVICT_EVERY = 50
+# Pool de renderização: o WeasyPrint só roda nesses processos, nunca no worker do gunicorn
+TICKET_RENDER_WORKERS = getattr(settings, 'ORDER_TICKET_RENDER_WORKERS', 1)
+# Cada processo é substituído após N renderizações
+TICKET_RENDER_MAX_TASKS = getattr(settings, 'ORDER_TICKET_RENDER_MAX_TASKS', 100)
+# Limite por renderização, em segundos (abaixo do --timeout do gunicorn)
+TICKET_RENDER_TIMEOUT = getattr(settings, 'ORDER_TICKET_RENDER_TIMEOUT', 20)
+TICKET_RENDER_QUEUE_MAX = getattr(settings, 'ORDER_TICKET_RENDER_QUEUE_MAX', 10)
+# Espera máxima da requisição, contando a fila do pool (abaixo do --timeout 60 do gunicorn)
+TICKET_RENDER_WAIT = getattr(settings, 'ORDER_TICKET_RENDER_WAIT', 50)
+# Tempo extra por ticket no limite da impressão em lote
+TICKET_BATCH_SECONDS_PER_TICKET = getattr(settings, 'ORDER_TICKET_BATCH_SECONDS_PER_TICKET', 0.3)
+# Renderiza o ticket dos novos pedidos antes da primeira impressão
+TICKET_PRERENDER = getattr(settings, 'ORDER_TICKET_PRERENDER', True)
+# Máximo de pedidos em um PDF de impressão em lote
+TICKET_BATCH_MAX = getattr(settings, 'ORDER_TICKET_BATCH_MAX', 100)
+
+def logo_uri(estabelecimento):
+    # Logo lido direto do disco pelo WeasyPrint, sem requisição HTTP para o próprio servidor
+    logo = estabelecimento.estabelecimento_logo
+    if not logo:
+        return None
+    try:
+        return Path(logo.path).as_uri()
+    except (NotImplementedError, ValueError):
+        # Storage sem caminho local
+        return logo.url
+
+def ticket_version(pedido):
+    """
+    Versão do conteúdo impresso. Usa os campos do pedido em vez de updated_at:
+    mudanças de status não alteram o ticket e, com updated_at, invalidariam o
+    PDF pré-renderizado justamente quando a cozinha aceita o pedido.
+    """
+    chave = ':'.join(str(valor) for valor in (
+        pedido.id,
+        pedido.created_at.isoformat(),
+        pedido.pedido_valor_total,
+        pedido.pedido_taxa_entrega,
+        pedido.pedido_troco,
+        pedido.pedido_observacao,
+        pedido.pedido_tipo_entrega,
+        pedido.pedido_forma_pagamento_id,
+        TICKET_TEMPLATE_VERSION,
+        pedido.pedido_estabelecimento.estabelecimento_logo.name,
+    ))
+    return hashlib.sha256(chave.encode('utf-8')).hexdigest()[:32]
+
+def ticket_path(pedido, version):
+    return TICKET_CACHE_DIR / str(pedido.pedido_estabelecimento_id) / f"{pedido.id}-{version}.pdf"
+
+def ticket_orders(**filtros):
+    # Pedidos com os dados do ticket; também explicada por explicar_consultas
+    return Pedido.objects.select_related(
+        'pedido_cliente', 'pedido_forma_pagamento', 'pedido_estabelecimento'
+    ).filter(**filtros)
+
+def load_ticket_order(pedido_id, **filtros):
+    return ticket_orders(id=pedido_id, **filtros).first()
+
+def render_ticket_pdf(pedido):
+    itens = ItensPedido.objects.filter(itens_pedido_pedido=pedido).select_related(
+        'itens_pedido_produto', 'itens_pedido_tamanho'
+    ).prefetch_related('itens_pedido_acrescimos')
+    context = {
+        'pedido': pedido,
+        'itens': itens,
+        'logo_url': logo_uri(pedido.pedido_estabelecimento),
+    }
+    html_string = render_to_string(TICKET_TEMPLATE, context)
+    # Importado só nos processos do pool de renderização
+    from weasyprint import HTML
+    return HTML(string=html_string).write_pdf()
+
+def load_ticket_orders(pedido_ids, **filtros):
+    """
+    Pedidos com itens e acréscimos já carregados, na ordem de pedido_ids:
+    três consultas qualquer que seja a quantidade de pedidos.
+    """
+    pedidos = {
+        pedido.id: pedido for pedido in ticket_orders(id__in=pedido_ids, **filtros)
+    }
+    itens = {}
+    for item in ItensPedido.objects.filter(itens_pedido_pedido_id__in=pedidos).select_related(
+        'itens_pedido_produto', 'itens_pedido_tamanho'
+    ).prefetch_related('itens_pedido_acrescimos').order_by('id'):
+        itens.setdefault(item.itens_pedido_pedido_id, []).append(item)
+    return [(pedidos[pedido_id], itens.get(pedido_id, [])) for pedido_id in pedido_ids if pedido_id in pedidos]
+
+def render_tickets_pdf(pedidos):
+    """
+    Um único PDF com os tickets de vários pedidos, um por página. O template
+    é compilado uma vez e as fontes são configuradas uma vez para o lote;
+    as páginas de cada ticket são juntadas no primeiro documento.
+    """
+    from weasyprint import HTML
+    from weasyprint.text.fonts import FontConfiguration
+    template = get_template(TICKET_TEMPLATE)
+    font_config = FontConfiguration()
+    logos = {}
+    paginas = []
+    documento = None
+    for pedido, itens in pedidos:
+        estabelecimento = pedido.pedido_estabelecimento
+        if estabelecimento.id not in logos:
+            logos[estabelecimento.id] = logo_uri(estabelecimento)
+        html_string = template.render({
+            'pedido': pedido,
+            'itens': itens,
+            'logo_url': logos[estabelecimento.id],
+        })
+        renderizado = HTML(string=html_string).render(font_config=font_config)
+        documento = documento or renderizado
+        paginas.extend(renderizado.pages)
+    if documento is None:
+        return None
+    return documento.copy(paginas).write_pdf()
+
+def get_cached_ticket(pedido, version):
+    path = ticket_path(pedido, version)
+    try:
+        # Atualiza o mtime: a limpeza por tamanho descarta os menos usados primeiro
+        os.utime(path)
+        return path
+    except FileNotFoundError:
+        return None
+
+def store_ticket(pedido, version, pdf):
+    path = ticket_path(pedido, version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Escrita atômica: outro processo nunca lê um PDF pela metade
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(pdf)
+    os.replace(tmp, path)
+    # Versões antigas do mesmo pedido não serão mais servidas
+    for antigo in path.parent.glob(f"{pedido.id}-*.pdf"):
+        if antigo != path:
+            antigo.unlink(missing_ok=True)
+    if random.randrange(TICKET_CACHE_EVICT_EVERY) == 0:
+        evict_tickets()
+    return path
+
+def get_or_render_ticket(pedido):
+    """
+    Caminho do PDF do pedido, renderizando e gravando no cache se necessário.
+    Retorna (path, version, cache_hit).
+    """
+    version = ticket_version(pedido)
+    path = get_cached_ticket(pedido, version)
+    if path:
+        return path, version, True
+    inicio = time.monotonic()
+    path = store_ticket(pedido, version, render_ticket_pdf(pedido))
+    logger.info(f"PDF do pedido {pedido.id} renderizado em {(time.monotonic() - inicio) * 1000:.0f} ms")
+    return path, version, False
+
+def evict_tickets(max_bytes=None, max_age=None):
+    """
+    Remove PDFs mais antigos que max_age e, se o cache ainda passar de
+    max_bytes, os usados há mais tempo. Retorna a quantidade removida.
+    """
+    max_bytes = TICKET_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_age = TICKET_CACHE_MAX_AGE if max_age is None else max_age
+    limite = time.time() - max_age
+    arquivos = []
+    removidos = 0
+    for path in TICKET_CACHE_DIR.glob('*/*.pdf'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if stat.st_mtime < limite:
+            path.unlink(missing_ok=True)
+            removidos += 1
+        else:
+            arquivos.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for _, tamanho, path in sorted(arquivos):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= tamanho
+        removidos += 1
+    return removidos
+
+class RenderPoolBusy(Exception):
+    # Fila do pool de renderização cheia
+    pass
+
+class RenderPool:
+    """
+    Pool de processos de renderização e as tarefas enviadas a ele. Guarda as
+    renderizações pendentes (future -> limite) e o último término, para
+    distinguir um pool ocupado de um processo travado, e os PIDs dos
+    processos, informados pelo init_worker, para encerrá-los se travarem.
+    """
+
+    def __init__(self):
+        from .ticket_worker import init_worker
+        # spawn: o processo filho não herda as conexões de banco do pai
+        contexto = multiprocessing.get_context('spawn')
+        self._fila_pids = contexto.SimpleQueue()
+        self.executor = ProcessPoolExecutor(
+            max_workers=TICKET_RENDER_WORKERS,
+            mp_context=contexto,
+            initializer=init_worker,
+            initargs=(self._fila_pids,),
+            # Recicla o processo para conter o crescimento de memória do WeasyPrint
+            max_tasks_per_child=TICKET_RENDER_MAX_TASKS
+        )
+        self.ativos = {}
+        self.progresso = time.monotonic()
+        self.pids = set()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, limite):
+        with self._lock:
+            if not self.ativos:
+                # Pool ocioso: o tempo sem término conta a partir deste envio
+                self.progresso = time.monotonic()
+        future = self.executor.submit(fn, *args, limite)
+        with self._lock:
+            self.ativos[future] = limite
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.ativos.pop(future, None)
+            self.progresso = time.monotonic()
+
+    def stalled(self):
+        """
+        O pool está travado quando há renderizações pendentes e nenhuma terminou
+        por mais tempo que o maior limite entre elas (cada tarefa é interrompida
+        pelo próprio worker nesse limite). Tempo na fila de um pool que segue
+        terminando tarefas não conta.
+        """
+        with self._lock:
+            if not self.ativos:
+                return False
+            return time.monotonic() - self.progresso > max(self.ativos.values()) + 5
+
+    def worker_pids(self):
+        # PIDs de todos os processos já iniciados, inclusive os reciclados
+        with self._lock:
+            while not self._fila_pids.empty():
+                self.pids.add(self._fila_pids.get())
+            return set(self.pids)
+
+    def shutdown(self, terminate=False):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if terminate:
+            # Processo travado mesmo após o limite de tempo do próprio worker.
+            # Só encerra filhos ainda vivos deste processo: PIDs de processos
+            # já reciclados podem ter sido reaproveitados pelo sistema
+            pids = self.worker_pids()
+            for processo in multiprocessing.active_children():
+                if processo.pid in pids:
+                    processo.terminate()
+
+_render_pool = None
+_render_lock = threading.Lock()
+# Renderizações em andamento ou aguardando no pool deste processo
+_render_slots = threading.BoundedSemaphore(TICKET_RENDER_QUEUE_MAX)
+
+def get_render_pool():
+    # Criado sob demanda, já dentro do worker do gunicorn (depois do fork)
+    global _render_pool
+    with _render_lock:
+        if _render_pool is None:
+            _render_pool = RenderPool()
+        return _render_pool
+
+def _discard_render_pool(pool, terminate=False):
+    global _render_pool
+    with _render_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(terminate=terminate)
+
+def _release_render_slot(future):
+    _render_slots.release()
+
+def _submit_render(fn, *args, limite=None):
+    # Retorna também o pool usado, para descartá-lo se quebrar ou travar
+    limite = limite or TICKET_RENDER_TIMEOUT
+    if not _render_slots.acquire(blocking=False):
+        raise RenderPoolBusy("Fila de renderização cheia")
+    pool = get_render_pool()
+    try:
+        future = pool.submit(fn, *args, limite=limite)
+    except (BrokenProcessPool, RuntimeError):
+        _render_slots.release()
+        _discard_render_pool(pool)
+        raise
+    future.add_done_callback(_release_render_slot)
+    return pool, future
+
+def submit_render(fn, *args, limite=None):
+    """
+    Envia a renderização para o pool; o worker a interrompe após `limite`
+    segundos (padrão TICKET_RENDER_TIMEOUT). Levanta RenderPoolBusy se já
+    houver TICKET_RENDER_QUEUE_MAX renderizações pendentes neste processo.
+    """
+    return _submit_render(fn, *args, limite=limite)[1]
+
+def run_render(fn, *args, limite=None):
+    """
+    Renderiza no pool e aguarda o resultado. O worker interrompe a renderização
+    no limite; o pool só é descartado se parar de terminar tarefas. Com o pool
+    apenas ocupado, a requisição desiste após TICKET_RENDER_WAIT sem derrubar
+    as outras renderizações.
+    """
+    pool, future = _submit_render(fn, *args, limite=limite)
+    inicio = time.monotonic()
+    while True:
+        try:
+            return future.result(timeout=1)
+        except FutureTimeoutError:
+            if future.done():
+                # TimeoutError levantado pelo próprio worker, que segue utilizável
+                raise
+        except CancelledError:
+            # Pool descartado por outra requisição; o cliente tenta de novo
+            raise RenderPoolBusy("Pool de renderização reiniciado")
+        except BrokenProcessPool:
+            logger.error("Pool de renderização de tickets interrompido; será recriado")
+            _discard_render_pool(pool)
+            raise
+        if pool.stalled():
+            logger.error("Pool de renderização sem terminar tarefas além do limite; será recriado")
+            _discard_render_pool(pool, terminate=True)
+            raise TimeoutError("Tempo esgotado ao renderizar o ticket")
+        if time.monotonic() - inicio > TICKET_RENDER_WAIT:
+            # Ainda na fila ou renderizando dentro do limite: só esta requisição desiste
+            future.cancel()
+            raise TimeoutError("Tempo esgotado aguardando a renderização do ticket")
+
+def open_cached_ticket(pedido, version):
+    # Abre o PDF em cache; aberto, ele continua legível mesmo se a limpeza o apagar
+    path = get_cached_ticket(pedido, version)
+    if path is None:
+        return None
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        # Removido pela limpeza ou por uma versão nova entre a checagem e a abertura
+        return None
+
+def fetch_ticket(pedido):
+    """
+    Como get_or_render_ticket, mas renderiza no pool quando o PDF não está em
+    cache, sem carregar o WeasyPrint no processo da requisição. Retorna o
+    arquivo já aberto (o chamador fecha), a versão e se veio do cache.
+    """
+    version = ticket_version(pedido)
+    arquivo = open_cached_ticket(pedido, version)
+    if arquivo:
+        return arquivo, version, True
+    from .ticket_worker import render_ticket
+    # Uma segunda tentativa se o PDF recém-gravado for removido antes da abertura
+    for _ in range(2):
+        resultado = run_render(render_ticket, pedido.id)
+        if resultado is None:
+            raise FileNotFoundError(f"Pedido {pedido.id} não encontrado para renderizar o ticket")
+        path, version, cache_hit = resultado
+        try:
+            return open(path, 'rb'), version, cache_hit
+        except FileNotFoundError:
+            logger.warning(f"PDF do pedido {pedido.id} removido do cache antes de ser servido; renderizando de novo")
+    raise FileNotFoundError(f"PDF do pedido {pedido.id} removido do cache antes de ser servido")
+
+def fetch_tickets_pdf(pedido_ids, **filtros):
+    # PDF em lote renderizado no pool; retorna (pdf, quantidade de pedidos).
+    # O limite cresce com o tamanho do lote, até a espera máxima da requisição
+    from .ticket_worker import render_tickets
+    limite = min(TICKET_RENDER_TIMEOUT + len(pedido_ids) * TICKET_BATCH_SECONDS_PER_TICKET, TICKET_RENDER_WAIT)
+    return run_render(render_tickets, pedido_ids, filtros, limite=limite)
+
+def _prerender_done(pool, future):
+    try:
+        future.result()
+    except BrokenProcessPool:
+        logger.error("Pool de renderização de tickets interrompido; será recriado")
+        _discard_render_pool(pool)
+    except Exception as e:
+        logger.error(f"Erro ao pré-renderizar ticket: {str(e)}")
+
+def schedule_ticket_prerender(pedido_ids):
+    """
+    Agenda a renderização dos tickets no pool depois do commit, para que o
+    print_order encontre o PDF pronto no cache.
+    """
+    if not TICKET_PRERENDER or not pedido_ids:
+        return
+
+    def submit():
+        from .ticket_worker import prerender_ticket
+        for pedido_id in pedido_ids:
+            try:
+                pool, future = _submit_render(prerender_ticket, pedido_id)
+                future.add_done_callback(partial(_prerender_done, pool))
+            except RenderPoolBusy:
+                # Pré-renderização é só otimização: o print_order renderiza se preciso
+                logger.warning(f"Fila de renderização cheia; pedido {pedido_id} não pré-renderizado")
+                return
+            except (BrokenProcessPool, RuntimeError) as e:
+                logger.error(f"Não foi possível agendar a pré-renderização: {str(e)}")
+                return
+
+    transaction.on_commit(submit)
@@ -1,126 +1,261 @@
-from .models import DeliveryRange
+from .models import DeliveryRange, Cliente, Cep
 import googlemaps
+from decimal import Decimal
 from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+import base64
+import hashlib
+import json
 import logging
+import unicodedata
 import requests
 from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time as dt_time, timedelta
+from .zones import find_delivery_zone, invalidate_zone_index
 
 logger = logging.getLogger(__name__)
 
-def calculate_distance(estabelecimento, client_address):
-    logger.debug(f"Calculando distância para estabelecimento: {estabelecimento}, cliente: {client_address}")
-
+def get_gmaps_client():
     # Inicializa o cliente Google Maps para geocodificação
     try:
-        gmaps = googlemaps.Client(key=settings.GOOGLE_MAPS_API_KEY)
+        return googlemaps.Client(key=settings.GOOGLE_MAPS_API_KEY)
     except ValueError as e:
         logger.error(f"Erro ao inicializar cliente Google Maps: {str(e)}")
         raise ImproperlyConfigured("Chave da API do Google Maps inválida ou não configurada.")
 
-    # Usa latitude e longitude do estabelecimento, se disponíveis
-    if estabelecimento.estabelecimento_latitude and estabelecimento.estabelecimento_longitude:
-        restaurant_geo = {'lat': estabelecimento.estabelecimento_latitude, 'lng': estabelecimento.estabelecimento_longitude}
-    else:
-        endereco_estabelecimento = (
-            f"{estabelecimento.endereco}, {estabelecimento.numero}, "
-            f"{estabelecimento.bairro}, {estabelecimento.cidade} - "
-            f"{estabelecimento.estado}, Brasil"
-        )
+def address_hash(rua, numero, bairro, cidade='', estado=''):
+    """
+    Gera o hash dos campos de endereço usados na geocodificação. O complemento
+    fica de fora porque não altera as coordenadas. Os campos são normalizados
+    (acentos, caixa, espaços e tipo de logradouro), para que "r. das flores" e
+    "Rua das Flores" gerem o mesmo hash com ou sem a grafia canônica.
+    """
+    partes = [street_key(rua)] + [normalize_text(parte) for parte in (numero, bairro, cidade, estado)]
+    return hashlib.sha256('|'.join(partes).encode('utf-8')).hexdigest()
+
+def normalize_text(value):
+    # Remove acentos, caixa e espaços repetidos para comparação de endereços
+    value = unicodedata.normalize('NFKD', str(value or ''))
+    value = ''.join(c for c in value if not unicodedata.combining(c))
+    return ' '.join(value.lower().split())
+
+def normalize_cep(cep):
+    digits = ''.join(filter(str.isdigit, str(cep or '')))
+    return digits if len(digits) == 8 else None
+
+# Prefixos de logradouro ignorados ao comparar a rua digitada com a do índice
+TIPOS_LOGRADOURO = {'rua', 'r', 'avenida', 'av', 'travessa', 'tv', 'alameda', 'al', 'estrada', 'est', 'rodovia', 'rod', 'praca', 'pc'}
+
+def street_key(rua):
+    palavras = normalize_text(rua).replace('.', ' ').split()
+    if palavras and palavras[0] in TIPOS_LOGRADOURO:
+        palavras = palavras[1:]
+    return ' '.join(palavras)
+
+# CEPs encontrados ficam no cache compartilhado; os não encontrados não são
+# guardados, para que um CEP importado depois valha em todos os processos
+CEP_CACHE_TTL = getattr(settings, 'CEP_CACHE_TTL', 24 * 3600)
+
+def lookup_cep(cep):
+    """
+    Consulta o índice local de CEPs. Retorna um dicionário com logradouro,
+    bairro, cidade, estado e coordenadas aproximadas, ou None.
+    """
+    cep = normalize_cep(cep)
+    if not cep:
+        return None
+    key = f'delivery:cep:{cep}'
+    try:
+        entry = cache.get(key)
+    except Exception as e:
+        # Cache indisponível: segue consultando o banco
+        logger.warning(f"Erro ao ler o cache de CEPs: {str(e)}")
+        entry = None
+    if entry is not None:
+        return entry
+
+    entry = Cep.objects.filter(cep_codigo=cep).values(
+        'cep_codigo', 'cep_logradouro', 'cep_bairro', 'cep_cidade',
+        'cep_estado', 'cep_latitude', 'cep_longitude'
+    ).first()
+    if entry is not None:
         try:
-            restaurant_results = gmaps.geocode(endereco_estabelecimento)
-            if not restaurant_results:
-                raise ValueError("Endereço do estabelecimento não encontrado")
-            restaurant_geo = restaurant_results[0]['geometry']['location']
-            logger.debug(f"Geocodificação do estabelecimento: {restaurant_geo}")
+            cache.set(key, entry, CEP_CACHE_TTL)
         except Exception as e:
-            logger.error(f"Erro ao geocodificar endereço do estabelecimento: {str(e)}")
-            raise ValueError("Não foi possível geocodificar o endereço do estabelecimento")
+            logger.warning(f"Erro ao gravar o cache de CEPs: {str(e)}")
+    return entry
+
+def geocode_from_cep(cep, rua=None):
+    """
+    Resolve as coordenadas pelo índice local de CEPs. Retorna None quando o
+    resultado é ambíguo (CEP inexistente, sem coordenadas, CEP geral da
+    cidade ou rua diferente da cadastrada), para que a consulta vá ao Google.
+    """
+    entry = lookup_cep(normalize_cep(cep))
+    if not entry or entry['cep_latitude'] is None or entry['cep_longitude'] is None:
+        return None
+    if not entry['cep_logradouro']:
+        return None
+    if rua and street_key(rua) != street_key(entry['cep_logradouro']):
+        logger.debug(f"Rua '{rua}' não confere com o CEP {entry['cep_codigo']} ({entry['cep_logradouro']})")
+        return None
+
+    logger.debug(f"Endereço resolvido pelo índice local de CEPs: {entry}")
+    return {
+        'lat': entry['cep_latitude'],
+        'lng': entry['cep_longitude'],
+        'location_type': 'CEP',
+        'partial_match': False,
+        'formatted_address': (
+            f"{entry['cep_logradouro']}, {entry['cep_bairro']}, "
+            f"{entry['cep_cidade']} - {entry['cep_estado']}, {entry['cep_codigo']}"
+        ),
+    }
+
+def get_restaurant_geo(gmaps, estabelecimento):
+    # Usa latitude e longitude do estabelecimento, se disponíveis
+    if estabelecimento.estabelecimento_latitude and estabelecimento.estabelecimento_longitude:
+        return {'lat': estabelecimento.estabelecimento_latitude, 'lng': estabelecimento.estabelecimento_longitude}
 
+    endereco_estabelecimento = (
+        f"{estabelecimento.estabelecimento_endereco}, {estabelecimento.estabelecimento_numero}, "
+        f"{estabelecimento.estabelecimento_bairro}, {estabelecimento.estabelecimento_cidade} - "
+        f"{estabelecimento.estabelecimento_estado}, Brasil"
+    )
     try:
-        # Geocodifica o endereço do cliente
-        logger.debug(f"Endereço do cliente enviado para geocodificação: {client_address}")
-        geocoding_results = gmaps.geocode(client_address)
-        if not geocoding_results:
-            raise ValueError("Endereço do cliente não encontrado")
-
-        # Loga todos os resultados
-        for i, result in enumerate(geocoding_results):
-            logger.debug(
-                f"Resultado {i}: {result['formatted_address']}, "
-                f"location_type: {result.get('geometry', {}).get('location_type')}, "
-                f"partial_match: {result.get('partial_match', False)}"
+        restaurant_results = gmaps.geocode(endereco_estabelecimento)
+        if not restaurant_results:
+            raise ValueError("Endereço do estabelecimento não encontrado")
+        restaurant_geo = restaurant_results[0]['geometry']['location']
+        logger.debug(f"Geocodificação do estabelecimento: {restaurant_geo}")
+        return restaurant_geo
+    except Exception as e:
+        logger.error(f"Erro ao geocodificar endereço do estabelecimento: {str(e)}")
+        raise ValueError("Não foi possível geocodificar o endereço do estabelecimento")
+
+def geocode_client_address(gmaps, client_address):
+    """
+    Geocodifica o endereço do cliente e retorna as coordenadas junto com a
+    precisão informada pelo Google (location_type e partial_match).
+    """
+    logger.debug(f"Endereço do cliente enviado para geocodificação: {client_address}")
+    geocoding_results = gmaps.geocode(client_address)
+    if not geocoding_results:
+        raise ValueError("Endereço do cliente não encontrado")
+
+    # Loga todos os resultados
+    for i, result in enumerate(geocoding_results):
+        logger.debug(
+            f"Resultado {i}: {result['formatted_address']}, "
+            f"location_type: {result.get('geometry', {}).get('location_type')}, "
+            f"partial_match: {result.get('partial_match', False)}"
+        )
+
+    # Escolhe o resultado mais preciso (priorizando ROOFTOP)
+    best_result = None
+    for result in geocoding_results:
+        if (result.get('geometry', {}).get('location_type') == 'ROOFTOP' and
+            not result.get('partial_match', False)):
+            best_result = result
+            break
+    if not best_result:
+        best_result = geocoding_results[0]
+        if (best_result.get('partial_match', False) or
+            best_result.get('geometry', {}).get('location_type') in ['RANGE_INTERPOLATED', 'APPROXIMATE']):
+            logger.warning(
+                f"Geocodificação imprecisa: {best_result['formatted_address']}, "
+                f"location_type: {best_result.get('geometry', {}).get('location_type')}"
             )
 
-        # Escolhe o resultado mais preciso (priorizando ROOFTOP)
-        best_result = None
-        for result in geocoding_results:
-            if (result.get('geometry', {}).get('location_type') == 'ROOFTOP' and
-                not result.get('partial_match', False)):
-                best_result = result
-                break
-        if not best_result:
-            best_result = geocoding_results[0]
-            if (best_result.get('partial_match', False) or
-                best_result.get('geometry', {}).get('location_type') in ['RANGE_INTERPOLATED', 'APPROXIMATE']):
-                logger.warning(
-                    f"Geocodificação imprecisa: {best_result['formatted_address']}, "
-                    f"location_type: {best_result.get('geometry', {}).get('location_type')}"
-                )
-
-        client_geo = best_result['geometry']['location']
-        logger.debug(f"Coordenadas do Cliente: lat={client_geo['lat']}, lng={client_geo['lng']}")
-        logger.debug(f"Tipo de localização do cliente: {best_result.get('geometry', {}).get('location_type')}")
-        logger.debug(f"Endereço formatado retornado: {best_result['formatted_address']}")
-
-        # Monta a requisição para a Routes API
-        routes_url = "https://routes.googleapis.com/directions/v2:computeRoutes"
-        headers = {
-            "Content-Type": "application/json",
-            "X-Goog-Api-Key": settings.GOOGLE_MAPS_API_KEY,
-            "X-Goog-FieldMask": "routes.distanceMeters"
-        }
-        payload = {
-            "origin": {
-                "location": {
-                    "latLng": {
-                        "latitude": restaurant_geo['lat'],
-                        "longitude": restaurant_geo['lng']
-                    }
+    client_geo = best_result['geometry']['location']
+    logger.debug(f"Coordenadas do Cliente: lat={client_geo['lat']}, lng={client_geo['lng']}")
+    logger.debug(f"Tipo de localização do cliente: {best_result.get('geometry', {}).get('location_type')}")
+    logger.debug(f"Endereço formatado retornado: {best_result['formatted_address']}")
+
+    return {
+        'lat': client_geo['lat'],
+        'lng': client_geo['lng'],
+        'location_type': best_result.get('geometry', {}).get('location_type'),
+        'partial_match': bool(best_result.get('partial_match', False)),
+        'formatted_address': best_result['formatted_address'],
+    }
+
+def compute_route_distance(restaurant_geo, client_geo):
+    # Monta a requisição para a Routes API
+    routes_url = "https://routes.googleapis.com/directions/v2:computeRoutes"
+    headers = {
+        "Content-Type": "application/json",
+        "X-Goog-Api-Key": settings.GOOGLE_MAPS_API_KEY,
+        "X-Goog-FieldMask": "routes.distanceMeters"
+    }
+    payload = {
+        "origin": {
+            "location": {
+                "latLng": {
+                    "latitude": restaurant_geo['lat'],
+                    "longitude": restaurant_geo['lng']
                 }
-            },
-            "destination": {
-                "location": {
-                    "latLng": {
-                        "latitude": client_geo['lat'],
-                        "longitude": client_geo['lng']
-                    }
+            }
+        },
+        "destination": {
+            "location": {
+                "latLng": {
+                    "latitude": client_geo['lat'],
+                    "longitude": client_geo['lng']
                 }
-            },
-            "travelMode": "DRIVE",
-            "routingPreference": "TRAFFIC_AWARE",
-            "computeAlternativeRoutes": False,
-            "units": "METRIC",
-            "languageCode": "pt-BR"
-        }
-
-        # Faz a requisição à Routes API
-        logger.debug(f"Enviando requisição para Routes API: {payload}")
-        response = requests.post(routes_url, json=payload, headers=headers)
-        response.raise_for_status()  # Levanta exceção para erros HTTP
-        routes_data = response.json()
-
-        logger.debug(f"Resposta da Routes API: {routes_data}")
-
-        # Extrai a distância
-        if not routes_data.get("routes"):
-            raise ValueError("Nenhuma rota encontrada entre os pontos fornecidos")
-        
-        distance_meters = routes_data["routes"][0]["distanceMeters"]
-        distance_km = distance_meters / 1000
-        logger.debug(f"Distância calculada: {distance_km} km")
-
-        return distance_km
+            }
+        },
+        "travelMode": "DRIVE",
+        "routingPreference": "TRAFFIC_AWARE",
+        "computeAlternativeRoutes": False,
+        "units": "METRIC",
+        "languageCode": "pt-BR"
+    }
+
+    # Faz a requisição à Routes API
+    logger.debug(f"Enviando requisição para Routes API: {payload}")
+    response = requests.post(routes_url, json=payload, headers=headers)
+    response.raise_for_status()  # Levanta exceção para erros HTTP
+    routes_data = response.json()
+
+    logger.debug(f"Resposta da Routes API: {routes_data}")
+
+    # Extrai a distância
+    if not routes_data.get("routes"):
+        raise ValueError("Nenhuma rota encontrada entre os pontos fornecidos")
+
+    distance_meters = routes_data["routes"][0]["distanceMeters"]
+    distance_km = distance_meters / 1000
+    logger.debug(f"Distância calculada: {distance_km} km")
+
+    return distance_km
+
+def geocode_client(gmaps, client_address, cep=None, rua=None):
+    # Consulta o índice local de CEPs antes da Geocoding API
+    client_geo = geocode_from_cep(cep, rua) if cep else None
+    if not client_geo:
+        client_geo = geocode_client_address(gmaps, client_address)
+    return client_geo
+
+def calculate_route(estabelecimento, client_address, cep=None, rua=None):
+    """
+    Geocodifica o endereço do cliente e calcula a distância de rota até o
+    estabelecimento. Retorna as coordenadas, a precisão da geocodificação e a
+    distância em km. Se o CEP for informado, o índice local é consultado antes
+    da Geocoding API.
+    """
+    logger.debug(f"Calculando distância para estabelecimento: {estabelecimento}, cliente: {client_address}")
+    gmaps = get_gmaps_client()
+    restaurant_geo = get_restaurant_geo(gmaps, estabelecimento)
 
+    try:
+        client_geo = geocode_client(gmaps, client_address, cep=cep, rua=rua)
+        client_geo['distance_km'] = compute_route_distance(restaurant_geo, client_geo)
+        return client_geo
     except requests.exceptions.RequestException as e:
         logger.error(f"Erro ao chamar Routes API: {str(e)}")
         raise ValueError(f"Erro ao calcular distância: {str(e)}")
@@ -128,6 +263,84 @@ def calculate_distance(estabelecimento, client_address):
         logger.error(f"Erro ao calcular distância: {str(e)}")
         raise
 
+def calculate_distance(estabelecimento, client_address, cep=None, rua=None):
+    return calculate_route(estabelecimento, client_address, cep=cep, rua=rua)['distance_km']
+
+def route_distance_from(estabelecimento, client_geo):
+    # Distância de rota a partir de coordenadas já conhecidas (sem geocodificar)
+    try:
+        restaurant_geo = get_restaurant_geo(get_gmaps_client(), estabelecimento)
+        return compute_route_distance(restaurant_geo, client_geo)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Erro ao chamar Routes API: {str(e)}")
+        raise ValueError(f"Erro ao calcular distância: {str(e)}")
+
+def calculate_delivery(estabelecimento, client_address, cep=None, rua=None):
+    """
+    Calcula a taxa de entrega do endereço. Se as coordenadas caírem em uma zona
+    de entrega do estabelecimento, a taxa da zona é usada sem chamar a Routes
+    API (distance_km fica None); senão vale a faixa de distância.
+    """
+    try:
+        client_geo = geocode_client(get_gmaps_client(), client_address, cep=cep, rua=rua)
+    except Exception as e:
+        logger.error(f"Erro ao geocodificar endereço do cliente: {str(e)}")
+        raise
+
+    zone = find_delivery_zone(estabelecimento.id, client_geo['lat'], client_geo['lng'])
+    if zone:
+        logger.debug(f"Cliente dentro da zona de entrega {zone.name}")
+        client_geo['distance_km'] = None
+        client_geo['delivery_fee'] = zone.delivery_fee
+        return client_geo
+
+    client_geo['distance_km'] = route_distance_from(estabelecimento, client_geo)
+    client_geo['delivery_fee'] = get_delivery_fee(estabelecimento, client_geo['distance_km'])
+    return client_geo
+
+def resolve_client_delivery(estabelecimento, cliente, client_address, cep=None):
+    """
+    Retorna (distância, taxa) do cliente reaproveitando a geocodificação salva
+    quando o hash do endereço não mudou: com coordenadas salvas, a zona de
+    entrega ou a distância salva dispensam as APIs do Google. Caso contrário,
+    geocodifica e preenche os campos de localização do cliente (sem salvar).
+    """
+    endereco_hash = address_hash(
+        cliente.cliente_rua,
+        cliente.cliente_numero,
+        cliente.cliente_bairro,
+        estabelecimento.estabelecimento_cidade,
+        estabelecimento.estabelecimento_estado,
+    )
+    if cliente.cliente_endereco_hash == endereco_hash and cliente.cliente_latitude is not None:
+        zone = find_delivery_zone(estabelecimento.id, cliente.cliente_latitude, cliente.cliente_longitude)
+        if zone:
+            return None, zone.delivery_fee
+        if cliente.cliente_distancia_km is None:
+            cliente.cliente_distancia_km = route_distance_from(
+                estabelecimento, {'lat': cliente.cliente_latitude, 'lng': cliente.cliente_longitude}
+            )
+        logger.debug(f"Reaproveitando distância salva do cliente {cliente.id}: {cliente.cliente_distancia_km} km")
+        return cliente.cliente_distancia_km, get_delivery_fee(estabelecimento, cliente.cliente_distancia_km)
+
+    delivery = calculate_delivery(estabelecimento, client_address, cep=cep, rua=cliente.cliente_rua)
+    cliente.cliente_latitude = delivery['lat']
+    cliente.cliente_longitude = delivery['lng']
+    cliente.cliente_location_type = delivery['location_type']
+    cliente.cliente_partial_match = delivery['partial_match']
+    cliente.cliente_distancia_km = delivery['distance_km']
+    cliente.cliente_endereco_hash = endereco_hash
+    return delivery['distance_km'], delivery['delivery_fee']
+
+def clear_client_location(cliente):
+    # Descarta a geocodificação salva quando o endereço muda
+    cliente.cliente_latitude = None
+    cliente.cliente_longitude = None
+    cliente.cliente_location_type = None
+    cliente.cliente_partial_match = False
+    cliente.cliente_distancia_km = None
+    cliente.cliente_endereco_hash = None
+
 def get_delivery_fee(estabelecimento, distance_km):
     logger.debug(f"Buscando taxa de entrega para estabelecimento: {estabelecimento}, distância: {distance_km}")
     try:
@@ -136,7 +349,7 @@ def get_delivery_fee(estabelecimento, distance_km):
             min_distance__lte=distance_km,
             max_distance__gt=distance_km
         ).first()
-        
+
         if delivery_range:
             logger.debug(f"Taxa encontrada: {delivery_range.delivery_fee}")
             return delivery_range.delivery_fee
@@ -145,4 +358,110 @@ def get_delivery_fee(estabelecimento, distance_km):
             raise Exception("Nenhuma faixa de entrega encontrada para a distância fornecida.")
     except Exception as e:
         logger.error(f"Erro ao buscar taxa de entrega: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+def recalculate_client_fees(estabelecimento):
+    """
+    Recalcula a taxa de entrega de todos os clientes do estabelecimento a partir
+    das coordenadas (zonas) e da distância salvas, sem chamadas às APIs do
+    Google. Clientes sem localização salva ou fora das zonas e faixas ficam sem
+    taxa.
+    """
+    faixas = list(DeliveryRange.objects.filter(estabelecimento=estabelecimento).values_list(
+        'min_distance', 'max_distance', 'delivery_fee'
+    ))
+    invalidate_zone_index(estabelecimento.id)
+    clientes = list(Cliente.objects.filter(
+        Q(cliente_distancia_km__isnull=False) | Q(cliente_latitude__isnull=False),
+        cliente_estabelecimento=estabelecimento,
+    ).only('id', 'cliente_latitude', 'cliente_longitude', 'cliente_distancia_km', 'cliente_taxa_entrega'))
+
+    alterados = []
+    for cliente in clientes:
+        zone = find_delivery_zone(estabelecimento.id, cliente.cliente_latitude, cliente.cliente_longitude)
+        if zone:
+            taxa = zone.delivery_fee
+        elif cliente.cliente_distancia_km is not None:
+            taxa = next(
+                (fee for min_d, max_d, fee in faixas if min_d <= cliente.cliente_distancia_km < max_d),
+                None
+            )
+        else:
+            # Só havia zona; a distância de rota será calculada na próxima cotação
+            taxa = None
+        if taxa != cliente.cliente_taxa_entrega:
+            cliente.cliente_taxa_entrega = taxa
+            alterados.append(cliente)
+
+    Cliente.objects.bulk_update(alterados, ['cliente_taxa_entrega'], batch_size=500)
+    logger.info(f"Taxas recalculadas para {len(alterados)} clientes do estabelecimento {estabelecimento}")
+    return len(alterados)
+
+# Validade da cotação de entrega assinada (segundos)
+FEE_QUOTE_MAX_AGE = getattr(settings, 'DELIVERY_FEE_QUOTE_MAX_AGE', 15 * 60)
+FEE_QUOTE_SALT = 'delivery.fee_quote'
+
+def create_fee_quote(estabelecimento_id, endereco_hash, distance_km, delivery_fee):
+    """
+    Gera um token assinado com a taxa calculada, para ser verificado offline na
+    criação do pedido sem recalcular a distância.
+    """
+    return signing.dumps({
+        'e': estabelecimento_id,
+        'h': endereco_hash,
+        'd': round(distance_km, 3) if distance_km is not None else None,
+        'f': str(delivery_fee),
+    }, salt=FEE_QUOTE_SALT, compress=True)
+
+def verify_fee_quote(token, estabelecimento_id, endereco_hash):
+    """
+    Valida a assinatura, a validade e o destino da cotação. Retorna a distância
+    e a taxa cotadas ou levanta ValueError.
+    """
+    try:
+        quote = signing.loads(token, salt=FEE_QUOTE_SALT, max_age=FEE_QUOTE_MAX_AGE)
+    except signing.SignatureExpired:
+        raise ValueError("Cotação de entrega expirada")
+    except signing.BadSignature:
+        raise ValueError("Cotação de entrega inválida")
+
+    if quote.get('e') != estabelecimento_id or quote.get('h') != endereco_hash:
+        raise ValueError("Cotação de entrega não corresponde ao endereço do pedido")
+    return quote['d'], Decimal(quote['f'])
+
+def encode_order_cursor(pedido_data, pedido_id):
+    # Cursor opaco e estável para paginação por (pedido_data, id)
+    payload = json.dumps({'d': pedido_data.isoformat(), 'i': pedido_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_order_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        pedido_data = parse_datetime(payload['d'])
+        pedido_id = int(payload['i'])
+    except Exception:
+        raise ValueError("Cursor inválido")
+    if pedido_data is None:
+        raise ValueError("Cursor inválido")
+    return pedido_data, pedido_id
+
+def parse_date_bound(value, end=False):
+    """
+    Converte o parâmetro de data (YYYY-MM-DD ou ISO 8601) em datetime com fuso.
+    Datas sem hora no limite final valem até o fim do dia (retorna o início do
+    dia seguinte, para uso com __lt).
+    """
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Data inválida: {value}")
+        if end:
+            day += timedelta(days=1)
+        moment = datetime.combine(day, dt_time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
@@ -1,19 +1,19 @@
 from decimal import Decimal
 from django.db import transaction
 import logging
+import time
 import json
-from decouple import config
-import requests
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
-from django.db.models import Prefetch
-from delivery.models import Produto, ProdutoForm, Acrescimo, Cliente, Pedido, ItensPedido, TipoProduto, TamanhoProdutoFormSet, AcrescimoForm, TamanhoProduto, FormasDePagamento, Estabelecimento, Promocao
-from weasyprint import HTML
-from django.template.loader import render_to_string
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.http import HttpResponse, JsonResponse, FileResponse
+from django.db.models import Prefetch, Q, Sum, Max
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+from delivery.models import Produto, ProdutoForm, Acrescimo, Cliente, Pedido, ItensPedido, TipoProduto, TamanhoProdutoFormSet, AcrescimoForm, TamanhoProduto, FormasDePagamento, Estabelecimento, Promocao, PedidoArquivado, ResumoVendas, ResumoVendasProduto
 from django.core.serializers.json import DjangoJSONEncoder
 from django.views.decorators.csrf import csrf_exempt
+from django.contrib.auth.models import User
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
@@ -21,7 +21,16 @@ from rest_framework import status
 from rest_framework.views import APIView
 from .serializers import ProdutoSerializer, TipoProdutoSerializer, TamanhoProdutoSerializer, AcrescimoSerializer, PedidoSerializer, EstabelecimentoUpdateSerializer, DeliveryFeeRequestSerializer, DeliveryFeeResponseSerializer, PromocaoSerializer
 
-from .utils import calculate_distance, get_delivery_fee
+from .utils import calculate_delivery, resolve_client_delivery, address_hash, clear_client_location, create_fee_quote, verify_fee_quote, encode_order_cursor, decode_order_cursor, parse_date_bound
+from .autocomplete import autocomplete_address, canonicalize_address
+from .summaries import PEDIDO_SUMMARY_FIELDS, summarize_order_rows, summarize_order, summarize_orders, build_order_board, order_list_queryset, ORDERS_PAGE_SIZE, ORDERS_PAGE_SIZE_MAX
+from .whatsapp import enqueue_status_notification, enqueue_status_notifications
+from .rollups import apply_status_change
+from .receipts import TICKET_COLUMNS_MIN, TICKET_COLUMNS_MAX, load_receipt_data, parse_columns, render_text, render_escpos
+from .tickets import TICKET_BATCH_MAX, RenderPoolBusy, load_ticket_order, ticket_version, fetch_ticket, fetch_tickets_pdf, schedule_ticket_prerender
+from .printing import enqueue_print_jobs
+from .auth import VerifiedMembership
+from .events import NEW_ORDER, publish_order_event, publish_status_changes, current_seq
 
 logger = logging.getLogger(__name__)
 
@@ -45,15 +54,28 @@ class DeliveryFeeView(APIView):
             ).replace(", ,", ",").strip(", ")
 
             try:
-                # Calcular distância
-                distance_km = calculate_distance(estabelecimento, client_address)
-                
-                # Obter taxa de entrega
-                delivery_fee = get_delivery_fee(estabelecimento, distance_km)
+                # Calcular taxa de entrega (zona de entrega ou faixa de distância)
+                delivery = calculate_delivery(
+                    estabelecimento,
+                    client_address,
+                    cep=client_address_data.get('cep'),
+                    rua=client_address_data['rua']
+                )
+                distance_km = delivery['distance_km']
+                delivery_fee = delivery['delivery_fee']
                 
+                # Cotação assinada, verificada offline na criação do pedido
+                endereco_hash = address_hash(
+                    client_address_data['rua'],
+                    client_address_data['numero'],
+                    client_address_data.get('bairro', ''),
+                    estabelecimento.estabelecimento_cidade,
+                    estabelecimento.estabelecimento_estado,
+                )
                 response_data = {
-                    'distance_km': round(distance_km, 2),
-                    'delivery_fee': delivery_fee
+                    'distance_km': round(distance_km, 2) if distance_km is not None else None,
+                    'delivery_fee': delivery_fee,
+                    'quote': create_fee_quote(estabelecimento.id, endereco_hash, distance_km, delivery_fee)
                 }
                 return Response(
                     DeliveryFeeResponseSerializer(response_data).data,
@@ -79,24 +101,18 @@ def send_order_notification(pedido):
     """
     try:
         logger.info("Enviando notificação para novo pedido: %s", pedido.id)
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'orders_{pedido.pedido_estabelecimento.id}',  # Grupo dinâmico
-            {
-                'type': 'new_order',
-                'order': {
-                    'id': pedido.id,
-                    'estabelecimento': pedido.pedido_estabelecimento.estabelecimento_nome,
-                    'cliente': pedido.pedido_cliente.cliente_nome,
-                    'valor_total': float(pedido.pedido_valor_total),
-                    'status': pedido.pedido_status,
-                    'data': str(pedido.pedido_data),
-                    'forma_pagamento': pedido.pedido_forma_pagamento.forma_pagamento_nome,
-                    'observacao': pedido.pedido_observacao or '',
-                }
-            }
-        )
-        logger.info("Notificação enviada para pedido: %s no grupo orders_%s", pedido.id, pedido.pedido_estabelecimento.id)
+        # Resumo compacto do pedido (mesma projeção da listagem), mais os campos antigos do evento
+        order = summarize_order(pedido.id)
+        order.update({
+            'estabelecimento': pedido.pedido_estabelecimento.estabelecimento_nome,
+            'cliente': order['pedido_cliente']['cliente_nome'],
+            'valor_total': float(pedido.pedido_valor_total),
+            'status': order['pedido_status'],
+            'data': str(pedido.pedido_data),
+            'forma_pagamento': order['pedido_forma_pagamento'],
+            'observacao': order['pedido_observacao'],
+        })
+        publish_order_event(pedido.pedido_estabelecimento_id, {'type': NEW_ORDER, 'order': order})
     except Exception as e:
         logger.error("Erro ao enviar notificação para pedido %s: %s", pedido.id, str(e))
         # Não interrompe a resposta, apenas loga o erro
@@ -273,6 +289,8 @@ def menu_delivery(request, estab_url):
                 client_data = data.get('client')
                 pagamento_data = data.get('pagamento')
                 observacao = data.get('observacao', '')
+                tipo_entrega = data.get('tipo_entrega', 'delivery')
+                cotacao_entrega = data.get('cotacao_entrega')
 
                 # Validações iniciais
                 if not carrinho or len(carrinho) == 0:
@@ -287,6 +305,9 @@ def menu_delivery(request, estab_url):
                 if not all(key in client_data['endereco'] for key in ['rua', 'bairro', 'numero']):
                     logger.error("Dados de endereço incompletos")
                     return JsonResponse({'status': 'error', 'message': 'Dados de endereço incompletos'}, status=400)
+                if tipo_entrega not in dict(Pedido.TIPO_PEDIDO_CHOICES):
+                    logger.error("Tipo de entrega inválido: %s", tipo_entrega)
+                    return JsonResponse({'status': 'error', 'message': 'Tipo de entrega inválido'}, status=400)
 
                 # Busca o estabelecimento
                 estabelecimento_obj = get_object_or_404(Estabelecimento, id=estabelecimento_id)
@@ -294,6 +315,13 @@ def menu_delivery(request, estab_url):
 
                 # Sanitiza telefone
                 telefone = ''.join(filter(str.isdigit, client_data['telefone']))
+                endereco_hash = address_hash(
+                    client_data['endereco']['rua'],
+                    client_data['endereco']['numero'],
+                    client_data['endereco']['bairro'],
+                    estabelecimento_obj.estabelecimento_cidade,
+                    estabelecimento_obj.estabelecimento_estado,
+                )
                 with transaction.atomic():
                     cliente, created = Cliente.objects.get_or_create(
                         cliente_estabelecimento=estabelecimento_obj,
@@ -308,6 +336,17 @@ def menu_delivery(request, estab_url):
                     )
                     logger.info("Cliente %s (ID: %s)", "criado" if created else "encontrado", cliente.id)
 
+                    if not created:
+                        # Atualiza o endereço; a geocodificação salva só é descartada se o hash mudou
+                        cliente.cliente_rua = client_data['endereco']['rua']
+                        cliente.cliente_bairro = client_data['endereco']['bairro']
+                        cliente.cliente_numero = client_data['endereco']['numero']
+                        cliente.cliente_complemento = client_data['endereco']['complemento'] or None
+                        if cliente.cliente_endereco_hash and cliente.cliente_endereco_hash != endereco_hash:
+                            clear_client_location(cliente)
+                            cliente.cliente_taxa_entrega = None
+                        cliente.save()
+
                     # Busca a forma de pagamento
                     try:
                         forma_pagamento = FormasDePagamento.objects.get(
@@ -318,6 +357,33 @@ def menu_delivery(request, estab_url):
                         logger.error("Forma de pagamento inválida: %s", pagamento_data['metodo'])
                         return JsonResponse({'status': 'error', 'message': 'Forma de pagamento inválida'}, status=400)
 
+                    # Taxa de entrega: cotação assinada, taxa já calculada para o mesmo endereço ou cálculo no servidor
+                    taxa_entrega = Decimal('0.00')
+                    distancia_km = None
+                    if tipo_entrega == 'delivery':
+                        if cotacao_entrega:
+                            try:
+                                distancia_km, taxa_entrega = verify_fee_quote(cotacao_entrega, estabelecimento_id, endereco_hash)
+                            except ValueError as e:
+                                logger.error("Cotação de entrega recusada: %s", str(e))
+                                return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+                        elif cliente.cliente_endereco_hash == endereco_hash and cliente.cliente_taxa_entrega is not None:
+                            distancia_km = cliente.cliente_distancia_km
+                            taxa_entrega = cliente.cliente_taxa_entrega
+                        else:
+                            # Sem cotação (clientes antigos): calcula a taxa no servidor e guarda no cliente
+                            client_address = (
+                                f"{cliente.cliente_rua}, {cliente.cliente_numero}, {cliente.cliente_bairro}, "
+                                f"{estabelecimento_obj.estabelecimento_cidade}, {estabelecimento_obj.estabelecimento_estado}, Brasil"
+                            )
+                            try:
+                                distancia_km, taxa_entrega = resolve_client_delivery(estabelecimento_obj, cliente, client_address)
+                            except Exception as e:
+                                logger.error("Erro ao calcular taxa de entrega do cliente %s: %s", cliente.id, str(e))
+                                return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+                            cliente.cliente_taxa_entrega = taxa_entrega
+                            cliente.save()
+
                     # Cria o pedido
                     pedido = Pedido.objects.create(
                         pedido_estabelecimento=estabelecimento_obj,
@@ -325,6 +391,9 @@ def menu_delivery(request, estab_url):
                         pedido_observacao=observacao,
                         pedido_forma_pagamento=forma_pagamento,
                         pedido_troco=Decimal(pagamento_data['troco']) if pagamento_data['troco'] else None,
+                        pedido_tipo_entrega=tipo_entrega,
+                        pedido_taxa_entrega=taxa_entrega,
+                        pedido_distancia_km=distancia_km,
                     )
                     logger.info("Pedido criado: %s", pedido.id)
 
@@ -411,6 +480,11 @@ def menu_delivery(request, estab_url):
 
                 # Envia notificação fora da transação
                 send_order_notification(pedido)
+                # Deixa o ticket renderizado antes da primeira impressão
+                schedule_ticket_prerender([pedido.id])
+                # Impressão automática no agente local do estabelecimento
+                if pedido.pedido_estabelecimento.estabelecimento_impressao_automatica:
+                    enqueue_print_jobs(pedido.pedido_estabelecimento_id, [pedido.id])
 
                 return JsonResponse({'status': 'success', 'message': 'Pedido criado com sucesso!', 'pedido_id': pedido.id})
 
@@ -476,11 +550,15 @@ def search_client(request, estab_url, phone=None):
                 numero = data.get('numero')
                 bairro = data.get('bairro')
                 complemento = data.get('complemento', '')
+                cep = data.get('cep', '')
 
                 if not all([telefone, nome, rua, numero, bairro]):
                     logger.error("Dados incompletos: %s", data)
                     return JsonResponse({'status': 'error', 'message': 'Dados incompletos'}, status=400)
 
+                # Usa a grafia já conhecida de rua e bairro antes de geocodificar
+                rua, bairro = canonicalize_address(estabelecimento_id, rua, bairro)
+
                 # Cria ou atualiza o cliente
                 cliente, created = Cliente.objects.get_or_create(
                     cliente_estabelecimento_id=estabelecimento_id,
@@ -502,25 +580,17 @@ def search_client(request, estab_url, phone=None):
                     cliente.cliente_numero = numero
                     cliente.cliente_complemento = complemento
 
-                # Calcula a taxa de entrega se não estiver salva ou se os dados do endereço mudaram
-                if not cliente.cliente_taxa_entrega or (
-                    cliente.cliente_rua != rua or
-                    cliente.cliente_numero != numero or
-                    cliente.cliente_bairro != bairro or
-                    cliente.cliente_complemento != complemento
-                ):
-                    client_address = f"{rua}, {numero}, {bairro}, {estabelecimento['estabelecimento_cidade']}, {estabelecimento['estabelecimento_estado']}, Brasil"
-                    try:
-                        distance_km = calculate_distance(Estabelecimento.objects.get(id=estabelecimento_id), client_address)
-                        taxa_entrega = get_delivery_fee(Estabelecimento.objects.get(id=estabelecimento_id), distance_km)
-                        cliente.cliente_taxa_entrega = taxa_entrega
-                        cliente.save()
-                        logger.info(f"Cliente {cliente.id} salvo com taxa de entrega: {taxa_entrega}")
-                    except Exception as e:
-                        logger.error(f"Erro ao calcular taxa de entrega: {str(e)}")
-                        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
-                else:
-                    taxa_entrega = cliente.cliente_taxa_entrega
+                # Só geocodifica se o hash do endereço mudou; senão reaproveita a localização salva
+                client_address = f"{rua}, {numero}, {bairro}, {estabelecimento['estabelecimento_cidade']}, {estabelecimento['estabelecimento_estado']}, {cep + ', ' if cep else ''}Brasil"
+                try:
+                    estabelecimento_obj = Estabelecimento.objects.get(id=estabelecimento_id)
+                    distance_km, taxa_entrega = resolve_client_delivery(estabelecimento_obj, cliente, client_address, cep=cep)
+                    cliente.cliente_taxa_entrega = taxa_entrega
+                    cliente.save()
+                    logger.info(f"Cliente {cliente.id} salvo com taxa de entrega: {taxa_entrega}")
+                except Exception as e:
+                    logger.error(f"Erro ao calcular taxa de entrega: {str(e)}")
+                    return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
                 return JsonResponse({
                     'status': 'success',
@@ -535,7 +605,10 @@ def search_client(request, estab_url, phone=None):
                         },
                         'taxa_entrega': float(cliente.cliente_taxa_entrega) if cliente.cliente_taxa_entrega else None
                     },
-                    'taxa_entrega': float(taxa_entrega)
+                    'taxa_entrega': float(taxa_entrega),
+                    'cotacao_entrega': create_fee_quote(
+                        estabelecimento_id, cliente.cliente_endereco_hash, distance_km, taxa_entrega
+                    )
                 })
             except json.JSONDecodeError:
                 logger.error("Erro ao decodificar JSON: %s", request.body)
@@ -547,13 +620,41 @@ def search_client(request, estab_url, phone=None):
         logger.error("Erro geral na view search cliente: %s", str(e))
         return JsonResponse({'status': 'error', 'message': 'Erro interno do servidor'}, status=500)
 
+# View de autocompletar endereço com ruas e bairros já conhecidos do estabelecimento
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def address_autocomplete(request, estab_url):
+    try:
+        estabelecimento = Estabelecimento.objects.filter(
+            estabelecimento_url=estab_url,
+            estabelecimento_aberto=True
+        ).values('id').first()
+
+        if not estabelecimento:
+            logger.error("Estabelecimento não encontrado ou fechado: %s", estab_url)
+            return JsonResponse({'status': 'error', 'message': 'Estabelecimento não encontrado ou fechado'}, status=404)
+
+        prefixo = request.GET.get('q', '').strip()
+        campo = request.GET.get('campo', 'rua')
+        if campo not in ['rua', 'bairro']:
+            return JsonResponse({'status': 'error', 'message': 'Campo inválido'}, status=400)
+        if len(prefixo) < 2:
+            return JsonResponse({'status': True, 'sugestoes': []})
+
+        sugestoes = autocomplete_address(estabelecimento['id'], campo, prefixo)
+        return JsonResponse({'status': True, 'sugestoes': sugestoes})
+    except Exception as e:
+        logger.error("Erro ao autocompletar endereço: %s", str(e))
+        return JsonResponse({'status': 'error', 'message': 'Erro interno do servidor'}, status=500)
+
 ##############################################
 
 ## Views da parte administrativa do sistema ##
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_data(request):
-    user = request.user
+    # Dados completos do usuário: o request.user do token só tem os claims
+    user = User.objects.select_related('profile__estabelecimento').get(id=request.user.id)
     data = {
         'id': user.id,
         'email': user.email,
@@ -562,11 +663,14 @@ def user_data(request):
         'estabelecimento_nome': user.profile.estabelecimento.estabelecimento_nome,
         'estabelecimento_aberto': user.profile.estabelecimento.estabelecimento_aberto,
         'estabelecimento_prazo_entrega': user.profile.estabelecimento.estabelecimento_prazo_entrega,
+        'estabelecimento_formato_ticket': user.profile.estabelecimento.estabelecimento_formato_ticket,
+        'estabelecimento_colunas_ticket': user.profile.estabelecimento.estabelecimento_colunas_ticket,
+        'estabelecimento_impressao_automatica': user.profile.estabelecimento.estabelecimento_impressao_automatica,
     }
     return Response(data, status=status.HTTP_200_OK)
 
 @api_view(['PATCH'])
-@permission_classes([IsAuthenticated])
+@permission_classes([IsAuthenticated, VerifiedMembership])
 def business(request):
     try:
         logger.info(f"Requisição recebida: {request.data}")
@@ -577,7 +681,7 @@ def business(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        estabelecimento = request.user.profile.estabelecimento
+        estabelecimento = Estabelecimento.objects.filter(id=request.user.profile.estabelecimento_id).first()
         if not estabelecimento:
             logger.error("Estabelecimento não encontrado")
             return Response(
@@ -600,6 +704,12 @@ def business(request):
                 estabelecimento.estabelecimento_prazo_entrega = validated_data['estabelecimento_prazo_entrega']
             if 'estabelecimento_aberto' in validated_data:
                 estabelecimento.estabelecimento_aberto = validated_data['estabelecimento_aberto']
+            if 'estabelecimento_formato_ticket' in validated_data:
+                estabelecimento.estabelecimento_formato_ticket = validated_data['estabelecimento_formato_ticket']
+            if 'estabelecimento_colunas_ticket' in validated_data:
+                estabelecimento.estabelecimento_colunas_ticket = validated_data['estabelecimento_colunas_ticket']
+            if 'estabelecimento_impressao_automatica' in validated_data:
+                estabelecimento.estabelecimento_impressao_automatica = validated_data['estabelecimento_impressao_automatica']
             estabelecimento.save()
             logger.info(f"Estabelecimento após salvamento: aberto={estabelecimento.estabelecimento_aberto}, prazo={estabelecimento.estabelecimento_prazo_entrega}")
             return Response({
@@ -608,6 +718,9 @@ def business(request):
                     "id": estabelecimento.id,
                     "aberto": estabelecimento.estabelecimento_aberto,
                     "prazo_entrega": estabelecimento.estabelecimento_prazo_entrega,
+                    "formato_ticket": estabelecimento.estabelecimento_formato_ticket,
+                    "colunas_ticket": estabelecimento.estabelecimento_colunas_ticket,
+                    "impressao_automatica": estabelecimento.estabelecimento_impressao_automatica,
                 }
             }, status=status.HTTP_200_OK)
         else:
@@ -1251,7 +1364,16 @@ def orders(request, id=None):
 
         if request.method == 'GET':
             if id:
-                pedido = get_object_or_404(pedidos, id=id)
+                if not pedidos.filter(id=id).exists():
+                    # Pedidos antigos finalizados ficam no arquivo
+                    arquivado = archived_orders(request.user).filter(id=id).first()
+                    if not arquivado:
+                        return Response({"mensagem": "Pedido não encontrado"}, status=status.HTTP_404_NOT_FOUND)
+                    return Response({
+                        "mensagem": "Detalhes do pedido",
+                        "pedido": arquivado.pedido_arquivado_dados,
+                        "arquivado": True
+                    })
                 pedido = pedidos.filter(id=id).prefetch_related(
                     Prefetch('itens', queryset=ItensPedido.objects.select_related(
                         'itens_pedido_produto', 'itens_pedido_tamanho'
@@ -1263,16 +1385,61 @@ def orders(request, id=None):
                     "pedido": serializer.data
                 })
             else:
-                status_param = request.GET.get('status', 'pending')
-                pedidos = pedidos.filter(pedido_status=status_param).prefetch_related(
-                    Prefetch('itens', queryset=ItensPedido.objects.select_related(
-                        'itens_pedido_produto', 'itens_pedido_tamanho'
-                    ).prefetch_related('itens_pedido_acrescimos'))
+                # Sequência lida antes da consulta: o cliente conecta no websocket com
+                # ?last_seq=<seq> e recebe o que mudou depois desta listagem
+                seq = current_seq(estabelecimento.id) if not request.user.is_superuser else None
+
+                # Filtros por período e cliente
+                try:
+                    data_inicio = parse_date_bound(request.GET.get('data_inicio'))
+                    data_fim = parse_date_bound(request.GET.get('data_fim'), end=True)
+                    cursor = request.GET.get('cursor')
+                    cursor = decode_order_cursor(cursor) if cursor else None
+                    limite = min(int(request.GET.get('limite', ORDERS_PAGE_SIZE)), ORDERS_PAGE_SIZE_MAX)
+                    if limite < 1:
+                        raise ValueError("Limite inválido")
+                except ValueError as e:
+                    return Response({"mensagem": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+                # Paginação por keyset em (pedido_data, id), do mais recente para o mais antigo
+                pedidos = order_list_queryset(
+                    pedidos,
+                    request.GET.get('status', 'pending'),
+                    data_inicio=data_inicio,
+                    data_fim=data_fim,
+                    cliente_id=request.GET.get('cliente_id'),
+                    telefone=''.join(filter(str.isdigit, request.GET.get('telefone', ''))),
+                    cursor=cursor
                 )
-                serializer = PedidoSerializer(pedidos, many=True)
+
+                # Lista usa a projeção resumida; ?formato=completo mantém o serializer aninhado
+                if request.GET.get('formato') == 'completo':
+                    pagina = list(pedidos.select_related(
+                        'pedido_cliente', 'pedido_forma_pagamento'
+                    ).prefetch_related(
+                        Prefetch('itens', queryset=ItensPedido.objects.select_related(
+                            'itens_pedido_produto', 'itens_pedido_tamanho'
+                        ).prefetch_related('itens_pedido_acrescimos'))
+                    )[:limite + 1])
+                    chaves = [(pedido.pedido_data, pedido.id) for pedido in pagina]
+                else:
+                    pagina = list(pedidos.values(*PEDIDO_SUMMARY_FIELDS)[:limite + 1])
+                    chaves = [(row['pedido_data'], row['id']) for row in pagina]
+
+                proximo_cursor = None
+                if len(pagina) > limite:
+                    pagina = pagina[:limite]
+                    proximo_cursor = encode_order_cursor(*chaves[limite - 1])
+
+                if request.GET.get('formato') == 'completo':
+                    dados = PedidoSerializer(pagina, many=True).data
+                else:
+                    dados = summarize_order_rows(pagina)
                 return Response({
                     "mensagem": "Lista de pedidos",
-                    "pedidos": serializer.data
+                    "pedidos": dados,
+                    "proximo_cursor": proximo_cursor,
+                    "seq": seq
                 })
 
         if request.method == 'PUT':
@@ -1288,54 +1455,20 @@ def orders(request, id=None):
                     "mensagem": "Status inválido"
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Verifica se é uma transição de pending para preparing
-            send_whatsapp = (pedido.pedido_status == 'pending' and novo_status == 'preparing')
-
             try:
-                pedido.pedido_status = novo_status
-                pedido.save()
-
-                # Envia mensagem no WhatsApp se for transição de pending para preparing
-                if send_whatsapp:
-                    try:
-                        client_phone = pedido.pedido_cliente.cliente_telefone
-                        client_name = pedido.pedido_cliente.cliente_nome
-                        order_number = str(pedido.id).zfill(6)  # Formata como 000123
-
-                        # Configurações da Evolution API
-                        evolution_api_url = config('EVOLUTION_API_URL')
-                        print(evolution_api_url)
-                        evolution_instance = config('EVOLUTION_API_INSTANCE')
-                        evolution_api_key = config('EVOLUTION_API_KEY')
-
-                        # Monta a URL e o payload
-                        url = f"{evolution_api_url}/message/sendText/{evolution_instance}"
-                        headers = {
-                            'Content-Type': 'application/json',
-                            'apiKey': evolution_api_key
-                        }
-                        payload = {
-                            "number": f'55{client_phone}',
-                            "text": f"Olá, {client_name}! Seu pedido #{order_number} começou a ser preparado. Te avisaremos quando estiver pronto! 😊"
-                        }
-
-                        # Envia a mensagem
-                        response = requests.post(url, json=payload, headers=headers)
-                        if response.status_code != 200:
-                            print(f"Erro ao enviar mensagem WhatsApp: {response.text}")
-                            return Response({
-                                "mensagem": "Status do pedido atualizado, mas falha ao enviar mensagem WhatsApp",
-                                "pedido": PedidoSerializer(pedido).data,
-                                "aviso": "Não foi possível notificar o cliente via WhatsApp"
-                            }, status=status.HTTP_200_OK)
+                # Status e mensagem de WhatsApp gravados na mesma transação; o envio
+                # é feito pelo worker (manage.py enviar_whatsapp), fora da requisição
+                with transaction.atomic():
+                    status_anterior = pedido.pedido_status
+                    pedido.pedido_status = novo_status
+                    pedido.save()
+                    enqueue_status_notification(pedido, status_anterior, novo_status)
+                    apply_status_change([pedido.id], {pedido.id: status_anterior}, novo_status)
 
-                    except Exception as e:
-                        print(f"Exceção ao enviar WhatsApp: {str(e)}")
-                        return Response({
-                            "mensagem": "Status do pedido atualizado, mas falha ao enviar mensagem WhatsApp",
-                            "pedido": PedidoSerializer(pedido).data,
-                            "aviso": f"Erro ao notificar cliente: {str(e)}"
-                        }, status=status.HTTP_200_OK)
+                if status_anterior != novo_status:
+                    resumo = summarize_order(pedido.id)
+                    resumo['status_anterior'] = status_anterior
+                    publish_status_changes([resumo], {pedido.id: pedido.pedido_estabelecimento_id})
 
                 serializer = PedidoSerializer(pedido)
                 return Response({
@@ -1356,6 +1489,282 @@ def orders(request, id=None):
     except Exception as e:
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+def archived_orders(user):
+    # Escopo dos pedidos arquivados, igual ao da listagem de pedidos
+    if user.is_superuser:
+        return PedidoArquivado.objects.all()
+    return PedidoArquivado.objects.filter(pedido_arquivado_estabelecimento=user.profile.estabelecimento)
+
+# Histórico de pedidos arquivados (concluídos/cancelados antigos)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def orders_history(request):
+    try:
+        if not request.user.is_superuser and not hasattr(request.user, 'profile'):
+            return Response({"error": "Usuário não possui perfil associado"}, status=status.HTTP_400_BAD_REQUEST)
+        pedidos = archived_orders(request.user)
+
+        try:
+            data_inicio = parse_date_bound(request.GET.get('data_inicio'))
+            data_fim = parse_date_bound(request.GET.get('data_fim'), end=True)
+            cursor = request.GET.get('cursor')
+            cursor = decode_order_cursor(cursor) if cursor else None
+            limite = min(int(request.GET.get('limite', ORDERS_PAGE_SIZE)), ORDERS_PAGE_SIZE_MAX)
+            if limite < 1:
+                raise ValueError("Limite inválido")
+        except ValueError as e:
+            return Response({"mensagem": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.GET.get('status'):
+            pedidos = pedidos.filter(pedido_arquivado_status=request.GET['status'])
+        if data_inicio:
+            pedidos = pedidos.filter(pedido_arquivado_data__gte=data_inicio)
+        if data_fim:
+            pedidos = pedidos.filter(pedido_arquivado_data__lt=data_fim)
+        if request.GET.get('cliente_id'):
+            pedidos = pedidos.filter(pedido_arquivado_cliente_id=request.GET['cliente_id'])
+        if request.GET.get('telefone'):
+            telefone = ''.join(filter(str.isdigit, request.GET['telefone']))
+            pedidos = pedidos.filter(pedido_arquivado_cliente__cliente_telefone=telefone)
+
+        # Mesma paginação por keyset da listagem de pedidos
+        if cursor:
+            cursor_data, cursor_id = cursor
+            pedidos = pedidos.filter(
+                Q(pedido_arquivado_data__lt=cursor_data) | Q(pedido_arquivado_data=cursor_data, id__lt=cursor_id)
+            )
+        pagina = list(pedidos.order_by('-pedido_arquivado_data', '-id').values(
+            'id', 'pedido_arquivado_data', 'pedido_arquivado_dados'
+        )[:limite + 1])
+
+        proximo_cursor = None
+        if len(pagina) > limite:
+            pagina = pagina[:limite]
+            proximo_cursor = encode_order_cursor(pagina[-1]['pedido_arquivado_data'], pagina[-1]['id'])
+
+        return Response({
+            "mensagem": "Histórico de pedidos",
+            "pedidos": [dict(row['pedido_arquivado_dados'], arquivado=True) for row in pagina],
+            "proximo_cursor": proximo_cursor
+        })
+    except Exception as e:
+        logger.error("Erro ao listar histórico de pedidos: %s", str(e))
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# Quadro de pedidos: todos os pedidos em andamento agrupados por status, em uma chamada
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def orders_board(request):
+    try:
+        if request.user.is_superuser:
+            pedidos = Pedido.objects.all()
+            seq = None
+        else:
+            if not hasattr(request.user, 'profile'):
+                return Response({"error": "Usuário não possui perfil associado"}, status=status.HTTP_400_BAD_REQUEST)
+            estabelecimento = request.user.profile.estabelecimento
+            pedidos = Pedido.objects.filter(pedido_estabelecimento=estabelecimento)
+            # Lida antes do quadro, para o cliente continuar pelo websocket com ?last_seq=
+            seq = current_seq(estabelecimento.id)
+
+        quadro = build_order_board(pedidos)
+        return Response({
+            "mensagem": "Quadro de pedidos",
+            "contagens": quadro['contagens'],
+            "pedidos": quadro['pedidos'],
+            "seq": seq
+        })
+    except Exception as e:
+        logger.error("Erro ao montar quadro de pedidos: %s", str(e))
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# Relatórios de vendas: leem só os consolidados (ResumoVendas / ResumoVendasProduto)
+SALES_REPORT_GROUPS = {
+    'dia': 'resumo_vendas_data',
+    'hora': 'resumo_vendas_hora',
+    'forma_pagamento': 'resumo_vendas_forma_pagamento',
+    'tipo_entrega': 'resumo_vendas_tipo_entrega',
+}
+
+def _report_period(request):
+    # Período do relatório em datas locais (inclusive); padrão: últimos 30 dias
+    fim = request.GET.get('data_fim')
+    inicio = request.GET.get('data_inicio')
+    fim = parse_date(fim) if fim else timezone.localdate()
+    inicio = parse_date(inicio) if inicio else fim - timedelta(days=29)
+    if not inicio or not fim or inicio > fim:
+        raise ValueError("Período inválido")
+    return inicio, fim
+
+def _sales_totals(valores):
+    pedidos = valores['pedidos'] or 0
+    faturamento = valores['faturamento'] or Decimal('0')
+    return {
+        'pedidos': pedidos,
+        'faturamento': str(faturamento),
+        'ticket_medio': str((faturamento / pedidos).quantize(Decimal('0.01')) if pedidos else Decimal('0.00')),
+        'taxa_entrega': str(valores['taxa_entrega'] or Decimal('0')),
+        'cancelados': valores['cancelados'] or 0,
+        'valor_cancelado': str(valores['valor_cancelado'] or Decimal('0')),
+    }
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sales_report(request):
+    try:
+        if not hasattr(request.user, 'profile'):
+            return Response({"error": "Usuário não possui perfil associado"}, status=status.HTTP_400_BAD_REQUEST)
+        agrupamento = request.GET.get('agrupamento', 'dia')
+        if agrupamento not in SALES_REPORT_GROUPS:
+            return Response({"mensagem": "Agrupamento inválido"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            inicio, fim = _report_period(request)
+        except ValueError as e:
+            return Response({"mensagem": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        resumos = ResumoVendas.objects.filter(
+            resumo_vendas_estabelecimento=request.user.profile.estabelecimento,
+            resumo_vendas_data__gte=inicio,
+            resumo_vendas_data__lte=fim
+        )
+        somas = {
+            'pedidos': Sum('resumo_vendas_pedidos'),
+            'faturamento': Sum('resumo_vendas_faturamento'),
+            'taxa_entrega': Sum('resumo_vendas_taxa_entrega'),
+            'cancelados': Sum('resumo_vendas_cancelados'),
+            'valor_cancelado': Sum('resumo_vendas_valor_cancelado'),
+        }
+        campo = SALES_REPORT_GROUPS[agrupamento]
+        serie = [
+            dict(_sales_totals(linha), chave=str(linha[campo]))
+            for linha in resumos.values(campo).annotate(**somas).order_by(campo)
+        ]
+        return Response({
+            "mensagem": "Relatório de vendas",
+            "data_inicio": inicio,
+            "data_fim": fim,
+            "agrupamento": agrupamento,
+            "totais": _sales_totals(resumos.aggregate(**somas)),
+            "serie": serie
+        })
+    except Exception as e:
+        logger.error("Erro ao gerar relatório de vendas: %s", str(e))
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sales_products_report(request):
+    try:
+        if not hasattr(request.user, 'profile'):
+            return Response({"error": "Usuário não possui perfil associado"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            inicio, fim = _report_period(request)
+            limite = min(int(request.GET.get('limite', 20)), ORDERS_PAGE_SIZE_MAX)
+        except ValueError as e:
+            return Response({"mensagem": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        ordem = '-quantidade' if request.GET.get('ordem') == 'quantidade' else '-faturamento'
+
+        produtos = ResumoVendasProduto.objects.filter(
+            resumo_produto_estabelecimento=request.user.profile.estabelecimento,
+            resumo_produto_data__gte=inicio,
+            resumo_produto_data__lte=fim
+        ).values('resumo_produto_produto_id').annotate(
+            nome=Max('resumo_produto_nome'),
+            quantidade=Sum('resumo_produto_quantidade'),
+            faturamento=Sum('resumo_produto_faturamento')
+        ).order_by(ordem)[:limite]
+
+        return Response({
+            "mensagem": "Vendas por produto",
+            "data_inicio": inicio,
+            "data_fim": fim,
+            "produtos": [
+                {
+                    'produto_id': produto['resumo_produto_produto_id'],
+                    'produto_nome': produto['nome'],
+                    'quantidade': produto['quantidade'],
+                    'faturamento': str(produto['faturamento']),
+                }
+                for produto in produtos
+            ]
+        })
+    except Exception as e:
+        logger.error("Erro ao gerar relatório de produtos: %s", str(e))
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# Alteração de status de vários pedidos de uma vez (ex.: pronto -> em entrega)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def orders_bulk_status(request):
+    try:
+        if request.user.is_superuser:
+            pedidos = Pedido.objects.all()
+        else:
+            if not hasattr(request.user, 'profile'):
+                return Response({"error": "Usuário não possui perfil associado"}, status=status.HTTP_400_BAD_REQUEST)
+            pedidos = Pedido.objects.filter(pedido_estabelecimento=request.user.profile.estabelecimento)
+
+        novo_status = request.data.get('status')
+        ids = request.data.get('ids')
+        if novo_status not in Pedido.STATUS_TRANSITIONS:
+            return Response({"mensagem": "Status inválido"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(ids, list) or not ids or len(ids) > ORDERS_PAGE_SIZE_MAX:
+            return Response({
+                "mensagem": f"Informe de 1 a {ORDERS_PAGE_SIZE_MAX} IDs de pedidos"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = {int(pedido_id) for pedido_id in ids}
+        except (TypeError, ValueError):
+            return Response({"mensagem": "IDs de pedidos inválidos"}, status=status.HTTP_400_BAD_REQUEST)
+
+        atualizados = []
+        with transaction.atomic():
+            # Bloqueia os pedidos antes de ler o status: uma alteração simultânea em
+            # outro dispositivo espera este lote, e "atualizados" é exatamente o
+            # conjunto alterado por esta requisição
+            atuais = {
+                pedido_id: (status_atual, estabelecimento_id)
+                for pedido_id, status_atual, estabelecimento_id in pedidos.select_for_update().filter(id__in=ids).order_by('id').values_list(
+                    'id', 'pedido_status', 'pedido_estabelecimento_id'
+                )
+            }
+            ignorados = [{"id": pedido_id, "motivo": "Pedido não encontrado"} for pedido_id in sorted(ids - atuais.keys())]
+
+            # Agrupa pelo status atual; cada grupo vira um UPDATE
+            grupos = {}
+            for pedido_id, (status_atual, _) in atuais.items():
+                if novo_status in Pedido.STATUS_TRANSITIONS.get(status_atual, ()):
+                    grupos.setdefault(status_atual, []).append(pedido_id)
+                else:
+                    ignorados.append({"id": pedido_id, "motivo": f"Transição de '{status_atual}' para '{novo_status}' não permitida"})
+
+            for status_atual, grupo in grupos.items():
+                pedidos.filter(id__in=grupo).update(pedido_status=novo_status, updated_at=timezone.now())
+                atualizados.extend(grupo)
+
+            status_anteriores = {pedido_id: atuais[pedido_id][0] for pedido_id in atualizados}
+            enqueue_status_notifications(
+                pedidos.filter(id__in=atualizados).select_related('pedido_cliente'),
+                status_anteriores,
+                novo_status
+            )
+            apply_status_change(atualizados, status_anteriores, novo_status)
+
+        resumos = summarize_orders(Pedido.objects.filter(id__in=atualizados).order_by('id'))
+        for resumo in resumos:
+            resumo['status_anterior'] = status_anteriores[resumo['id']]
+        publish_status_changes(resumos, {pedido_id: atuais[pedido_id][1] for pedido_id in atualizados})
+
+        return Response({
+            "mensagem": f"{len(atualizados)} pedido(s) atualizado(s)",
+            "atualizados": sorted(atualizados),
+            "ignorados": ignorados,
+            "pedidos": resumos
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        logger.error("Erro ao atualizar status em lote: %s", str(e))
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 # View para alternar o status ativo de produtos, tipos e acréscimos
 class ToggleActiveView(APIView):
     # Mapeamento de nomes de modelo para classes e serializers
@@ -1432,6 +1841,28 @@ class ToggleActiveView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+def receipt_response(request, dados, formato, nome_arquivo):
+    # Tickets em texto (text/plain) ou ESC/POS (bytes para enviar direto à impressora)
+    try:
+        colunas = parse_columns(request.GET.get('colunas'))
+    except ValueError:
+        return Response({
+            "error": f"Colunas devem ser um número entre {TICKET_COLUMNS_MIN} e {TICKET_COLUMNS_MAX}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if formato == 'escpos':
+        response = HttpResponse(b''.join(render_escpos(item, colunas) for item in dados), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'inline; filename="{nome_arquivo}.bin"'
+    else:
+        response = HttpResponse('\n'.join(render_text(item, colunas) for item in dados), content_type='text/plain; charset=utf-8')
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+def render_busy_response():
+    # Pool de renderização com a fila cheia: o cliente tenta de novo em instantes
+    response = Response({"error": "Muitas impressões em andamento, tente novamente"}, status=503)
+    response['Retry-After'] = '2'
+    return response
+
 # View para imprimir os pedidos
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -1439,30 +1870,154 @@ def print_order(request, id):
     try:
         if request.user.is_superuser:
             logger.info(f"Superusuário acessando pedido ID {id}")
-            pedido = get_object_or_404(Pedido, id=id)
+            filtros = {}
         else:
             if not hasattr(request.user, 'profile'):
                 logger.error("Usuário sem perfil associado")
                 return Response({"error": "Usuário não possui perfil associado"}, status=400)
             estabelecimento = request.user.profile.estabelecimento
             logger.info(f"Buscando pedido ID {id} para estabelecimento {estabelecimento.id}")
-            pedido = get_object_or_404(Pedido, id=id, pedido_estabelecimento=estabelecimento)
-
-        logger.info(f"Pedido encontrado: {pedido.id}")
-        context = {
-            'pedido': pedido,
-            'itens': pedido.itens.all(),
-            'logo_url': request.build_absolute_uri(pedido.pedido_estabelecimento.estabelecimento_logo.url) if pedido.pedido_estabelecimento.estabelecimento_logo else None,
-        }
-        logger.info("Renderizando template order_print.html")
-        html_string = render_to_string('delivery/order_print.html', context) 
-        logger.info("Gerando PDF com WeasyPrint")
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'inline; filename="pedido_{pedido.id}.pdf"'
-        HTML(string=html_string).write_pdf(response)
-        logger.info(f"PDF gerado para pedido {pedido.id}")
+            filtros = {'pedido_estabelecimento': estabelecimento}
+
+        # Formato: ?formato=pdf|escpos|texto ou o padrão do estabelecimento
+        formato = request.GET.get('formato')
+        if formato not in (None, 'pdf', 'escpos', 'texto'):
+            return Response({"error": "Formato inválido"}, status=400)
+        if formato is None and filtros:
+            formato = estabelecimento.estabelecimento_formato_ticket
+        if formato != 'pdf':
+            dados = load_receipt_data([id], **filtros)
+            if not dados:
+                return Response({"error": "Pedido não encontrado"}, status=404)
+            formato = formato or dados[0]['formato_ticket']
+            if formato != 'pdf':
+                return receipt_response(request, dados, formato, f"pedido_{id}")
+
+        pedido = load_ticket_order(id, **filtros)
+        if not pedido:
+            return Response({"error": "Pedido não encontrado"}, status=404)
+
+        # O PDF só é renderizado quando o pedido, o template ou o logo mudam
+        version = ticket_version(pedido)
+        etag = f'"{version}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponse(status=304)
+        else:
+            arquivo, version, cache_hit = fetch_ticket(pedido)
+            response = FileResponse(arquivo, content_type='application/pdf')
+            response['Content-Disposition'] = f'inline; filename="pedido_{pedido.id}.pdf"'
+            response['X-Ticket-Cache'] = 'HIT' if cache_hit else 'MISS'
+            logger.info(f"PDF do pedido {pedido.id} servido ({response['X-Ticket-Cache']})")
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
         return response
+    except RenderPoolBusy:
+        return render_busy_response()
+    except TimeoutError as e:
+        logger.error(f"Tempo esgotado ao gerar PDF para pedido ID {id}: {str(e)}")
+        return Response({"error": str(e)}, status=504)
     except Exception as e:
         logger.error(f"Erro ao gerar PDF para pedido ID {id}: {str(e)}", exc_info=True)
         return Response({"error": str(e)}, status=500)
+# Impressão de vários pedidos em um único documento (reimpressão no início do turno, papel enroscado...)
+# ?ids=1,2,3 ou ?desde=<data/hora>[&status=pending]
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def print_orders_batch(request):
+    try:
+        if request.user.is_superuser:
+            filtros = {}
+        else:
+            if not hasattr(request.user, 'profile'):
+                return Response({"error": "Usuário não possui perfil associado"}, status=400)
+            filtros = {'pedido_estabelecimento_id': request.user.profile.estabelecimento.id}
+
+        formato = request.GET.get('formato', 'pdf')
+        if formato not in ('pdf', 'escpos', 'texto'):
+            return Response({"error": "Formato inválido"}, status=400)
+
+        if request.GET.get('ids'):
+            try:
+                ids = list(dict.fromkeys(int(pedido_id) for pedido_id in request.GET['ids'].split(',')))
+            except ValueError:
+                return Response({"error": "IDs de pedidos inválidos"}, status=400)
+        elif request.GET.get('desde'):
+            try:
+                desde = parse_date_bound(request.GET['desde'])
+            except ValueError as e:
+                return Response({"error": str(e)}, status=400)
+            status_pedido = request.GET.get('status', 'pending')
+            if status_pedido not in Pedido.STATUS_TRANSITIONS:
+                return Response({"error": "Status inválido"}, status=400)
+            ids = list(Pedido.objects.filter(
+                pedido_status=status_pedido, pedido_data__gte=desde, **filtros
+            ).order_by('pedido_data', 'id').values_list('id', flat=True)[:TICKET_BATCH_MAX + 1])
+        else:
+            return Response({"error": "Informe 'ids' ou 'desde'"}, status=400)
+
+        if len(ids) > TICKET_BATCH_MAX:
+            return Response({"error": f"Máximo de {TICKET_BATCH_MAX} pedidos por impressão"}, status=400)
+
+        if formato != 'pdf':
+            dados = load_receipt_data(ids, **filtros)
+            if not dados:
+                return Response({"error": "Nenhum pedido encontrado"}, status=404)
+            return receipt_response(request, dados, formato, "pedidos")
+
+        inicio = time.monotonic()
+        pdf, total = fetch_tickets_pdf(ids, **filtros)
+        if not total:
+            return Response({"error": "Nenhum pedido encontrado"}, status=404)
+        logger.info(f"PDF com {total} pedidos renderizado em {(time.monotonic() - inicio) * 1000:.0f} ms")
+        response = HttpResponse(pdf, content_type='application/pdf')
+        response['Content-Disposition'] = 'inline; filename="pedidos.pdf"'
+        response['X-Ticket-Count'] = str(total)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    except RenderPoolBusy:
+        return render_busy_response()
+    except TimeoutError as e:
+        logger.error(f"Tempo esgotado ao gerar PDF em lote: {str(e)}")
+        return Response({"error": str(e)}, status=504)
+    except Exception as e:
+        logger.error(f"Erro ao gerar PDF em lote: {str(e)}", exc_info=True)
+        return Response({"error": str(e)}, status=500)
+
+# Envia pedidos para o agente de impressão local do estabelecimento
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def print_orders_agent(request):
+    try:
+        if request.user.is_superuser:
+            pedidos = Pedido.objects.all()
+        else:
+            if not hasattr(request.user, 'profile'):
+                return Response({"error": "Usuário não possui perfil associado"}, status=400)
+            pedidos = Pedido.objects.filter(pedido_estabelecimento=request.user.profile.estabelecimento)
+
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids or len(ids) > TICKET_BATCH_MAX:
+            return Response({"mensagem": f"Informe de 1 a {TICKET_BATCH_MAX} IDs de pedidos"}, status=400)
+        try:
+            ids = list(dict.fromkeys(int(pedido_id) for pedido_id in ids))
+        except (TypeError, ValueError):
+            return Response({"mensagem": "IDs de pedidos inválidos"}, status=400)
+
+        estabelecimentos = dict(pedidos.filter(id__in=ids).values_list('id', 'pedido_estabelecimento_id'))
+        por_estabelecimento = {}
+        for pedido_id in ids:
+            if pedido_id in estabelecimentos:
+                por_estabelecimento.setdefault(estabelecimentos[pedido_id], []).append(pedido_id)
+        trabalhos = []
+        with transaction.atomic():
+            for estabelecimento_id, pedido_ids in por_estabelecimento.items():
+                trabalhos.extend(enqueue_print_jobs(estabelecimento_id, pedido_ids))
+        return Response({
+            "mensagem": f"{len(trabalhos)} pedido(s) enviado(s) para impressão",
+            "pedidos": [trabalho.trabalho_pedido_id for trabalho in trabalhos],
+            "nao_encontrados": [pedido_id for pedido_id in ids if pedido_id not in estabelecimentos],
+        }, status=status.HTTP_201_CREATED)
+    except Exception as e:
+        logger.error(f"Erro ao enviar pedidos para impressão: {str(e)}", exc_info=True)
+        return Response({"error": str(e)}, status=500)
 ##############################################
\ No newline at end of file
@@ -0,0 +1,204 @@
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+import requests
+from decouple import config
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import NotificacaoWhatsApp
+
+logger = logging.getLogger(__name__)
+
+# Mensagens por status de destino do pedido. Só os status listados em
+# WHATSAPP_NOTIFY_STATUSES geram notificação.
+WHATSAPP_MESSAGES = {
+    'preparing': "Olá, {nome}! Seu pedido #{numero} começou a ser preparado. Te avisaremos quando estiver pronto! 😊",
+    'ready': "Olá, {nome}! Seu pedido #{numero} está pronto! 🎉",
+    'delivery': "Olá, {nome}! Seu pedido #{numero} saiu para entrega! 🛵",
+}
+WHATSAPP_NOTIFY_STATUSES = getattr(settings, 'WHATSAPP_NOTIFY_STATUSES', ['preparing'])
+
+# Política de reenvio
+MAX_TENTATIVAS = getattr(settings, 'WHATSAPP_MAX_TENTATIVAS', 6)
+RETRY_BASE_SECONDS = getattr(settings, 'WHATSAPP_RETRY_BASE_SECONDS', 10)
+RETRY_MAX_SECONDS = getattr(settings, 'WHATSAPP_RETRY_MAX_SECONDS', 30 * 60)
+# Mensagens presas em "sending" (worker interrompido) voltam para a fila após este tempo
+SENDING_TIMEOUT_SECONDS = 5 * 60
+HTTP_TIMEOUT = (5, 15)
+# Respostas 4xx que não adianta reenviar (número inválido, credencial recusada...)
+HTTP_RETRYABLE_4XX = (408, 425, 429)
+
+# Instância da Evolution API; sem ela, as mudanças de status não geram mensagem
+EVOLUTION_API_INSTANCE = config('EVOLUTION_API_INSTANCE', default=None)
+
+def build_status_notification(pedido, status_anterior, novo_status):
+    # Mensagem (ainda não salva) para a mudança de status, ou None se não houver aviso
+    if novo_status not in WHATSAPP_NOTIFY_STATUSES or novo_status not in WHATSAPP_MESSAGES:
+        return None
+    # Mantém a regra original: "em preparo" só é avisado quando o pedido sai de pendente
+    if novo_status == 'preparing' and status_anterior != 'pending':
+        return None
+    if status_anterior == novo_status:
+        return None
+
+    if not EVOLUTION_API_INSTANCE:
+        logger.warning(f"EVOLUTION_API_INSTANCE não configurada; aviso de WhatsApp do pedido {pedido.id} ignorado")
+        return None
+
+    cliente = pedido.pedido_cliente
+    mensagem = WHATSAPP_MESSAGES[novo_status].format(
+        nome=cliente.cliente_nome,
+        numero=str(pedido.id).zfill(6)  # Formata como 000123
+    )
+    return NotificacaoWhatsApp(
+        notificacao_estabelecimento_id=pedido.pedido_estabelecimento_id,
+        notificacao_pedido=pedido,
+        notificacao_instancia=EVOLUTION_API_INSTANCE,
+        notificacao_telefone=f'55{cliente.cliente_telefone}',
+        notificacao_mensagem=mensagem,
+    )
+
+def enqueue_status_notification(pedido, status_anterior, novo_status):
+    """
+    Grava a mensagem de WhatsApp na outbox. Deve ser chamada dentro da mesma
+    transação da mudança de status; o envio fica a cargo do worker.
+    """
+    notificacao = build_status_notification(pedido, status_anterior, novo_status)
+    if notificacao:
+        notificacao.save()
+    return notificacao
+
+def enqueue_status_notifications(pedidos, status_anteriores, novo_status):
+    # Versão em lote: status_anteriores é um dict {pedido_id: status}
+    if novo_status not in WHATSAPP_NOTIFY_STATUSES:
+        return []
+    notificacoes = [
+        build_status_notification(pedido, status_anteriores.get(pedido.id), novo_status)
+        for pedido in pedidos
+    ]
+    return NotificacaoWhatsApp.objects.bulk_create([n for n in notificacoes if n])
+
+class RateLimiter:
+    # Token bucket por instância da Evolution API, compartilhado entre as threads
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class EvolutionSender:
+    """
+    Envia mensagens pela Evolution API reaproveitando conexões HTTP (uma
+    Session por thread) e respeitando o limite de envio por instância.
+    """
+    def __init__(self, rate=None):
+        self.api_url = config('EVOLUTION_API_URL')
+        self.api_key = config('EVOLUTION_API_KEY')
+        self.rate = rate or config('EVOLUTION_API_RATE', default=1.0, cast=float)
+        self.local = threading.local()
+        self.limiters = {}
+        self.limiters_lock = threading.Lock()
+
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            session = requests.Session()
+            session.headers.update({'Content-Type': 'application/json', 'apiKey': self.api_key})
+            self.local.session = session
+        return self.local.session
+
+    def limiter(self, instancia):
+        with self.limiters_lock:
+            if instancia not in self.limiters:
+                self.limiters[instancia] = RateLimiter(self.rate)
+            return self.limiters[instancia]
+
+    def send(self, notificacao_id, instancia, telefone, mensagem):
+        # Retorna (id, erro, definitivo); erro None indica sucesso e definitivo
+        # indica que a mensagem não deve ser reenviada
+        self.limiter(instancia).acquire()
+        try:
+            response = self.session().post(
+                f"{self.api_url}/message/sendText/{instancia}",
+                json={"number": telefone, "text": mensagem},
+                timeout=HTTP_TIMEOUT
+            )
+            if response.status_code not in (200, 201):
+                definitivo = 400 <= response.status_code < 500 and response.status_code not in HTTP_RETRYABLE_4XX
+                return notificacao_id, f"HTTP {response.status_code}: {response.text[:500]}", definitivo
+            return notificacao_id, None, False
+        except requests.exceptions.RequestException as e:
+            return notificacao_id, str(e), False
+
+def claim_batch(limit):
+    """
+    Reserva um lote de mensagens vencidas marcando-as como "sending". Usa
+    SKIP LOCKED quando o banco suporta, para vários workers em paralelo.
+    """
+    agora = timezone.now()
+    with transaction.atomic():
+        pendentes = NotificacaoWhatsApp.objects.filter(
+            Q(notificacao_status='pending', notificacao_proxima_tentativa__lte=agora) |
+            Q(notificacao_status='sending', updated_at__lt=agora - timedelta(seconds=SENDING_TIMEOUT_SECONDS))
+        ).order_by('notificacao_proxima_tentativa')
+        pendentes = pendentes.select_for_update(skip_locked=True)
+        lote = list(pendentes.values_list(
+            'id', 'notificacao_instancia', 'notificacao_telefone', 'notificacao_mensagem'
+        )[:limit])
+        if lote:
+            NotificacaoWhatsApp.objects.filter(id__in=[item[0] for item in lote]).update(
+                notificacao_status='sending', updated_at=agora
+            )
+    return lote
+
+def retry_delay(tentativas):
+    # Backoff exponencial com jitter
+    delay = min(RETRY_BASE_SECONDS * (2 ** (tentativas - 1)), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+def record_result(notificacao_id, erro, definitivo=False):
+    agora = timezone.now()
+    if erro is None:
+        NotificacaoWhatsApp.objects.filter(id=notificacao_id).update(
+            notificacao_status='sent',
+            notificacao_enviada_em=agora,
+            notificacao_ultimo_erro=None,
+            updated_at=agora
+        )
+        return 'sent'
+
+    notificacao = NotificacaoWhatsApp.objects.only('id', 'notificacao_tentativas').get(id=notificacao_id)
+    tentativas = notificacao.notificacao_tentativas + 1
+    if definitivo:
+        logger.error(f"Notificação WhatsApp {notificacao_id} descartada (erro definitivo): {erro}")
+        novo_status, proxima = 'dead', agora
+    elif tentativas >= MAX_TENTATIVAS:
+        logger.error(f"Notificação WhatsApp {notificacao_id} descartada após {tentativas} tentativas: {erro}")
+        novo_status, proxima = 'dead', agora
+    else:
+        logger.warning(f"Falha ao enviar notificação WhatsApp {notificacao_id} (tentativa {tentativas}): {erro}")
+        novo_status, proxima = 'pending', agora + timedelta(seconds=retry_delay(tentativas))
+    NotificacaoWhatsApp.objects.filter(id=notificacao_id).update(
+        notificacao_status=novo_status,
+        notificacao_tentativas=tentativas,
+        notificacao_proxima_tentativa=proxima,
+        notificacao_ultimo_erro=erro,
+        updated_at=agora
+    )
+    return novo_status
@@ -0,0 +1,86 @@
+import logging
+import threading
+import time
+from django.conf import settings
+from googlemaps.convert import decode_polyline
+from .models import DeliveryZone
+
+logger = logging.getLogger(__name__)
+
+# Tempo máximo que um índice fica em memória antes de ser recarregado do banco
+ZONE_INDEX_TTL = getattr(settings, 'DELIVERY_ZONE_INDEX_TTL', 60)
+
+def point_in_polygon(lat, lng, vertices):
+    # Ray casting: conta quantas arestas um raio horizontal a partir do ponto cruza
+    inside = False
+    j = len(vertices) - 1
+    for i in range(len(vertices)):
+        lat_i, lng_i = vertices[i]
+        lat_j, lng_j = vertices[j]
+        if (lat_i > lat) != (lat_j > lat):
+            lng_cross = lng_i + (lat - lat_i) * (lng_j - lng_i) / (lat_j - lat_i)
+            if lng < lng_cross:
+                inside = not inside
+        j = i
+    return inside
+
+class Zone:
+    __slots__ = ('id', 'name', 'delivery_fee', 'vertices', 'min_lat', 'max_lat', 'min_lng', 'max_lng')
+
+    def __init__(self, id, name, delivery_fee, polygon):
+        self.id = id
+        self.name = name
+        self.delivery_fee = delivery_fee
+        self.vertices = [(p['lat'], p['lng']) for p in decode_polyline(polygon)]
+        lats = [v[0] for v in self.vertices]
+        lngs = [v[1] for v in self.vertices]
+        self.min_lat, self.max_lat = min(lats), max(lats)
+        self.min_lng, self.max_lng = min(lngs), max(lngs)
+
+    def contains(self, lat, lng):
+        # Pré-filtro pelo retângulo envolvente antes do ray casting
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lng <= lng <= self.max_lng):
+            return False
+        return point_in_polygon(lat, lng, self.vertices)
+
+class ZoneIndex:
+    def __init__(self, estabelecimento_id):
+        self.loaded_at = time.monotonic()
+        self.zones = []
+        zonas = DeliveryZone.objects.filter(estabelecimento_id=estabelecimento_id, active=True).values_list(
+            'id', 'name', 'delivery_fee', 'polygon'
+        ).order_by('priority', 'id')
+        for zona_id, name, delivery_fee, polygon in zonas:
+            try:
+                self.zones.append(Zone(zona_id, name, delivery_fee, polygon))
+            except Exception as e:
+                logger.error(f"Zona de entrega {zona_id} com polígono inválido ignorada: {str(e)}")
+
+    def find(self, lat, lng):
+        for zone in self.zones:
+            if zone.contains(lat, lng):
+                return zone
+        return None
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_zone_index(estabelecimento_id):
+    with _indexes_lock:
+        index = _indexes.get(estabelecimento_id)
+        if index is None or time.monotonic() - index.loaded_at > ZONE_INDEX_TTL:
+            index = _indexes[estabelecimento_id] = ZoneIndex(estabelecimento_id)
+        return index
+
+def invalidate_zone_index(estabelecimento_id):
+    with _indexes_lock:
+        _indexes.pop(estabelecimento_id, None)
+
+def find_delivery_zone(estabelecimento_id, lat, lng):
+    """
+    Retorna a zona de entrega que contém o ponto, ou None. A busca é feita em
+    memória, sem consulta ao banco nem chamadas externas.
+    """
+    if lat is None or lng is None:
+        return None
+    return get_zone_index(estabelecimento_id).find(lat, lng)
@@ -2,6 +2,7 @@ from datetime import timedelta
 from pathlib import Path
 from decouple import config
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -161,7 +162,7 @@ CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'delivery.auth.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -171,6 +172,9 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # Tokens de acesso com estabelecimento_id e flags do usuário (delivery.auth)
+    'TOKEN_OBTAIN_SERIALIZER': 'delivery.auth.EstabelecimentoTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'delivery.auth.EstabelecimentoTokenRefreshSerializer',
 }
 
 ASGI_APPLICATION = 'setup.asgi.application'
@@ -183,4 +187,19 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache compartilhado entre o gunicorn e o servidor de websockets (ex.: vínculo
+# usuário -> estabelecimento da autenticação do websocket)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL', default='redis://127.0.0.1:6379/1'),
+        'KEY_PREFIX': 'pedefacil',
+    },
+}
+
+# manage.py test não fala com o Redis: cache e channel layer em memória
+if sys.argv[1:2] == ['test']:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
 GOOGLE_MAPS_API_KEY = config("GOOGLE_MAPS_API_KEY")
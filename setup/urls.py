@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.conf import settings
 from django.conf.urls.static import static
 from django.urls import path
-from delivery.views import landing_page, chatbot, user_data, search_client, business, products, types, orders, addons, menu_delivery, print_order, ToggleActiveView, DeliveryFeeView, promo
+from delivery.views import landing_page, chatbot, user_data, search_client, business, products, types, orders, addons, menu_delivery, print_order, print_orders_batch, print_orders_agent, orders_board, sales_report, sales_products_report, orders_history, orders_bulk_status, ToggleActiveView, DeliveryFeeView, promo, address_autocomplete
 
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -40,6 +40,13 @@ urlpatterns = [
     path('orders_detail/<int:id>/', orders, name='orders_detail'),
     path('orders_edit/<int:id>/', orders, name='orders_edit'),
     path('orders_print/<int:id>/', print_order, name='print_order'),
+    path('orders_print_batch', print_orders_batch, name='print_orders_batch'),
+    path('orders_print_agent', print_orders_agent, name='print_orders_agent'),
+    path('orders_board', orders_board, name='orders_board'),
+    path('orders_history', orders_history, name='orders_history'),
+    path('sales_report', sales_report, name='sales_report'),
+    path('sales_report_products', sales_products_report, name='sales_report_products'),
+    path('orders_bulk_status', orders_bulk_status, name='orders_bulk_status'),
 
     path('<str:model_name>/<int:id>/toggle-active/', ToggleActiveView.as_view(), name='toggle-active'),
 
@@ -50,6 +57,8 @@ urlpatterns = [
     
     path('search_client/<str:estab_url>/<str:phone>', search_client, name='search_client'),
     path('search_client/<str:estab_url>', search_client, name='search_client'),
+
+    path('address_autocomplete/<str:estab_url>', address_autocomplete, name='address_autocomplete'),
     
     path('api/endereco/', DeliveryFeeView.as_view(), name='delivery_fee'),
 ]
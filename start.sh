@@ -1,4 +1,5 @@
 #!/bin/bash
 nginx -g 'daemon off;' &
+python manage.py enviar_whatsapp &
 
 exec gunicorn --timeout 60 --workers 2 -b 0.0.0.0:8000 setup.wsgi:application